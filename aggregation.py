@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from money import to_rupees
+from records import CATEGORIES
+
+# Vectorized expense aggregation used by every page.
+#
+# A user's expenses are loaded once per data version into a typed DataFrame
+# (see UserFrames) with columns:
+#   id           object
+#   date         datetime64[ns], sorted ascending
+#   category     categorical
+#   amount       int64 paise
+#   description  object
+# and every summary is a groupby over it. Summaries return rupees.
+
+FRAME_COLUMNS = ["id", "date", "category", "amount", "description"]
+
+
+def expense_frame(expenses):
+    """Build the typed expense frame from records.Expense records, sorted by date
+
+    The categorical's categories are the records.CATEGORIES table, so each
+    record's category code is used as is.
+    """
+    count = len(expenses)
+    codes = np.fromiter((exp.category_code for exp in expenses), dtype=np.int16, count=count)
+    frame = pd.DataFrame({
+        "id": [exp.id for exp in expenses],
+        "date": pd.to_datetime([exp.date for exp in expenses], format="%Y-%m-%d", errors="coerce"),
+        "category": pd.Categorical.from_codes(codes, list(CATEGORIES.values)),
+        "amount": np.fromiter((exp.paise for exp in expenses), dtype=np.int64, count=count),
+        "description": [exp.description for exp in expenses],
+    }, columns=FRAME_COLUMNS)
+    return frame.sort_values("date", kind="stable", ignore_index=True)
+
+
+def date_slice(frame, start_date=None, end_date=None):
+    """Rows with start_date <= date <= end_date (YYYY-MM-DD strings, inclusive)"""
+    dates = frame["date"].to_numpy()
+    lo = 0 if start_date is None else dates.searchsorted(np.datetime64(start_date), side="left")
+    hi = len(frame) if end_date is None else dates.searchsorted(np.datetime64(end_date), side="right")
+    return frame.iloc[lo:hi]
+
+
+def _rupees(paise):
+    return paise / 100
+
+
+def total_amount(frame):
+    """Total amount in rupees"""
+    return to_rupees(frame["amount"].sum())
+
+
+def by_category(frame):
+    """Rupee totals per category, largest first, only categories with expenses"""
+    sums = frame.groupby("category", observed=True)["amount"].sum()
+    return _rupees(sums.sort_values(ascending=False, kind="stable"))
+
+
+def by_day(frame):
+    """Rupee totals per calendar day, oldest first"""
+    return _rupees(frame.groupby("date")["amount"].sum())
+
+
+def by_week(frame):
+    """Rupee totals per week (weeks start on Monday), indexed by the week's Monday"""
+    # datetime64 weeks count from Thursday 1970-01-01; shift so they start on Monday
+    dates = frame["date"].to_numpy().astype("datetime64[D]")
+    weeks = (dates + np.timedelta64(3, "D")).astype("datetime64[W]").astype("datetime64[D]") - np.timedelta64(3, "D")
+    return _rupees(frame.groupby(pd.DatetimeIndex(weeks, name="date"))["amount"].sum())
+
+
+def by_month(frame):
+    """Rupee totals per month, indexed by YYYY-MM"""
+    months = frame["date"].to_numpy().astype("datetime64[M]")
+    sums = frame.groupby(months)["amount"].sum()
+    sums.index = sums.index.astype(str).str[:7]
+    sums.index.name = "month"
+    return _rupees(sums)
+
+
+def days_tracked(frame):
+    """Number of distinct days with at least one expense"""
+    return int(frame["date"].nunique())
+
+
+class UserFrames:
+    """Lazily built expense frames per user for one data version
+
+    Held as a derived value of the shared expense view; a write returns a
+    copy without the affected user's frame, which is rebuilt on next use.
+    """
+
+    def __init__(self, frames=None):
+        self._frames = frames if frames is not None else {}
+
+    def get(self, username, load_records):
+        frame = self._frames.get(username)
+        if frame is None:
+            frame = expense_frame(load_records())
+            self._frames[username] = frame
+        return frame
+
+    def without(self, username):
+        frames = {user: frame for user, frame in self._frames.items() if user != username}
+        return UserFrames(frames)
@@ -1,17 +1,25 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import random
 import json
+import io
 import os
 from utils import (
-    get_expense_data, save_expense_data, get_budget_data, save_budget_data,
-    get_investment_data, save_investment_data, get_user_data, save_user_data,
-    get_color_for_category, calculate_monthly_summary
+    add_expense, delete_expense, save_user_budget, add_investment, delete_investment,
+    save_user, check_login, get_user_account, generate_id, get_color_for_category, format_currency
 )
-from investment_calculator import calculate_sip_returns, calculate_lumpsum_returns
+from snapshot import UserSnapshot
+from goals import MAX_YEARS, required_duration, required_return, required_sip
+from investment_calculator import (
+    calculate_sip_returns, calculate_lumpsum_returns, calculate_scenario_grid, plan_growth, simulate_returns
+)
+from passwords import hash_password
+from statements import StatementError, import_statement
+from exports import FORMATS as EXPORT_FORMATS, available_formats, export_expenses
 from humor_tips import get_random_tip
 from gamification import get_achievement, update_points
 
@@ -61,14 +69,15 @@ def show_login_page():
         password = st.text_input("Password", type="password")
         
         if st.button("Login"):
-            # Simple login for demo purposes
-            if username and password:
+            if not (username and password):
+                st.error("Please enter username and password")
+            elif check_login(username, password):
                 st.session_state.login_status = True
                 st.session_state.username = username
                 st.session_state.points = 100  # Initial points
                 st.rerun()
             else:
-                st.error("Please enter username and password")
+                st.error("Invalid username or password")
     
     with col2:
         st.subheader("Register")
@@ -79,16 +88,16 @@ def show_login_page():
         if st.button("Register"):
             if new_password != confirm_password:
                 st.error("Passwords don't match")
+            elif get_user_account(new_username) is not None:
+                st.error("That username is taken")
             elif new_username and new_password:
                 # Simple registration for demo purposes
-                user_data = get_user_data()
-                user_data[new_username] = {
-                    "password": new_password,
+                save_user(new_username, {
+                    "password_hash": hash_password(new_password),
                     "points": 100,
                     "achievements": [],
                     "joined_date": datetime.now().strftime("%Y-%m-%d")
-                }
-                save_user_data(user_data)
+                })
                 st.success("Registration successful! You can now login.")
             else:
                 st.error("Please fill all fields")
@@ -150,23 +159,24 @@ def show_main_app():
     elif st.session_state.current_page == "financial_assistant":
         show_financial_assistant()
 
+def user_snapshot():
+    """The logged-in user's UserSnapshot, rebuilt only when their data has changed"""
+    snapshot = st.session_state.get("user_snapshot")
+    if snapshot is None or not snapshot.is_current(st.session_state.username):
+        snapshot = UserSnapshot(st.session_state.username)
+        st.session_state.user_snapshot = snapshot
+    return snapshot
+
 def show_dashboard():
     st.title("Dashboard")
     
     # Get user data
-    expense_data = get_expense_data()
-    budget_data = get_budget_data()
-    investment_data = get_investment_data()
-    
-    # Filter for current user
-    user_expenses = [exp for exp in expense_data if exp.get('username') == st.session_state.username]
-    user_budget = next((b for b in budget_data if b.get('username') == st.session_state.username), 
-                       {"monthly_budget": 10000, "savings_target": 3000})
-    user_investments = [inv for inv in investment_data if inv.get('username') == st.session_state.username]
+    snapshot = user_snapshot()
+    user_budget = snapshot.budget or {"monthly_budget": 10000, "savings_target": 3000}
+    user_investments = snapshot.investments
     
     # Calculate monthly summary
-    current_month = datetime.now().strftime("%Y-%m")
-    monthly_summary = calculate_monthly_summary(user_expenses, current_month)
+    monthly_summary = snapshot.monthly_summary
     
     # Top stats
     col1, col2, col3 = st.columns(3)
@@ -180,8 +190,8 @@ def show_dashboard():
         st.markdown(f"""
         <div style='background-color: #1E2A4A; padding: 20px; border-radius: 10px;'>
             <p style='color: gray;'>Monthly Spent</p>
-            <h2 style='margin:0;'>₹{monthly_spent:,}</h2>
-            <p style='margin:0;'>out of ₹{monthly_budget:,}</p>
+            <h2 style='margin:0;'>{format_currency(monthly_spent)}</h2>
+            <p style='margin:0;'>out of {format_currency(monthly_budget)}</p>
             <p style='color: {"red" if percentage >= 100 else "green"};'>{change}</p>
             <div style='background-color: #444; height: 10px; border-radius: 5px; margin-top: 10px;'>
                 <div style='background-color: {"red" if percentage >= 100 else "#FF5733"}; width: {min(percentage, 100)}%; 
@@ -199,8 +209,8 @@ def show_dashboard():
         st.markdown(f"""
         <div style='background-color: #1E2A4A; padding: 20px; border-radius: 10px;'>
             <p style='color: gray;'>Monthly Savings</p>
-            <h2 style='margin:0;'>₹{monthly_saved:,}</h2>
-            <p style='margin:0;'>target ₹{savings_target:,}</p>
+            <h2 style='margin:0;'>{format_currency(monthly_saved)}</h2>
+            <p style='margin:0;'>target {format_currency(savings_target)}</p>
             <p style='color: {"green" if monthly_saved > 0 else "red"};'>+12.3%</p>
             <div style='background-color: #444; height: 10px; border-radius: 5px; margin-top: 10px;'>
                 <div style='background-color: #4CAF50; width: {min(percentage, 100)}%; 
@@ -216,8 +226,8 @@ def show_dashboard():
         st.markdown(f"""
         <div style='background-color: #1E2A4A; padding: 20px; border-radius: 10px;'>
             <p style='color: gray;'>Investments</p>
-            <h2 style='margin:0;'>₹{total_invested:,}</h2>
-            <p style='margin:0;'>total growth ₹{investment_growth:,}</p>
+            <h2 style='margin:0;'>{format_currency(total_invested)}</h2>
+            <p style='margin:0;'>total growth {format_currency(investment_growth)}</p>
             <p style='color: green;'>+5.7%</p>
             <div style='background-color: #444; height: 10px; border-radius: 5px; margin-top: 10px;'>
                 <div style='background-color: #3F51B5; width: 75%; height: 100%; border-radius: 5px;'></div>
@@ -231,13 +241,8 @@ def show_dashboard():
     with col1:
         st.subheader("Expense Breakdown")
         
-        # Create expense category summary
-        categories = {}
-        for expense in user_expenses:
-            if expense.get('date', '').startswith(current_month):
-                category = expense.get('category', 'Others')
-                amount = expense.get('amount', 0)
-                categories[category] = categories.get(category, 0) + amount
+        # Expense category summary for this month
+        categories = monthly_summary['categories']
         
         if categories:
             # Calculate percentages
@@ -277,7 +282,7 @@ def show_dashboard():
                         <span style='color: {color}; font-size: 12px;'>●</span> {category}
                     </div>
                     <div>
-                        ₹{amount:,} ({percentage}%)
+                        {format_currency(amount)} ({percentage}%)
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
@@ -309,11 +314,10 @@ def show_dashboard():
                         "category": category,
                         "date": date.strftime("%Y-%m-%d"),
                         "description": description,
-                        "id": str(random.randint(10000, 99999))
+                        "id": generate_id()
                     }
                     
-                    expense_data.append(new_expense)
-                    save_expense_data(expense_data)
+                    add_expense(new_expense)
                     
                     # Update points
                     st.session_state.points += 5
@@ -332,10 +336,6 @@ def show_dashboard():
 def show_expenses():
     st.title("Expense Tracker")
     
-    # Get expense data
-    expense_data = get_expense_data()
-    user_expenses = [exp for exp in expense_data if exp.get('username') == st.session_state.username]
-    
     # Date filter
     col1, col2 = st.columns(2)
     with col1:
@@ -369,13 +369,11 @@ def show_expenses():
                 start_date = date_range[0].strftime("%Y-%m-%d")
                 end_date = date_range[1].strftime("%Y-%m-%d")
     
-    # Filter expenses by date
-    filtered_expenses = user_expenses
-    if start_date and end_date:
-        filtered_expenses = [
-            exp for exp in user_expenses 
-            if start_date <= exp.get('date', '') <= end_date
-        ]
+    # Load only the user's expenses in the selected date range
+    if not (start_date and end_date):
+        start_date = end_date = None
+    snapshot = user_snapshot()
+    filtered_expenses = snapshot.expenses(start_date, end_date)
     
     # Add new expense
     with st.expander("Add New Expense"):
@@ -401,11 +399,10 @@ def show_expenses():
                     "category": category,
                     "date": date.strftime("%Y-%m-%d"),
                     "description": description,
-                    "id": str(random.randint(10000, 99999))
+                    "id": generate_id()
                 }
                 
-                expense_data.append(new_expense)
-                save_expense_data(expense_data)
+                add_expense(new_expense)
                 
                 # Update points
                 st.session_state.points += 5
@@ -413,26 +410,68 @@ def show_expenses():
                 st.rerun()
             else:
                 st.error("Amount must be greater than 0")
-    
+
+    # Bulk import from a bank statement
+    with st.expander("Import Bank Statement (CSV)"):
+        st.caption("Needs a date column and an amount or withdrawal column; rows you've already added are skipped.")
+        statement = st.file_uploader("Statement", type=["csv"])
+
+        if statement is not None and st.button("Import Statement", use_container_width=True):
+            try:
+                result = import_statement(statement, st.session_state.username)
+            except StatementError as e:
+                st.error(str(e))
+            else:
+                # Shown after the rerun that brings in the new expenses
+                st.session_state.import_result = result
+                st.rerun()
+
+        result = st.session_state.pop("import_result", None)
+        if result:
+            st.success(f"Imported {result['imported']} of {result['rows']} rows "
+                       f"({result['duplicates']} already added, {result['rejected']} not expenses).")
+
+    # Export the selected range, archived months included
+    with st.expander("Export Expenses"):
+        export_format = st.selectbox("Format", available_formats(), format_func=str.upper)
+
+        if st.button("Prepare Export", use_container_width=True):
+            export_file = io.BytesIO()
+            count = export_expenses(export_file, export_format, st.session_state.username, start_date, end_date)
+            st.download_button(
+                f"Download {count} expenses",
+                data=export_file.getvalue(),
+                file_name=f"expenses{EXPORT_FORMATS[export_format]}",
+                use_container_width=True
+            )
+
     # Display expense summary
     if filtered_expenses:
         # Calculate totals by category
-        categories = {}
-        for expense in filtered_expenses:
-            category = expense.get('category', 'Others')
-            amount = expense.get('amount', 0)
-            categories[category] = categories.get(category, 0) + amount
+        category_totals = snapshot.category_totals(start_date, end_date)
         
-        total_expense = sum(categories.values())
+        total_expense = snapshot.total(start_date, end_date)
         
         # Show summary
         st.subheader("Expense Summary")
-        st.markdown(f"**Total Expenses:** ₹{total_expense:,.2f}")
+        st.markdown(f"**Total Expenses:** {format_currency(total_expense)}")
+        
+        spend_index = snapshot.spend_index
+        if start_date and end_date:
+            _, previous_total, change = snapshot.compare_spend(start_date, end_date)
+            if change is not None:
+                st.markdown(f"{'▲' if change > 0 else '▼'} {abs(change)}% vs the previous period ({format_currency(previous_total)})")
+        
+        # Rolling spend
+        col1, col2, col3 = st.columns(3)
+        for col, days in ((col1, 7), (col2, 30), (col3, 90)):
+            with col:
+                st.metric(f"Last {days} Days", format_currency(spend_index.rolling_total(st.session_state.username, days)))
         
         # Create a bar chart for category breakdown
         category_df = pd.DataFrame({
-            'Category': list(categories.keys()),
-            'Amount': list(categories.values())
+            'Category': category_totals.index.astype(str),
+            'Amount': category_totals.to_numpy()
         })
         
         fig = px.bar(
@@ -440,7 +479,7 @@ def show_expenses():
             x='Category', 
             y='Amount',
             color='Category',
-            color_discrete_map={cat: get_color_for_category(cat) for cat in categories.keys()},
+            color_discrete_map={cat: get_color_for_category(cat) for cat in category_df['Category']},
             title="Expenses by Category"
         )
         
@@ -457,21 +496,14 @@ def show_expenses():
         st.subheader("Daily Expense Trend")
         
         # Group expenses by date
-        date_expenses = {}
-        for expense in filtered_expenses:
-            date = expense.get('date', '')
-            amount = expense.get('amount', 0)
-            date_expenses[date] = date_expenses.get(date, 0) + amount
+        daily_totals = snapshot.daily_totals(start_date, end_date)
         
         # Create a line chart for daily expenses
         date_df = pd.DataFrame({
-            'Date': list(date_expenses.keys()),
-            'Amount': list(date_expenses.values())
+            'Date': daily_totals.index,
+            'Amount': daily_totals.to_numpy()
         })
         
-        date_df['Date'] = pd.to_datetime(date_df['Date'])
-        date_df = date_df.sort_values('Date')
-        
         fig = px.line(
             date_df,
             x='Date',
@@ -498,7 +530,7 @@ def show_expenses():
             col1, col2, col3, col4 = st.columns([2, 3, 2, 1])
             
             with col1:
-                st.markdown(f"**₹{expense.get('amount', 0):,.2f}**")
+                st.markdown(f"**{format_currency(expense.get('amount', 0))}**")
             
             with col2:
                 desc = expense.get('description', '')
@@ -519,8 +551,7 @@ def show_expenses():
                 expense_id = expense.get('id', '')
                 if st.button("🗑️", key=f"delete_{expense_id}"):
                     # Remove the expense
-                    expense_data = [exp for exp in expense_data if exp.get('id') != expense_id]
-                    save_expense_data(expense_data)
+                    delete_expense(expense_id, st.session_state.username)
                     st.success("Expense deleted successfully!")
                     st.rerun()
             
@@ -537,18 +568,16 @@ def show_expenses():
 def show_budget():
     st.title("Budget Planner")
     
-    # Get budget data
-    budget_data = get_budget_data()
-    user_budget = next((b for b in budget_data if b.get('username') == st.session_state.username), None)
-    
-    # Get expense data for comparison
-    expense_data = get_expense_data()
-    user_expenses = [exp for exp in expense_data if exp.get('username') == st.session_state.username]
-    
     # Current month and year
-    current_month = datetime.now().strftime("%Y-%m")
     month_name = datetime.now().strftime("%B %Y")
     
+    # Get budget data
+    snapshot = user_snapshot()
+    user_budget = snapshot.budget
+    
+    # Get this month's expenses for comparison
+    monthly_summary = snapshot.monthly_summary
+    
     col1, col2 = st.columns([2, 1])
     
     with col1:
@@ -559,17 +588,10 @@ def show_budget():
             savings_target = user_budget.get('savings_target', 3000)
             
             # Budget categories
-            categories = user_budget.get('categories', {
-                "Food & Dining": 0.3,
-                "Rent": 0.4,
-                "Transportation": 0.1,
-                "Shopping": 0.1,
-                "Others": 0.1
-            })
+            categories = snapshot.budget_shares
             
             # Calculate monthly expenses
-            monthly_expenses = sum(exp.get('amount', 0) for exp in user_expenses 
-                                  if exp.get('date', '').startswith(current_month))
+            monthly_expenses = monthly_summary['total']
             
             # Calculate remaining budget
             remaining_budget = monthly_budget - monthly_expenses
@@ -577,20 +599,15 @@ def show_budget():
             # Progress bar for overall budget
             percentage_used = min(100, round((monthly_expenses / monthly_budget) * 100, 1)) if monthly_budget else 0
             
-            st.markdown(f"### Monthly Budget: ₹{monthly_budget:,}")
+            st.markdown(f"### Monthly Budget: {format_currency(monthly_budget)}")
             st.progress(percentage_used / 100)
-            st.markdown(f"**Used:** ₹{monthly_expenses:,} ({percentage_used}%) - **Remaining:** ₹{remaining_budget:,} ({100-percentage_used}%)")
+            st.markdown(f"**Used:** {format_currency(monthly_expenses)} ({percentage_used}%) - **Remaining:** {format_currency(remaining_budget)} ({100-percentage_used}%)")
             
             # Budget by category
             st.markdown("### Budget Allocation")
             
-            # Calculate expenses by category
-            category_expenses = {}
-            for expense in user_expenses:
-                if expense.get('date', '').startswith(current_month):
-                    category = expense.get('category', 'Others')
-                    amount = expense.get('amount', 0)
-                    category_expenses[category] = category_expenses.get(category, 0) + amount
+            # Expenses by category
+            category_expenses = monthly_summary['categories']
             
             # Create a dataframe for the budget vs. actual
             budget_df = []
@@ -635,7 +652,7 @@ def show_budget():
                 <div style='margin-bottom: 15px;'>
                     <div style='display: flex; justify-content: space-between;'>
                         <span style='color: {color};'>● {cat}</span>
-                        <span>₹{spent:,} / ₹{allocated:,}</span>
+                        <span>{format_currency(spent)} / {format_currency(allocated)}</span>
                     </div>
                     <div style='background-color: #444; height: 8px; border-radius: 4px; margin-top: 5px;'>
                         <div style='background-color: {color}; width: {percentage}%; 
@@ -650,7 +667,7 @@ def show_budget():
             savings_percentage = min(100, round((estimated_savings / savings_target) * 100, 1)) if savings_target else 0
             
             st.progress(savings_percentage / 100)
-            st.markdown(f"**Target:** ₹{savings_target:,} - **Current:** ₹{max(0, estimated_savings):,} ({savings_percentage}%)")
+            st.markdown(f"**Target:** {format_currency(savings_target)} - **Current:** {format_currency(max(0, estimated_savings))} ({savings_percentage}%)")
             
             # Humorous tip
             if percentage_used > 80:
@@ -681,56 +698,41 @@ def show_budget():
             
             st.markdown("### Category Allocation (%)")
             
-            if user_budget:
-                default_categories = user_budget.get('categories', {
-                    "Food & Dining": 0.3,
-                    "Rent": 0.4,
-                    "Transportation": 0.1,
-                    "Shopping": 0.1,
-                    "Others": 0.1
-                })
-            else:
-                default_categories = {
-                    "Food & Dining": 0.3,
-                    "Rent": 0.4,
-                    "Transportation": 0.1,
-                    "Shopping": 0.1,
-                    "Others": 0.1
-                }
+            default_categories = snapshot.budget_shares
             
             food_pct = st.slider(
                 "Food & Dining",
                 min_value=0,
                 max_value=100,
-                value=int(default_categories.get("Food & Dining", 0.3) * 100)
+                value=round(default_categories.get("Food & Dining", 0.3) * 100)
             )
             
             rent_pct = st.slider(
                 "Rent",
                 min_value=0,
                 max_value=100,
-                value=int(default_categories.get("Rent", 0.4) * 100)
+                value=round(default_categories.get("Rent", 0.4) * 100)
             )
             
             transport_pct = st.slider(
                 "Transportation",
                 min_value=0,
                 max_value=100,
-                value=int(default_categories.get("Transportation", 0.1) * 100)
+                value=round(default_categories.get("Transportation", 0.1) * 100)
             )
             
             shopping_pct = st.slider(
                 "Shopping",
                 min_value=0,
                 max_value=100,
-                value=int(default_categories.get("Shopping", 0.1) * 100)
+                value=round(default_categories.get("Shopping", 0.1) * 100)
             )
             
             others_pct = st.slider(
                 "Others",
                 min_value=0,
                 max_value=100,
-                value=int(default_categories.get("Others", 0.1) * 100)
+                value=round(default_categories.get("Others", 0.1) * 100)
             )
             
             total_pct = food_pct + rent_pct + transport_pct + shopping_pct + others_pct
@@ -749,28 +751,20 @@ def show_budget():
                         "username": st.session_state.username,
                         "monthly_budget": monthly_budget,
                         "savings_target": savings_target,
-                        "categories": {
-                            "Food & Dining": food_pct / 100,
-                            "Rent": rent_pct / 100,
-                            "Transportation": transport_pct / 100,
-                            "Shopping": shopping_pct / 100,
-                            "Others": others_pct / 100
+                        "category_percent": {
+                            "Food & Dining": food_pct,
+                            "Rent": rent_pct,
+                            "Transportation": transport_pct,
+                            "Shopping": shopping_pct,
+                            "Others": others_pct
                         }
                     }
                     
-                    if user_budget:
-                        # Update existing budget
-                        for i, budget in enumerate(budget_data):
-                            if budget.get('username') == st.session_state.username:
-                                budget_data[i] = new_budget
-                                break
-                    else:
-                        # Add new budget
-                        budget_data.append(new_budget)
+                    if not user_budget:
                         # Award points for first budget
                         st.session_state.points += 20
                     
-                    save_budget_data(budget_data)
+                    save_user_budget(new_budget)
                     st.success("Budget saved successfully!")
                     st.rerun()
         
@@ -838,14 +832,14 @@ def show_investments():
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Investment", f"₹{total_investment:,}")
+            st.metric("Total Investment", format_currency(total_investment))
         
         with col2:
-            st.metric("Expected Returns", f"₹{expected_amount[-1]:,}")
+            st.metric("Expected Returns", format_currency(expected_amount[-1]))
         
         with col3:
             real_returns = expected_amount[-1] - total_investment
-            st.metric("Wealth Gained", f"₹{real_returns:,}")
+            st.metric("Wealth Gained", format_currency(real_returns))
         
         # Plot the growth
         st.subheader("Investment Growth Over Time")
@@ -919,14 +913,14 @@ def show_investments():
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Initial Investment", f"₹{lumpsum_investment:,}")
+            st.metric("Initial Investment", format_currency(lumpsum_investment))
         
         with col2:
-            st.metric("Expected Value", f"₹{expected_amount[-1]:,}")
+            st.metric("Expected Value", format_currency(expected_amount[-1]))
         
         with col3:
             real_returns = expected_amount[-1] - lumpsum_investment
-            st.metric("Wealth Gained", f"₹{real_returns:,}")
+            st.metric("Wealth Gained", format_currency(real_returns))
         
         # Plot the growth
         lumpsum_df = pd.DataFrame({
@@ -951,6 +945,128 @@ def show_investments():
         
         st.plotly_chart(fig, use_container_width=True)
         
+        # Every return rate and period at once, for the amounts above
+        st.subheader("Scenario Explorer")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            scenario_type = st.selectbox("Plan", ["SIP", "Lumpsum"], key="scenario_type")
+        
+        with col2:
+            scenario_value = st.radio("Show", ["Expected Value", "Inflation Adjusted"], horizontal=True, key="scenario_value")
+        
+        scenario_amount = monthly_investment if scenario_type == "SIP" else lumpsum_investment
+        scenario_inflation = inflation_rate if scenario_type == "SIP" else lumpsum_inflation
+        scenario_years = np.arange(1, 31)
+        scenario_rates = np.arange(1, 31)
+        _, expected_grid, inflation_adjusted_grid = calculate_scenario_grid(
+            scenario_type, scenario_amount, scenario_years, scenario_rates, scenario_inflation
+        )
+        grid = expected_grid if scenario_value == "Expected Value" else inflation_adjusted_grid
+        
+        fig = px.imshow(
+            grid[0, :, :, 0].T,
+            x=scenario_years,
+            y=scenario_rates,
+            origin="lower",
+            aspect="auto",
+            color_continuous_scale="Viridis",
+            labels={'x': 'Period (Years)', 'y': 'Annual Return (%)', 'color': 'Amount (₹)'},
+            title=f"{scenario_value} of {format_currency(scenario_amount)}{'/month' if scenario_type == 'SIP' else ''} "
+                  f"at {scenario_inflation}% inflation"
+        )
+        
+        fig.update_layout(height=500)
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Returns vary from year to year; simulate many possible paths
+        st.subheader("Monte Carlo Simulation")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            simulation_type = st.selectbox("Plan", ["SIP", "Lumpsum"], key="simulation_type")
+            volatility = st.slider("Annual Volatility (%)", min_value=0, max_value=40, value=15)
+        
+        with col2:
+            simulation_paths = st.select_slider("Simulated Paths", options=[1000, 5000, 10000, 50000], value=10000)
+            simulation_goal = st.number_input("Goal Amount (₹)", min_value=0, step=100000, value=0,
+                                              help="0 for no goal")
+        
+        if simulation_type == "SIP":
+            simulation_args = (monthly_investment, investment_period, expected_return_rate)
+        else:
+            simulation_args = (lumpsum_investment, lumpsum_period, lumpsum_return_rate)
+        # Seeded, so the chart doesn't change on unrelated reruns
+        years, p10, p50, p90, goal_probability = simulate_returns(
+            simulation_type, *simulation_args, volatility=volatility, paths=simulation_paths,
+            goal=simulation_goal or None, seed=42
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric("Pessimistic (P10)", format_currency(p10[-1]))
+        
+        with col2:
+            st.metric("Median (P50)", format_currency(p50[-1]))
+        
+        with col3:
+            st.metric("Optimistic (P90)", format_currency(p90[-1]))
+        
+        if goal_probability is not None:
+            st.markdown(f"**Chance of reaching {format_currency(simulation_goal)}:** {goal_probability:.0%}")
+        
+        fig = go.Figure([
+            go.Scatter(x=years, y=p90, mode='lines', line=dict(width=0), name='P90', showlegend=False),
+            go.Scatter(x=years, y=p10, mode='lines', line=dict(width=0), name='P10 to P90',
+                       fill='tonexty', fillcolor='rgba(76, 175, 80, 0.25)'),
+            go.Scatter(x=years, y=p50, mode='lines', line=dict(color='#4CAF50'), name='Median'),
+        ])
+        
+        fig.update_layout(
+            title="Range of Outcomes",
+            xaxis_title="Year",
+            yaxis_title="Amount (₹)",
+            legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5),
+            height=500
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # What it takes to reach a goal
+        st.subheader("Goal Planner")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            goal_amount = st.number_input("Goal (₹, in today's money)", min_value=10000, step=100000, value=1000000)
+            goal_years = st.slider("Years to Goal", min_value=1, max_value=40, value=10)
+            goal_return = st.slider("Expected Annual Return (%)", min_value=0, max_value=30, value=12, key="goal_return")
+        
+        with col2:
+            goal_inflation = st.slider("Expected Inflation Rate (%)", min_value=0, max_value=15, value=6, key="goal_inflation")
+            goal_step_up = st.slider("Yearly SIP Increase (%)", min_value=0, max_value=25, value=0)
+        
+        goal_sip = float(required_sip(goal_amount, goal_years, goal_return, goal_inflation, goal_step_up))
+        goal_duration = float(required_duration(monthly_investment, goal_amount, goal_return, goal_inflation, goal_step_up))
+        goal_rate = float(required_return(monthly_investment, goal_amount, goal_years, goal_inflation, goal_step_up))
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.metric(f"Monthly SIP for {goal_years} Years", format_currency(goal_sip))
+        
+        with col2:
+            duration_text = f"{goal_duration:.1f} years" if np.isfinite(goal_duration) else f"Over {MAX_YEARS} years"
+            st.metric(f"Time at {format_currency(monthly_investment)}/month", duration_text)
+        
+        with col3:
+            rate_text = f"{goal_rate:.1f}%" if not np.isnan(goal_rate) else "Out of reach"
+            st.metric(f"Return Needed at {format_currency(monthly_investment)}/month", rate_text)
+        
         # Save calculation as investment
         with st.expander("Save This Calculation"):
             investment_name = st.text_input("Investment Name", placeholder="e.g., My SIP Plan")
@@ -958,24 +1074,23 @@ def show_investments():
             
             if st.button("Save Investment Plan", use_container_width=True):
                 if investment_name:
-                    # Get investment data
-                    investment_data = get_investment_data()
-                    
                     # Create new investment
+                    amount = monthly_investment if investment_type == "SIP" else lumpsum_investment
+                    period = investment_period if investment_type == "SIP" else lumpsum_period
+                    return_rate = expected_return_rate if investment_type == "SIP" else lumpsum_return_rate
                     new_investment = {
                         "username": st.session_state.username,
                         "name": investment_name,
                         "type": investment_type,
-                        "amount": monthly_investment if investment_type == "SIP" else lumpsum_investment,
-                        "period": investment_period if investment_type == "SIP" else lumpsum_period,
-                        "return_rate": expected_return_rate if investment_type == "SIP" else lumpsum_return_rate,
+                        "amount": amount,
+                        "period": period,
+                        "return_rate": return_rate,
                         "created_date": datetime.now().strftime("%Y-%m-%d"),
-                        "id": str(random.randint(10000, 99999)),
-                        "growth": real_returns
+                        "id": generate_id(),
+                        "growth": plan_growth(investment_type, amount, period, return_rate)
                     }
                     
-                    investment_data.append(new_investment)
-                    save_investment_data(investment_data)
+                    add_investment(new_investment)
                     
                     # Award points
                     st.session_state.points += 15
@@ -989,21 +1104,21 @@ def show_investments():
         st.subheader("My Investment Plans")
         
         # Get investment data
-        investment_data = get_investment_data()
-        user_investments = [inv for inv in investment_data if inv.get('username') == st.session_state.username]
+        snapshot = user_snapshot()
+        user_investments = snapshot.investments
         
         if user_investments:
             # Calculate totals
-            total_sip = sum(inv.get('amount', 0) for inv in user_investments if inv.get('type') == 'SIP')
-            total_lumpsum = sum(inv.get('amount', 0) for inv in user_investments if inv.get('type') == 'Lumpsum')
+            total_sip = snapshot.investment_total('SIP')
+            total_lumpsum = snapshot.investment_total('Lumpsum')
             
             col1, col2 = st.columns(2)
             
             with col1:
-                st.metric("Total SIP Investment", f"₹{total_sip:,}/month")
+                st.metric("Total SIP Investment", f"{format_currency(total_sip)}/month")
             
             with col2:
-                st.metric("Total Lumpsum Investment", f"₹{total_lumpsum:,}")
+                st.metric("Total Lumpsum Investment", format_currency(total_lumpsum))
             
             # List all investments
             for investment in user_investments:
@@ -1012,19 +1127,18 @@ def show_investments():
                     
                     with col1:
                         st.markdown(f"**Type:** {investment.get('type', 'SIP')}")
-                        st.markdown(f"**Amount:** ₹{investment.get('amount', 0):,}" + 
+                        st.markdown(f"**Amount:** {format_currency(investment.get('amount', 0))}" + 
                                    ("/month" if investment.get('type') == 'SIP' else ""))
                         st.markdown(f"**Period:** {investment.get('period', 0)} years")
                     
                     with col2:
                         st.markdown(f"**Expected Return:** {investment.get('return_rate', 0)}%")
                         st.markdown(f"**Created Date:** {investment.get('created_date', '')}")
-                        st.markdown(f"**Projected Growth:** ₹{investment.get('growth', 0):,}")
+                        st.markdown(f"**Projected Growth:** {format_currency(investment.get('growth', 0))}")
                     
                     if st.button("Delete", key=f"delete_inv_{investment.get('id', '')}"):
                         # Remove the investment
-                        investment_data = [inv for inv in investment_data if inv.get('id') != investment.get('id', '')]
-                        save_investment_data(investment_data)
+                        delete_investment(investment.get('id', ''), st.session_state.username)
                         st.success("Investment plan deleted successfully!")
                         st.rerun()
         else:
@@ -1270,19 +1384,13 @@ def show_financial_assistant():
         st.subheader("Personalized Tip")
         
         # Get expense data
-        expense_data = get_expense_data()
-        user_expenses = [exp for exp in expense_data if exp.get('username') == st.session_state.username]
-        
-        if user_expenses:
-            # Analyze spending patterns
-            categories = {}
-            for expense in user_expenses:
-                category = expense.get('category', 'Others')
-                amount = expense.get('amount', 0)
-                categories[category] = categories.get(category, 0) + amount
-            
+        snapshot = user_snapshot()
+        
+        category_totals = snapshot.all_time_category_totals
+        
+        if category_totals:
             # Find highest spending category
-            highest_category = max(categories.items(), key=lambda x: x[1]) if categories else (None, 0)
+            highest_category = next(iter(category_totals.items()))
             
             if highest_category[0]:
                 tips_by_category = {
@@ -1303,74 +1411,13 @@ def show_financial_assistant():
     with tabs[2]:
         st.subheader("Financial Health Score")
         
-        # Get user data
-        expense_data = get_expense_data()
-        budget_data = get_budget_data()
-        investment_data = get_investment_data()
-        
-        user_expenses = [exp for exp in expense_data if exp.get('username') == st.session_state.username]
-        user_budget = next((b for b in budget_data if b.get('username') == st.session_state.username), None)
-        user_investments = [inv for inv in investment_data if inv.get('username') == st.session_state.username]
-        
-        # Calculate score components
-        budget_score = 0
-        expense_score = 0
-        investment_score = 0
-        savings_score = 0
-        
-        # Budget score (max 25 points)
-        if user_budget:
-            budget_score = 25
-        
-        # Expense tracking score (max 25 points)
-        if user_expenses:
-            # Award points based on consistency of tracking
-            days_tracked = len(set(exp.get('date', '') for exp in user_expenses))
-            current_month = datetime.now().strftime("%Y-%m")
-            month_expenses = [exp for exp in user_expenses if exp.get('date', '').startswith(current_month)]
-            
-            if days_tracked > 20:
-                expense_score = 25
-            elif days_tracked > 10:
-                expense_score = 15
-            elif days_tracked > 0:
-                expense_score = 10
-            
-            # Bonus for tracking in current month
-            if len(month_expenses) > 0:
-                expense_score = min(25, expense_score + 5)
-        
-        # Investment score (max 25 points)
-        if user_investments:
-            investment_count = len(user_investments)
-            investment_score = min(25, investment_count * 5)
-        
-        # Savings score (max 25 points)
-        if user_budget and user_expenses:
-            monthly_budget = user_budget.get('monthly_budget', 10000)
-            savings_target = user_budget.get('savings_target', 3000)
-            
-            # Calculate monthly expenses
-            current_month = datetime.now().strftime("%Y-%m")
-            monthly_expenses = sum(exp.get('amount', 0) for exp in user_expenses 
-                                  if exp.get('date', '').startswith(current_month))
-            
-            # Calculate savings rate
-            if monthly_expenses < monthly_budget:
-                actual_savings = monthly_budget - monthly_expenses
-                savings_rate = actual_savings / monthly_budget if monthly_budget else 0
-                
-                if savings_rate >= 0.2:  # Saving 20% or more
-                    savings_score = 25
-                elif savings_rate >= 0.1:  # Saving 10-20%
-                    savings_score = 20
-                elif savings_rate > 0:  # Saving something
-                    savings_score = 15
-            else:
-                savings_score = 0
-        
-        # Calculate total score
-        total_score = budget_score + expense_score + investment_score + savings_score
+        # Calculate score components (see UserSnapshot.health)
+        health = user_snapshot().health
+        budget_score = health["budget"]
+        expense_score = health["expenses"]
+        investment_score = health["investments"]
+        savings_score = health["savings"]
+        total_score = health["total"]
         
         # Display score
         st.markdown(f"### Your Financial Health Score: {total_score}/100")
@@ -0,0 +1,259 @@
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+from codec import get_codec
+from money import to_paise
+from records import validate_collection
+from writer import atomic_write, file_stat
+
+# Cold storage for old expense months.
+#
+# An archive is a directory of compressed per-month segments plus a small
+# index:
+#     index.json           {"version": 1, "months": {"2019-03": {"file": ...,
+#                           "rollup": {username: {category: [paise, count]}},
+#                           "days": {username: distinct days with expenses}}}}
+#     2019-03.json.gz      that month's expenses, all users, as a JSON array
+#
+# The index keeps every archived month's totals, so monthly summaries never
+# open a segment; segments are read only for queries that reach back into
+# archived months. Segments are gzip-compressed, or zstd when the zstandard
+# package is installed and FINSMART_ARCHIVE_COMPRESSION=zstd; readers go by
+# the file suffix, so both kinds can sit side by side.
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = {
+    "gzip": (".json.gz", lambda data: gzip.compress(data, 6), gzip.decompress),
+}
+if zstandard is not None:
+    COMPRESSIONS["zstd"] = (
+        ".json.zst",
+        lambda data: zstandard.ZstdCompressor(level=10).compress(data),
+        lambda data: zstandard.ZstdDecompressor().decompress(data),
+    )
+
+
+def _decompressor(filename):
+    for suffix, _, decompress in COMPRESSIONS.values():
+        if filename.endswith(suffix):
+            return decompress
+    raise ValueError(f"{filename}: unknown or unavailable segment compression")
+
+
+def month_of(date):
+    return date[:7]
+
+
+class ExpenseArchive:
+    """Compressed per-month expense segments in a directory
+
+    Writers (add, delete) must hold the owning engine's expenses lock;
+    readers don't lock. Up to cache_segments decoded segments are kept, so
+    paging through an old range doesn't decompress the same month twice.
+    """
+
+    VERSION = 1
+
+    def __init__(self, directory, codec=None, compression=None, cache_segments=24):
+        self.directory = directory
+        self.codec = codec or get_codec()
+        compression = compression or os.environ.get("FINSMART_ARCHIVE_COMPRESSION", "gzip")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Archive compression {compression!r} is not available "
+                             f"(have {', '.join(COMPRESSIONS)})")
+        self.compression = compression
+        self.index_file = os.path.join(directory, "index.json")
+        self.cache_segments = cache_segments
+        # (stat, months) of the index last read, replaced as a whole
+        self._index = None
+        self._segments = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Index
+    def _months(self):
+        """month -> {"file", "rollup"}, re-read when the index file changed"""
+        stat = file_stat(self.index_file)
+        snapshot = self._index
+        if snapshot is None or stat != snapshot[0]:
+            try:
+                with open(self.index_file, "rb") as f:
+                    months = self.codec.loads(f.read())["months"]
+            except FileNotFoundError:
+                months = {}
+            snapshot = self._index = (stat, months)
+        return snapshot[1]
+
+    def _write_index(self, months):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.index_file, self.codec.dumps({"version": self.VERSION, "months": months}))
+        self._index = None
+
+    def fingerprint(self):
+        return file_stat(self.index_file)
+
+    def months(self):
+        """Archived YYYY-MM months, oldest first"""
+        return sorted(self._months())
+
+    def reaches(self, start_date):
+        """Whether a range starting at start_date (None: all time) covers archived months"""
+        months = self.months()
+        return bool(months) and (start_date is None or month_of(start_date) <= months[-1])
+
+    def rollup(self, username=None):
+        """{username: {month: {category: (paise, count)}}} of the archived months"""
+        users = {}
+        for month, entry in self._months().items():
+            for user, categories in entry["rollup"].items():
+                if username is None or user == username:
+                    users.setdefault(user, {})[month] = {
+                        category: tuple(totals) for category, totals in categories.items()
+                    }
+        return users
+
+    def days_tracked(self, username):
+        """Number of distinct archived days a user spent on
+
+        Months archived before the index kept day counts count as one day.
+        """
+        return sum(
+            entry.get("days", {}).get(username, 1)
+            for entry in self._months().values() if username in entry["rollup"]
+        )
+
+    # Segments
+    def _segment(self, month):
+        """The records of an archived month (cached; callers must not modify them)"""
+        entry = self._months().get(month)
+        if entry is None:
+            return []
+        path = os.path.join(self.directory, entry["file"])
+        key = (month, file_stat(path))
+        with self._lock:
+            records = self._segments.get(key)
+            if records is not None:
+                self._segments.move_to_end(key)
+                return records
+        with open(path, "rb") as f:
+            records = self.codec.loads(_decompressor(path)(f.read()))
+        validate_collection("expenses", records, path)
+        with self._lock:
+            self._segments[key] = records
+            while len(self._segments) > self.cache_segments:
+                self._segments.popitem(last=False)
+        return records
+
+    def _user_months(self, username, start_date=None, end_date=None):
+        return [
+            month for month, entry in sorted(self._months().items())
+            if (username is None or username in entry["rollup"])
+            and (start_date is None or month >= month_of(start_date))
+            and (end_date is None or month <= month_of(end_date))
+        ]
+
+    def query(self, username, start_date=None, end_date=None):
+        """A user's archived expenses with start_date <= date <= end_date, oldest month first"""
+        return list(self.iter_records(username, start_date, end_date))
+
+    def iter_records(self, username=None, start_date=None, end_date=None):
+        """Like query (username None: every user's), decoding a month at a time"""
+        for month in self._user_months(username, start_date, end_date):
+            for exp in self._segment(month):
+                if ((username is None or exp.get('username') == username)
+                        and (start_date is None or exp.get('date', '') >= start_date)
+                        and (end_date is None or exp.get('date', '') <= end_date)):
+                    yield dict(exp)
+
+    def load_all(self):
+        """Every archived expense, oldest month first"""
+        return [dict(exp) for month in self.months() for exp in self._segment(month)]
+
+    def find(self, expense_id, username=None):
+        """The archived expense with this id, or None (newest months first)"""
+        for month in reversed(self._user_months(username)):
+            for exp in self._segment(month):
+                if exp.get('id') == expense_id:
+                    return dict(exp)
+        return None
+
+    # Writes
+    def _write_month(self, months, month, records):
+        suffix, compress, _ = COMPRESSIONS[self.compression]
+        filename = month + suffix
+        old = months.get(month)
+        if not records:
+            months.pop(month, None)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            atomic_write(os.path.join(self.directory, filename), compress(self.codec.dumps(records)))
+            months[month] = {"file": filename, "rollup": _rollup(records), "days": _days(records)}
+        if old is not None and (not records or old["file"] != filename):
+            # Replaced by a segment with another compression, or emptied
+            try:
+                os.remove(os.path.join(self.directory, old["file"]))
+            except FileNotFoundError:
+                pass
+
+    def add(self, expenses):
+        """Move expenses into their months' segments
+
+        Segments are written before the index, and the caller removes the
+        expenses from hot storage last, so a crash leaves them in both
+        places rather than in neither; readers drop the hot copies of
+        archived ids (see utils).
+        """
+        by_month = {}
+        for exp in expenses:
+            by_month.setdefault(month_of(exp.get('date', '')), []).append(exp)
+        months = dict(self._months())
+        for month, records in sorted(by_month.items()):
+            ids = {exp.get('id') for exp in records}
+            kept = [exp for exp in self._segment(month) if exp.get('id') not in ids]
+            self._write_month(months, month, kept + records)
+        self._write_index(months)
+
+    def rewrite(self, upgrade):
+        """Replace every archived expense with upgrade(expense), a month at a time"""
+        months = dict(self._months())
+        for month in sorted(months):
+            self._write_month(months, month, [upgrade(dict(exp)) for exp in self._segment(month)])
+        self._write_index(months)
+
+    def delete(self, expense_id, username=None):
+        """Remove an archived expense; True if it was found"""
+        months = dict(self._months())
+        for month in reversed(self._user_months(username)):
+            records = self._segment(month)
+            kept = [exp for exp in records if exp.get('id') != expense_id]
+            if len(kept) != len(records):
+                self._write_month(months, month, kept)
+                self._write_index(months)
+                return True
+        return False
+
+
+def _days(records):
+    """{username: number of distinct dates} of one month's records"""
+    dates = {}
+    for exp in records:
+        days = dates.setdefault(exp.get('username', ''), set())
+        if exp.get('date'):
+            days.add(exp['date'])
+    return {username: len(days) for username, days in dates.items()}
+
+
+def _rollup(records):
+    """{username: {category: [paise, count]}} of one month's records"""
+    users = {}
+    for exp in records:
+        categories = users.setdefault(exp.get('username', ''), {})
+        totals = categories.setdefault(exp.get('category', 'Others'), [0, 0])
+        totals[0] += to_paise(exp.get('amount', 0))
+        totals[1] += 1
+    return users
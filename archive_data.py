@@ -0,0 +1,27 @@
+import sys
+
+from utils import ARCHIVE_MONTHS, archive_old_expenses, get_storage
+
+# Moves old expense months out of the hot store into compressed per-month
+# segments (see archive.py). Run it from cron or by hand; the app reads the
+# archive again whenever a page asks for an old range or All Time.
+#
+# Usage: python archive_data.py [--months N]   archive everything older than
+#                                              the last N whole months
+#                                              (default FINSMART_ARCHIVE_MONTHS, 24)
+
+
+def main(args):
+    months = ARCHIVE_MONTHS
+    if args[:1] == ["--months"] and len(args) == 2 and args[1].isdigit():
+        months = int(args[1])
+    elif args:
+        sys.exit("Usage: python archive_data.py [--months N]")
+    if not hasattr(get_storage(), "archive_expenses"):
+        sys.exit("The configured storage engine doesn't support archiving")
+    moved = archive_old_expenses(months)
+    print(f"Archived {moved} expenses older than {months} months")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,544 @@
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from aggregation import by_category, by_day, by_month, expense_frame
+from codec import available_codecs, get_codec
+from columnar import ColumnarExpenses, write_columns
+from exports import export_expenses
+from goals import required_duration, required_return, required_sip
+from investment_calculator import calculate_lumpsum_returns, calculate_scenario_grid, calculate_sip_returns, simulate_returns
+from migrations import MIGRATIONS
+from records import CATEGORIES, Expense, freeze, freeze_collection, validate_collection
+from storage import ColumnarStorage, JSONStorage, ShardedStorage, SQLiteStorage, StorageEngine
+from statements import import_statement, read_statement
+from utils import CATEGORY_COLORS, set_storage
+from writer import WriteBehind
+
+# Micro-benchmarks for the data layer.
+#
+# Usage: python benchmarks.py [name ...]   (no names runs all of them)
+
+
+def make_expenses(count, users=1, start=date(2015, 1, 1), days=3650, seed=0):
+    """Synthetic expense records spread over users, categories and dates"""
+    rng = random.Random(seed)
+    categories = list(CATEGORY_COLORS)
+    return [
+        {
+            "username": f"user{rng.randrange(users)}",
+            "amount": rng.randrange(100, 500000) / 100,
+            "category": rng.choice(categories),
+            "date": (start + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d"),
+            "description": "",
+            "id": str(i),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(func, repeat=5):
+    """Best wall time of func() over repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def report(name, baseline_ms, optimized_ms):
+    print(f"  {name:<28} loop {baseline_ms:9.2f} ms   vectorized {optimized_ms:9.2f} ms   "
+          f"speedup {baseline_ms / optimized_ms:6.1f}x")
+
+
+def bench_aggregation(count=100_000):
+    """Page summaries: dict loops over records vs groupbys over the typed frame"""
+    expenses = make_expenses(count)
+    records = [Expense.from_dict(exp) for exp in expenses]
+    frame = expense_frame(records)
+    print(f"aggregation ({count:,} expenses for one user)")
+
+    def loop_by_key(key):
+        totals = {}
+        for expense in expenses:
+            k = key(expense)
+            totals[k] = totals.get(k, 0) + expense.get('amount', 0)
+        return totals
+
+    report("by category", timed(lambda: loop_by_key(lambda e: e.get('category', 'Others'))),
+           timed(lambda: by_category(frame)))
+    report("by day", timed(lambda: loop_by_key(lambda e: e.get('date', ''))),
+           timed(lambda: by_day(frame)))
+    report("by month", timed(lambda: loop_by_key(lambda e: e.get('date', '')[:7])),
+           timed(lambda: by_month(frame)))
+    print(f"  {'frame build (once per version)':<28} {timed(lambda: expense_frame(records), 1):9.2f} ms")
+
+
+def bench_columnar(count=500_000, users=1000):
+    """Opening expenses.json vs the memory-mapped columnar store"""
+    expenses = make_expenses(count, users=users)
+    print(f"columnar ({count:,} expenses, {users:,} users)")
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "expenses.json")
+        with open(json_path, "w") as f:
+            json.dump(expenses, f)
+        columns_path = os.path.join(tmp, "expenses.columns")
+        write_columns(columns_path, expenses, CATEGORY_COLORS)
+        del expenses
+
+        def load_json():
+            with open(json_path) as f:
+                return json.load(f)
+
+        json_ms = timed(load_json, 1)
+        columns_ms = timed(lambda: ColumnarExpenses(columns_path), 1)
+
+        tracemalloc.start()
+        data = load_json()
+        json_bytes = tracemalloc.get_traced_memory()[0]
+        del data
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        store = ColumnarExpenses(columns_path)
+        columns_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f"  {'open':<28} json {json_ms:9.2f} ms   columnar {columns_ms:9.2f} ms")
+        print(f"  {'heap after open':<28} json {json_bytes / 2**20:9.1f} MB   columnar {columns_bytes / 2**20:9.1f} MB")
+        print(f"  {'one user, one month':<28} {timed(lambda: store.user_records('user7', '2020-01-01', '2020-01-31')):9.3f} ms")
+        print(f"  {'one user frame':<28} {timed(lambda: store.user_frame('user7')):9.3f} ms")
+
+
+def bench_records(count=200_000):
+    """Frozen JSON dicts vs slotted records: heap size and a hot loop"""
+    expenses = make_expenses(count, users=100)
+    payload = json.dumps(expenses)
+    del expenses
+    print(f"records ({count:,} expenses, 100 users)")
+
+    tracemalloc.start()
+    frozen = freeze(json.loads(payload))
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    tracemalloc.start()
+    records = freeze_collection("expenses", json.loads(payload))
+    record_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    def loop_dicts():
+        return sum(exp.get('amount', 0) for exp in frozen if exp.get('category', 'Others') == "Rent")
+
+    def loop_records():
+        rent = CATEGORIES.code("Rent")
+        return sum(exp.paise for exp in records if exp.category_code == rent)
+
+    print(f"  {'heap':<28} dicts {dict_bytes / 2**20:9.1f} MB   records {record_bytes / 2**20:9.1f} MB")
+    print(f"  {'one category total':<28} dicts {timed(loop_dicts):9.2f} ms   records {timed(loop_records):9.2f} ms")
+
+
+def bench_codec(count=1_000_000):
+    """expenses.json save/load: the old indented stdlib dump vs each available codec"""
+    expenses = make_expenses(count, users=1000)
+    print(f"codec ({count:,} expenses)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "expenses.json")
+
+        def save_indented():
+            with open(path, "w") as f:
+                json.dump(expenses, f, indent=2)
+
+        def load_indented():
+            with open(path) as f:
+                return json.load(f)
+
+        save_ms = timed(save_indented, 1)
+        load_ms = timed(load_indented, 1)
+        print(f"  {'json, indent=2 (old)':<28} save {save_ms:8.0f} ms   load {load_ms:8.0f} ms   "
+              f"{os.path.getsize(path) / 2**20:6.1f} MB   {count / load_ms:6.0f} records/ms")
+
+        for name in available_codecs():
+            storage = JSONStorage(path, "", "", "", codec=get_codec(name))
+            save_ms = timed(lambda: storage.save_expenses(expenses), 1)
+            load_ms = timed(storage.load_expenses, 1)
+            print(f"  {name + ' + schema check':<28} save {save_ms:8.0f} ms   load {load_ms:8.0f} ms   "
+                  f"{os.path.getsize(path) / 2**20:6.1f} MB   {count / load_ms:6.0f} records/ms")
+        print(f"  {'schema check alone':<28} {timed(lambda: validate_collection('expenses', expenses), 1):8.0f} ms")
+
+
+def bench_archive(count=1_000_000, users=1000, months=24):
+    """Ten years of expenses: everything hot vs the last two years hot and the rest archived"""
+    print(f"archive ({count:,} expenses over 10 years, {users:,} users, {months} hot months)")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(os.path.join(tmp, "expenses.json"), "", "", "",
+                              archive_dir=os.path.join(tmp, "archive"))
+        storage.save_expenses(make_expenses(count, users=users))
+        hot_mb = os.path.getsize(storage.expense_file) / 2**20
+        all_hot_ms = timed(storage.load_expenses, 1)
+
+        end = date(2015, 1, 1) + timedelta(days=3650)
+        index = end.year * 12 + end.month - 1 - months
+        moved = storage.archive_expenses(f"{index // 12:04d}-{index % 12 + 1:02d}")
+        archive = storage.archive
+        archive_mb = sum(os.path.getsize(os.path.join(archive.directory, name))
+                         for name in os.listdir(archive.directory)) / 2**20
+        print(f"  {'hot expenses.json':<28} before {hot_mb:7.1f} MB   after "
+              f"{os.path.getsize(storage.expense_file) / 2**20:7.1f} MB   archive {archive_mb:6.1f} MB "
+              f"({moved:,} expenses in {len(archive.months())} segments)")
+        print(f"  {'load hot expenses':<28} before {all_hot_ms:7.0f} ms   after {timed(storage.load_expenses, 1):7.0f} ms")
+
+        def query(*dates):
+            archive._segments.clear()
+            return archive.query("user7", *dates)
+
+        # utils memoizes query results, so this is paid once per archive change
+        print(f"  {'one user, archived months':<28} all {timed(query, 1):7.0f} ms   "
+              f"one month {timed(lambda: query('2016-03-01', '2016-03-31'), 1):7.0f} ms")
+        print(f"  {'archived monthly rollup':<28} {timed(lambda: archive.rollup('user7')):7.1f} ms")
+
+
+def bench_streaming(count=1_000_000, users=1000):
+    """One user's expenses from expenses.json: full load then filter vs streaming"""
+    print(f"streaming ({count:,} expenses, {users:,} users)")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "expenses.json")
+        storage = JSONStorage(path, "", "", "", lazy_expenses=True)
+        storage.save_expenses(make_expenses(count, users=users))
+
+        def load_and_filter():
+            return [exp for exp in storage.load_expenses() if exp.get('username') == "user7"]
+
+        def peak_mb(func):
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak / 2**20
+
+        print(f"  {'time':<28} full load {timed(load_and_filter, 1):8.0f} ms   "
+              f"streaming {timed(lambda: storage.query_expenses('user7'), 1):8.0f} ms")
+        print(f"  {'peak heap':<28} full load {peak_mb(load_and_filter):8.1f} MB   "
+              f"streaming {peak_mb(lambda: storage.query_expenses('user7')):8.1f} MB")
+
+
+def bench_export(count=500_000, users=1000):
+    """All expenses to CSV: load everything into a DataFrame vs the streaming export"""
+    print(f"export ({count:,} expenses, {users:,} users)")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JSONStorage(os.path.join(tmp, "expenses.json"), "", "", "")
+        storage.save_expenses(make_expenses(count, users=users))
+        set_storage(storage)
+        out = os.path.join(tmp, "out.csv")
+
+        def load_all():
+            pd.DataFrame(storage.load_all_expenses()).to_csv(out, index=False)
+
+        for name, func in (("load all, DataFrame.to_csv", load_all),
+                           ("streaming csv", lambda: export_expenses(out, "csv")),
+                           ("streaming jsonl", lambda: export_expenses(out, "jsonl"))):
+            elapsed = timed(func, 1)
+            tracemalloc.start()
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            print(f"  {name:<28} {elapsed:8.0f} ms   peak heap {peak:8.1f} MB")
+
+
+def bench_import(count=100_000):
+    """A CSV statement: per-row parsing and adds vs the chunked import pipeline"""
+    print(f"import ({count:,} statement rows)")
+    rng = random.Random(0)
+    words = ["SWIGGY ORDER", "UBER TRIP", "AMAZON PAY", "NETFLIX", "RENT", "COFFEE", "MISC"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Txn Date,Narration,Withdrawal Amt.,Deposit Amt.\n")
+            for i in range(count):
+                day = date(2020, 1, 1) + timedelta(days=rng.randrange(1500))
+                f.write(f"{day:%d/%m/%Y},{rng.choice(words)} {i},\"{rng.uniform(1, 5000):,.2f}\",\n")
+
+        def per_row():
+            # What a csv.DictReader loop with strptime and one add per row costs
+            with open(path, encoding="utf-8") as f:
+                rows = [
+                    {"date": datetime.strptime(row["Txn Date"], "%d/%m/%Y").strftime("%Y-%m-%d"),
+                     "amount": float(row["Withdrawal Amt."].replace(",", "")),
+                     "description": row["Narration"]}
+                    for row in csv.DictReader(f)
+                ]
+            return rows
+
+        parse_ms = timed(per_row, 1)
+        print(f"  {'parse':<28} per row {parse_ms:8.0f} ms   chunked "
+              f"{timed(lambda: read_statement(path), 1):8.0f} ms")
+
+        storage = JSONStorage(*(os.path.join(tmp, name) for name in (
+            "expenses.json", "budgets.json", "investments.json", "users.json")))
+        storage.save_expenses([])
+        set_storage(storage)
+        sample = [{"username": "user7", "amount": 10.0, "category": "Others", "date": "2024-01-01",
+                   "description": "", "id": str(i)} for i in range(200)]
+        add_ms = timed(lambda: [storage.add_expense(exp) for exp in sample], 1) / len(sample)
+        import_ms = timed(lambda: import_statement(path, "user7"), 1)
+        print(f"  {'parse, dedup and store':<28} per row ~{parse_ms + add_ms * count:7.0f} ms   "
+              f"pipeline {import_ms:8.0f} ms   (per-row adds extrapolated from {len(sample)})")
+
+
+def bench_migration(users=300_000):
+    """Migration 2 over budgets.json: load, upgrade and save vs streaming rewrite"""
+    print(f"migration ({users:,} budgets)")
+    budgets = [{"username": f"user{i}", "monthly_budget": 10000, "savings_target": 3000,
+                "categories": {"Food & Dining": 0.3, "Rent": 0.4, "Transportation": 0.1,
+                               "Shopping": 0.1, "Others": 0.1}} for i in range(users)]
+    upgrade = next(m.upgrade for m in MIGRATIONS if m.kind == "budgets")
+    for name, rewrite in (("load and save", StorageEngine.rewrite_records),
+                          ("streaming", JSONStorage.rewrite_records)):
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = JSONStorage("", os.path.join(tmp, "budgets.json"), "", "")
+
+            def run():
+                storage.save_budgets(budgets)
+                rewrite(storage, "budgets", upgrade)
+
+            elapsed = timed(run, 1)
+            storage.save_budgets(budgets)
+            tracemalloc.start()
+            rewrite(storage, "budgets", upgrade)
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        # Time includes writing the old file first
+        print(f"  {name:<28} {elapsed:8.0f} ms   peak heap {peak:8.1f} MB")
+
+
+def bench_write_behind(burst=200, users=50):
+    """A burst of budget upserts and expense adds: durable writes each vs write-behind"""
+    print(f"write-behind (burst of {burst} budget upserts + {burst} expense adds)")
+    expenses = make_expenses(burst, users=users)
+    for max_latency in (None, 0.05):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = WriteBehind(max_latency) if max_latency is not None else None
+            storage = JSONStorage(*(os.path.join(tmp, name) for name in (
+                "expenses.json", "budgets.json", "investments.json", "users.json")), writer=writer)
+
+            def burst_writes():
+                for i, expense in enumerate(expenses):
+                    storage.upsert_budget({"username": f"user{i % users}", "monthly_budget": i})
+                    storage.add_expense(expense)
+
+            ms = timed(burst_writes, 1)
+            if writer is None:
+                label, writes = "write each (fsync)", 2 * burst
+            else:
+                writer.close()
+                label, writes = f"write-behind {max_latency * 1000:.0f} ms", writer.writes
+            print(f"  {label:<28} {ms:8.1f} ms   {ms * 1000 / (2 * burst):7.0f} us/write   "
+                  f"{writes:4d} file writes")
+
+
+def _stress_storage(engine, root):
+    files = [os.path.join(root, name) for name in ("budgets.json", "investments.json", "users.json")]
+    if engine == "json":
+        return JSONStorage(os.path.join(root, "expenses.json"), *files)
+    if engine == "columnar":
+        return ColumnarStorage(os.path.join(root, "expenses.columns"), *files, CATEGORY_COLORS)
+    if engine == "sharded":
+        return ShardedStorage(os.path.join(root, "shards"))
+    return SQLiteStorage(os.path.join(root, "finsmart.db"))
+
+
+def _stress_writer(engine, root, worker, count, users):
+    """count rounds of expense add, budget upsert and investment add/delete"""
+    storage = _stress_storage(engine, root)
+    for i in range(count):
+        username = f"user{(worker + i) % users}"
+        storage.add_expense({"username": username, "amount": 1.5, "category": "Food",
+                             "date": "2024-01-01", "description": "", "id": f"e{worker}-{i}"})
+        storage.upsert_budget({"username": username, "monthly_budget": worker * count + i})
+        storage.add_investment({"username": username, "name": "", "id": f"i{worker}-{i}"})
+        if i % 2:
+            storage.delete_investment(f"i{worker}-{i}", username)
+
+
+def bench_stress(workers=8, count=150, users=4):
+    """Concurrent writers, threads then processes, on one store
+
+    Several writers share each user, and the JSON engines share one file per
+    collection, so every write races others on the same file.
+    tests/test_concurrency.py checks that none of the updates are lost.
+    """
+    print(f"stress ({workers} writers x {count} rounds over {users} users)")
+    for engine in ("json", "columnar", "sharded", "sqlite"):
+        for mode in ("threads", "processes"):
+            with tempfile.TemporaryDirectory() as tmp:
+                storage = _stress_storage(engine, tmp)
+                if engine == "columnar":
+                    storage.save_expenses([])
+                jobs = [(engine, tmp, worker, count, users) for worker in range(workers)]
+                start = time.perf_counter()
+                if mode == "threads":
+                    with ThreadPoolExecutor(workers) as pool:
+                        list(pool.map(lambda job: _stress_writer(*job), jobs))
+                else:
+                    with multiprocessing.get_context("fork").Pool(workers) as pool:
+                        pool.starmap(_stress_writer, jobs)
+                ms = (time.perf_counter() - start) * 1000
+            print(f"  {engine + ', ' + mode:<28} {ms:8.0f} ms   "
+                  f"{workers * count * 3.5 / ms * 1000:7.0f} writes/s")
+
+
+def bench_calculator(years=30, repeat=1000):
+    """30-year SIP and lumpsum schedules: a pow() per period vs array exponentiation"""
+    print(f"calculator ({years}-year schedules, {repeat:,} calls each)")
+
+    def loop_sip(amount, rate, inflation, step):
+        # What calculate_sip_returns did, one period at a time
+        monthly_rate, inflation_monthly = rate / 100 / 12, inflation / 100 / 12
+        periods = years * 12 // step
+        invested, expected, adjusted = np.zeros(periods), np.zeros(periods), np.zeros(periods)
+        for i in range(periods):
+            months = (i + 1) * step
+            invested[i] = amount * months
+            expected[i] = amount * ((pow(1 + monthly_rate, months) - 1) / monthly_rate) * (1 + monthly_rate)
+            adjusted[i] = expected[i] / pow(1 + inflation_monthly, months)
+        return invested, expected, adjusted
+
+    def loop_lumpsum(amount, rate, inflation):
+        expected, adjusted = np.zeros(years), np.zeros(years)
+        for i in range(years):
+            expected[i] = amount * pow(1 + rate / 100, i + 1)
+            adjusted[i] = expected[i] / pow(1 + inflation / 100, i + 1)
+        return expected, adjusted
+
+    def calls(func):
+        return lambda: [func() for _ in range(repeat)]
+
+    report("sip, yearly", timed(calls(lambda: loop_sip(5000, 12, 6, 12))),
+           timed(calls(lambda: calculate_sip_returns(5000, years, 12, 6))))
+    report("sip, monthly", timed(calls(lambda: loop_sip(5000, 12, 6, 1))),
+           timed(calls(lambda: calculate_sip_returns(5000, years, 12, 6, monthly=True))))
+    report("lumpsum, yearly", timed(calls(lambda: loop_lumpsum(100000, 12, 6))),
+           timed(calls(lambda: calculate_lumpsum_returns(100000, years, 12, 6))))
+
+
+def bench_scenarios(amounts=20, years=30, rates=30, inflations=4):
+    """A grid of SIP scenarios: one calculate_sip_returns call each vs one broadcast call"""
+    amount_values = np.arange(1, amounts + 1) * 1000
+    year_values = np.arange(1, years + 1)
+    rate_values = np.arange(1, rates + 1)
+    inflation_values = np.arange(inflations) * 2 + 2
+    count = amounts * years * rates * inflations
+    print(f"scenarios ({count:,} SIP scenarios)")
+
+    def per_scenario():
+        return [
+            calculate_sip_returns(amount, int(period), rate, inflation)[2][-1]
+            for amount in amount_values for period in year_values
+            for rate in rate_values for inflation in inflation_values
+        ]
+
+    report("final values", timed(per_scenario, 1),
+           timed(lambda: calculate_scenario_grid("SIP", amount_values, year_values, rate_values, inflation_values)))
+
+
+def bench_monte_carlo(paths=10_000, years=30):
+    """SIP Monte Carlo: a Python loop per path and month vs chunked array simulation"""
+    print(f"monte carlo ({paths:,} paths, {years} years monthly)")
+    sample = 200
+
+    def per_path():
+        # Roughly simulate_returns' monthly parameters for 12% and 15% volatility
+        rng = random.Random(0)
+        sigma, mu = 0.0433, 0.0091
+        finals = []
+        for _ in range(sample):
+            value = 0.0
+            for _ in range(years * 12):
+                value = (value + 5000) * pow(2.718281828459045, rng.gauss(mu, sigma))
+            finals.append(value)
+        return finals
+
+    loop_ms = timed(per_path, 1) * paths / sample
+    # The loop is timed over sample paths and scaled up
+    report("simulate", loop_ms, timed(lambda: simulate_returns("SIP", 5000, years, 12, paths=paths, seed=0), 1))
+    for chunk in (paths, 2_000):
+        tracemalloc.start()
+        simulate_returns("SIP", 5000, years, 12, paths=paths, seed=0, chunk_paths=chunk)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        print(f"  {f'chunks of {chunk:,} paths':<28} peak heap {peak:8.1f} MB")
+
+
+def bench_goals(count=500):
+    """Solving goals: a scalar loop per goal vs one array call for all of them"""
+    print(f"goals ({count:,} goals with inflation and step-ups)")
+    rng = np.random.default_rng(0)
+    targets = rng.uniform(1e5, 5e7, count)
+    years = rng.integers(1, 31, count)
+    rates = rng.uniform(0, 20, count)
+    inflation = rng.uniform(0, 8, count)
+    step_up = rng.choice([0, 5, 10], count)
+    amounts = rng.uniform(1000, 50000, count)
+
+    def value(amount, months, rate, step):
+        # The month-by-month SIP value
+        total = 0.0
+        for month in range(months):
+            total = (total + amount * (1 + step / 100) ** (month // 12)) * (1 + rate / 100 / 12)
+        return total
+
+    def goal(i, months):
+        return targets[i] * (1 + inflation[i] / 100 / 12) ** months
+
+    def per_goal_sip():
+        return [goal(i, years[i] * 12) / value(1, years[i] * 12, rates[i], step_up[i]) for i in range(count)]
+
+    def per_goal_duration():
+        months = []
+        for i in range(count):
+            total, month = 0.0, 0
+            while total < goal(i, month) and month < 1200:
+                month += 1
+                total = (total + amounts[i] * (1 + step_up[i] / 100) ** ((month - 1) // 12)) * (1 + rates[i] / 100 / 12)
+            months.append(month if total >= goal(i, month) else np.inf)
+        return np.array(months) / 12
+
+    report("required sip", timed(per_goal_sip, 1),
+           timed(lambda: required_sip(targets, years, rates, inflation, step_up)))
+    report("required duration", timed(per_goal_duration, 1),
+           timed(lambda: required_duration(amounts, targets, rates, inflation, step_up)))
+    print(f"  {'required return':<28} {timed(lambda: required_return(amounts, targets, years, inflation, step_up)):9.2f} ms")
+
+
+BENCHMARKS = {
+    "aggregation": bench_aggregation,
+    "archive": bench_archive,
+    "calculator": bench_calculator,
+    "codec": bench_codec,
+    "columnar": bench_columnar,
+    "export": bench_export,
+    "goals": bench_goals,
+    "import": bench_import,
+    "migration": bench_migration,
+    "monte-carlo": bench_monte_carlo,
+    "records": bench_records,
+    "scenarios": bench_scenarios,
+    "stress": bench_stress,
+    "streaming": bench_streaming,
+    "write-behind": bench_write_behind,
+}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,183 @@
+import json
+import os
+import re
+
+# JSON codecs for the storage files.
+#
+# A codec turns Python data into compact UTF-8 JSON bytes and back. orjson
+# and msgspec are used when installed; otherwise the standard library does
+# the work. FINSMART_JSON_CODEC picks one explicitly ("json", "orjson" or
+# "msgspec"); the default is the fastest one available. Every codec raises
+# ValueError on malformed input.
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+class StdlibCodec:
+    """The standard library json module, without indentation or ASCII escaping"""
+
+    name = "json"
+
+    def dumps(self, data):
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def dumps(self, data):
+        return orjson.dumps(data)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, data):
+        return self._encoder.encode(data)
+
+    def loads(self, data):
+        try:
+            return self._decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+
+CODECS = {
+    "json": StdlibCodec,
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+}
+
+
+def available_codecs():
+    """Names of the codecs that can be used here, fastest first"""
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+def get_codec(name=None):
+    """A codec by name, or the FINSMART_JSON_CODEC / fastest available one"""
+    name = name or os.environ.get("FINSMART_JSON_CODEC") or available_codecs()[0]
+    if name not in available_codecs():
+        raise ValueError(f"JSON codec {name!r} is not available (have {', '.join(available_codecs())})")
+    return CODECS[name]()
+
+
+# Streaming decode. None of the codecs above can parse incrementally, so
+# this uses the stdlib decoder one array element at a time.
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+
+
+class _Buffer:
+    """A window of text over a file, refilled as decoding moves forward"""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk, dropping consumed text; False at end of file"""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, or '' at end of file"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+
+def _decode_value(buf, decoder):
+    """Decode the JSON value at the buffer position, refilling as needed"""
+    if buf.peek() == "":
+        raise ValueError("unexpected end of JSON input")
+    while True:
+        try:
+            value, end = decoder.raw_decode(buf.text, buf.pos)
+        except json.JSONDecodeError:
+            # Probably a value cut off at the end of the window
+            if not buf.fill():
+                raise
+            continue
+        # A number that reaches the end of the window may continue in the
+        # next chunk ("1." decodes as 1)
+        if isinstance(value, (int, float)) and _NUMBER_TAIL.fullmatch(buf.text, end) and buf.fill():
+            continue
+        buf.pos = end
+        return value
+
+
+def _iter_container(f, chunk_size, opening, closing, keyed):
+    decoder = json.JSONDecoder()
+    buf = _Buffer(f, chunk_size)
+    if buf.peek() != opening:
+        raise ValueError(f"expected a JSON {'object' if keyed else 'array'}")
+    buf.pos += 1
+    if buf.peek() == closing:
+        return
+    while True:
+        if keyed:
+            key = _decode_value(buf, decoder)
+            if not isinstance(key, str) or buf.peek() != ":":
+                raise ValueError("expected a string key and ':' in JSON object")
+            buf.pos += 1
+            yield key, _decode_value(buf, decoder)
+        else:
+            yield _decode_value(buf, decoder)
+        separator = buf.peek()
+        if separator == closing:
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or '{closing}'")
+        buf.pos += 1
+
+
+def iter_json_array(f, chunk_size=1 << 20):
+    """Yield the elements of a top-level JSON array in a text file, one at a time
+
+    Only the current element and about one chunk of text are held in memory,
+    so a caller that keeps few elements never holds the whole file. Raises
+    ValueError on malformed input.
+    """
+    return _iter_container(f, chunk_size, "[", "]", keyed=False)
+
+
+def iter_json_object(f, chunk_size=1 << 20):
+    """Yield the (key, value) pairs of a top-level JSON object, like iter_json_array"""
+    return _iter_container(f, chunk_size, "{", "}", keyed=True)
@@ -0,0 +1,255 @@
+import json
+import os
+import shutil
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from aggregation import FRAME_COLUMNS
+from money import to_paise, to_rupees
+
+# Columnar on-disk format for expenses, read through memory maps.
+#
+# A store is a directory holding a CURRENT file that names the active
+# generation, and one sub-directory per generation with:
+#   meta.json            count, usernames, per-user row ranges, categories
+#   user.npy             int32 username code
+#   date.npy             int32 days since 1970-01-01 (MISSING_DATE if invalid)
+#   amount.npy           int64 paise
+#   category.npy         int16 category code
+#   id_offsets.npy       int64 offsets into id_heap.bin (count + 1 entries)
+#   id_heap.bin          utf-8 ids, concatenated
+#   id_order.npy         int64 row numbers ordered by id, for lookups
+#   description_offsets.npy / description_heap.bin   same, for descriptions
+#
+# Rows are sorted by (username, date), so a user's expenses are one
+# contiguous, date-ordered slice. Writing a new generation and then swapping
+# CURRENT keeps readers of the old generation valid until they reopen.
+
+MISSING_DATE = np.iinfo(np.int32).min
+
+
+def _days(date_str):
+    try:
+        day = np.datetime64(date_str, "D")
+    except ValueError:
+        return MISSING_DATE
+    # "" and "NaT" parse, as NaT, instead of raising
+    if np.isnat(day):
+        return MISSING_DATE
+    return int(day.astype(np.int64))
+
+
+def _heap(strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def write_columns(path, expenses, categories=()):
+    """Write expenses as a new generation of the store at path and make it current"""
+    expenses = sorted(expenses, key=lambda exp: (exp.get('username', ''), exp.get('date', '')))
+    usernames = []
+    user_ranges = []
+    user_codes = {}
+    for row, expense in enumerate(expenses):
+        username = expense.get('username', '')
+        if username not in user_codes:
+            user_codes[username] = len(usernames)
+            usernames.append(username)
+            user_ranges.append([row, row])
+        user_ranges[user_codes[username]][1] = row + 1
+
+    categories = list(categories)
+    category_codes = {category: code for code, category in enumerate(categories)}
+    for expense in expenses:
+        category = expense.get('category', 'Others')
+        if category not in category_codes:
+            category_codes[category] = len(categories)
+            categories.append(category)
+
+    ids = [str(exp.get('id', '')) for exp in expenses]
+    id_offsets, id_heap = _heap(ids)
+    description_offsets, description_heap = _heap([exp.get('description', '') for exp in expenses])
+    columns = {
+        "user": np.array([user_codes[exp.get('username', '')] for exp in expenses], dtype=np.int32),
+        "date": np.array([_days(exp.get('date', '')) for exp in expenses], dtype=np.int32),
+        "amount": np.array([to_paise(exp.get('amount', 0)) for exp in expenses], dtype=np.int64),
+        "category": np.array([category_codes[exp.get('category', 'Others')] for exp in expenses], dtype=np.int16),
+        "id_offsets": id_offsets,
+        "id_order": np.array(sorted(range(len(ids)), key=ids.__getitem__), dtype=np.int64),
+        "description_offsets": description_offsets,
+    }
+    meta = {
+        "count": len(expenses),
+        "usernames": usernames,
+        "user_ranges": user_ranges,
+        "categories": categories,
+    }
+
+    os.makedirs(path, exist_ok=True)
+    previous = current_generation(path)
+    generation = f"g{int(previous[1:]) + 1 if previous else 1:06d}"
+    gen_dir = os.path.join(path, generation)
+    os.makedirs(gen_dir)
+    # Everything in the generation is on disk before CURRENT names it, so a
+    # crash can't leave CURRENT pointing at truncated files
+    for name, array in columns.items():
+        _write_durably(os.path.join(gen_dir, f"{name}.npy"), lambda f: np.save(f, array))
+    for name, heap in (("id_heap", id_heap), ("description_heap", description_heap)):
+        _write_durably(os.path.join(gen_dir, f"{name}.bin"), lambda f: f.write(heap))
+    _write_durably(os.path.join(gen_dir, "meta.json"), lambda f: f.write(json.dumps(meta).encode()))
+    _fsync_dir(gen_dir)
+    _fsync_dir(path)
+
+    tmp_path = os.path.join(path, "CURRENT.tmp")
+    _write_durably(tmp_path, lambda f: f.write(generation.encode()))
+    os.replace(tmp_path, os.path.join(path, "CURRENT"))
+    # The rename itself, before the older generations go
+    _fsync_dir(path)
+
+    # Keep the previous generation for readers that looked up CURRENT just
+    # before the swap; anything older is unreachable
+    for name in os.listdir(path):
+        if name.startswith("g") and name not in (generation, previous):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def _write_durably(path, write):
+    """Write a file with write(binary file object) and fsync it"""
+    with open(path, "wb") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(path):
+    """Make the entries created or renamed in a directory durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def current_generation(path):
+    """Name of the active generation, or None if the store doesn't exist"""
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ColumnarExpenses:
+    """Read-only, memory-mapped view of one generation of a columnar store"""
+
+    def __init__(self, path):
+        self.generation = current_generation(path)
+        self._dir = os.path.join(path, self.generation) if self.generation else None
+        if self._dir is None:
+            meta = {"count": 0, "usernames": [], "user_ranges": [], "categories": []}
+        else:
+            with open(os.path.join(self._dir, "meta.json")) as f:
+                meta = json.load(f)
+        self.count = meta["count"]
+        self.usernames = meta["usernames"]
+        self.categories = meta["categories"]
+        self._user_ranges = {u: tuple(r) for u, r in zip(meta["usernames"], meta["user_ranges"])}
+
+        self.user = self._array("user", np.int32)
+        self.date = self._array("date", np.int32)
+        self.amount = self._array("amount", np.int64)
+        self.category = self._array("category", np.int16)
+        self._id_offsets = self._array("id_offsets", np.int64, extra=1)
+        self._id_order = self._array("id_order", np.int64)
+        self._id_heap = self._bytes("id_heap")
+        self._description_offsets = self._array("description_offsets", np.int64, extra=1)
+        self._description_heap = self._bytes("description_heap")
+
+    def _array(self, name, dtype, extra=0):
+        if self._dir is None:
+            return np.zeros(extra, dtype=dtype)
+        return np.load(os.path.join(self._dir, f"{name}.npy"), mmap_mode="r")
+
+    def _bytes(self, name):
+        path = os.path.join(self._dir, f"{name}.bin") if self._dir else None
+        if path is None or os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, heap, offsets, row):
+        return bytes(heap[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    def record_id(self, row):
+        return self._string(self._id_heap, self._id_offsets, row)
+
+    def record(self, row):
+        """Decode one row back into the JSON record layout"""
+        days = int(self.date[row])
+        return {
+            "username": self.usernames[self.user[row]],
+            "amount": to_rupees(self.amount[row]),
+            "category": self.categories[self.category[row]],
+            "date": "" if days == MISSING_DATE else str(np.datetime64(days, "D")),
+            "description": self._string(self._description_heap, self._description_offsets, row),
+            "id": self.record_id(row),
+        }
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield self.record(row)
+
+    def user_rows(self, username, start_date=None, end_date=None):
+        """(start, stop) row range of a user's expenses within an inclusive date range"""
+        start, stop = self._user_ranges.get(username, (0, 0))
+        dates = self.date[start:stop]
+        lo = 0 if start_date is None else int(np.searchsorted(dates, _days(start_date), side="left"))
+        hi = stop - start if end_date is None else int(np.searchsorted(dates, _days(end_date), side="right"))
+        return start + lo, start + max(lo, hi)
+
+    def user_records(self, username, start_date=None, end_date=None):
+        """A user's expenses within an inclusive date range, oldest first"""
+        start, stop = self.user_rows(username, start_date, end_date)
+        return [self.record(row) for row in range(start, stop)]
+
+    def user_frame(self, username):
+        """A user's expenses in the aggregation.py frame layout"""
+        start, stop = self.user_rows(username)
+        dates = np.asarray(self.date[start:stop]).astype("datetime64[D]")
+        dates[np.asarray(self.date[start:stop]) == MISSING_DATE] = np.datetime64("NaT")
+        return pd.DataFrame({
+            "id": [self.record_id(row) for row in range(start, stop)],
+            "date": dates.astype("datetime64[ns]"),
+            "category": pd.Categorical.from_codes(np.asarray(self.category[start:stop]), self.categories),
+            "amount": np.asarray(self.amount[start:stop]),
+            "description": [
+                self._string(self._description_heap, self._description_offsets, row) for row in range(start, stop)
+            ],
+        }, columns=FRAME_COLUMNS)
+
+    def find(self, expense_id):
+        """Row number of the expense with this id, or None"""
+        ids = _SortedIds(self)
+        i = bisect_left(ids, expense_id)
+        if i < len(ids) and ids[i] == expense_id:
+            return int(self._id_order[i])
+        return None
+
+
+class _SortedIds:
+    """The store's ids in sorted order, decoded on access, for bisect"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store._id_order)
+
+    def __getitem__(self, i):
+        return self._store.record_id(self._store._id_order[i])
@@ -0,0 +1,34 @@
+import os
+import sys
+
+from exports import FORMATS, export_expenses
+
+# Exports expense history, archived months included, to CSV, JSON Lines or
+# Parquet (see exports.py). The format comes from the file's extension.
+#
+# Usage: python export_data.py FILE [--user NAME] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+#                              everyone's expenses unless --user is given
+
+USAGE = ("Usage: python export_data.py FILE.{csv,jsonl,parquet} "
+         "[--user NAME] [--from YYYY-MM-DD] [--to YYYY-MM-DD]")
+
+
+def main(args):
+    if not args or args[0].startswith("--") or len(args) % 2 != 1:
+        sys.exit(USAGE)
+    path, options = args[0], dict(zip(args[1::2], args[2::2]))
+    if set(options) - {"--user", "--from", "--to"}:
+        sys.exit(USAGE)
+    extension = os.path.splitext(path)[1].lower()
+    fmt = next((fmt for fmt, suffix in FORMATS.items() if suffix == extension), None)
+    if fmt is None:
+        sys.exit(USAGE)
+    try:
+        count = export_expenses(path, fmt, options.get("--user"), options.get("--from"), options.get("--to"))
+    except (OSError, ValueError) as e:
+        sys.exit(f"{path}: {e}")
+    print(f"Exported {count} expenses to {path}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,126 @@
+import csv
+import io
+import os
+
+from codec import get_codec
+from utils import get_storage
+
+# Streaming export of expense history.
+#
+# Records come from StorageEngine.iter_all_expenses, which streams the hot
+# data and decodes archived months one at a time, and are written
+# CHUNK_SIZE at a time, so memory stays flat however many years are
+# exported. Parquet needs the optional pyarrow package.
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+CHUNK_SIZE = 10_000
+
+FORMATS = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet"}
+
+# Columns of the CSV and Parquet files. JSON Lines has each stored record
+# whole.
+COLUMNS = ("date", "username", "category", "amount", "description", "id")
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != "parquet" or pyarrow is not None]
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _row(expense):
+    return (
+        expense.get('date', ''),
+        expense.get('username', ''),
+        expense.get('category', 'Others'),
+        expense.get('amount', 0),
+        expense.get('description', ''),
+        expense.get('id', ''),
+    )
+
+
+def _write_csv(f, chunks):
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+    count = 0
+    for chunk in chunks:
+        writer.writerows(
+            (date, username, category, f"{amount:.2f}", description, expense_id)
+            for date, username, category, amount, description, expense_id in map(_row, chunk)
+        )
+        count += len(chunk)
+    text.flush()
+    # Leave f open for the caller
+    text.detach()
+    return count
+
+
+def _write_jsonl(f, chunks):
+    codec = get_codec()
+    count = 0
+    for chunk in chunks:
+        f.write(b"".join(codec.dumps(expense) + b"\n" for expense in chunk))
+        count += len(chunk)
+    return count
+
+
+def _write_parquet(f, chunks):
+    schema = pyarrow.schema([
+        (column, pyarrow.float64() if column == "amount" else pyarrow.string()) for column in COLUMNS
+    ])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(f, schema) as writer:
+        for chunk in chunks:
+            # One row group per chunk
+            columns = list(zip(*map(_row, chunk)))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(list(values), column_type) for values, column_type in zip(columns, schema.types)],
+                schema=schema
+            ))
+            count += len(chunk)
+    return count
+
+
+WRITERS = {"csv": _write_csv, "jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def export_expenses(out, fmt, username=None, start_date=None, end_date=None, chunk_size=CHUNK_SIZE):
+    """Write expenses to out (a path or a binary file object) as csv, jsonl or parquet
+
+    Only username's (None: everyone's), and only those within an inclusive
+    YYYY-MM-DD date range. Archived months come first, oldest first.
+    Returns the number of expenses written. A path is written through a
+    temp file, so it never holds half an export.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r} (have {', '.join(FORMATS)})")
+    if fmt not in available_formats():
+        raise ValueError(f"Exporting {fmt} needs the pyarrow package")
+    chunks = _chunks(get_storage().iter_all_expenses(username, start_date, end_date), chunk_size)
+    if not isinstance(out, (str, os.PathLike)):
+        return WRITERS[fmt](out, chunks)
+    tmp_path = os.fspath(out) + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            count = WRITERS[fmt](f, chunks)
+        os.replace(tmp_path, out)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return count
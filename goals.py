@@ -0,0 +1,173 @@
+import numpy as np
+
+# Solvers for savings goals: the monthly SIP, the time or the annual return
+# needed to reach a target.
+#
+# Every argument may be a scalar or an array, and arrays broadcast, so a
+# whole list of goals is solved in one call. SIPs follow calculate_sip_returns:
+# each instalment is invested at the start of its month, returns compound
+# monthly, and the value is taken at the end of the month. A step-up raises
+# the instalment by that percentage every year, and targets are in today's
+# money, grown by inflation (compounded monthly) to the date of the goal.
+
+# Longest duration required_duration looks at
+MAX_YEARS = 100
+
+# Annual return range (percent) required_return searches
+RETURN_RANGE = (-50, 200)
+
+
+def _arrays(*values):
+    return np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in values))
+
+
+def _annuity(monthly_rate, months):
+    """Value at the end of months of 1 invested at the start of each month"""
+    growth = 1 + monthly_rate
+    safe_rate = np.where(monthly_rate == 0, 1, monthly_rate)
+    return np.where(monthly_rate == 0, months, (growth ** months - 1) / safe_rate * growth)
+
+
+def _goal_target(target_amount, months, inflation_rate):
+    """A target in today's money, in money of months from now"""
+    return target_amount * (1 + inflation_rate / 100 / 12) ** months
+
+
+def sip_future_value(monthly_investment, months, expected_return_rate, step_up=0):
+    """
+    Value of a SIP after a whole number of months
+
+    Parameters:
+    monthly_investment (float or array): First year's monthly investment
+    months (int or array): Number of months invested
+    expected_return_rate (float or array): Expected annual return rate in percentage
+    step_up (float or array): Yearly increase of the monthly investment in percentage
+
+    Returns:
+    array: Expected value at the end of the last month
+    """
+    amount, months, rate, step = _arrays(monthly_investment, months, expected_return_rate, step_up)
+    monthly_rate = rate / 100 / 12
+    full_years, rest = np.divmod(months, 12)
+    # Each full year's instalments, grown to the end of the last full year:
+    # year y's are worth annuity(12) * (1 + step)^y * (1 + r)^(12 * (years - 1 - y))
+    years = np.arange(int(full_years.max(initial=0)))
+    remaining = full_years[..., None] - 1 - years
+    yearly = np.where(
+        remaining >= 0,
+        (1 + step[..., None] / 100) ** years * (1 + monthly_rate[..., None]) ** (12 * np.maximum(remaining, 0)),
+        0
+    ).sum(axis=-1)
+    full_value = amount * _annuity(monthly_rate, 12) * yearly
+    # Then the months of the last, partial year
+    return (full_value * (1 + monthly_rate) ** rest
+            + amount * (1 + step / 100) ** full_years * _annuity(monthly_rate, rest))
+
+
+def required_sip(target_amount, years, expected_return_rate, inflation_rate=0, step_up=0):
+    """
+    Monthly SIP needed to reach a goal
+
+    Parameters:
+    target_amount (float or array): Target amount, in today's money
+    years (int or array): Investment period in years
+    expected_return_rate (float or array): Expected annual return rate in percentage
+    inflation_rate (float or array): Expected annual inflation rate in percentage
+    step_up (float or array): Yearly increase of the monthly investment in percentage
+
+    Returns:
+    array: First year's monthly investment (inf for a period of 0 years)
+    """
+    target, years, rate, inflation, step = _arrays(target_amount, years, expected_return_rate, inflation_rate, step_up)
+    months = np.round(years * 12)
+    # The value is proportional to the instalment, so this is exact
+    value_of_one = sip_future_value(1, months, rate, step)
+    with np.errstate(divide="ignore"):
+        return _goal_target(target, months, inflation) / value_of_one
+
+
+def required_duration(monthly_investment, target_amount, expected_return_rate, inflation_rate=0, step_up=0,
+                      max_years=MAX_YEARS):
+    """
+    Time needed to reach a goal with a monthly SIP
+
+    Parameters:
+    monthly_investment (float or array): First year's monthly investment
+    target_amount (float or array): Target amount, in today's money
+    expected_return_rate (float or array): Expected annual return rate in percentage
+    inflation_rate (float or array): Expected annual inflation rate in percentage
+    step_up (float or array): Yearly increase of the monthly investment in percentage
+    max_years (int): Longest duration considered
+
+    Returns:
+    array: Years (in whole months) until the value first reaches the target;
+    inf where it doesn't within max_years
+    """
+    amount, target, rate, inflation, step = _arrays(
+        monthly_investment, target_amount, expected_return_rate, inflation_rate, step_up
+    )
+    max_months = max_years * 12
+    months = np.full(amount.shape, np.inf)
+
+    # A fixed SIP towards a fixed target has a closed form:
+    # (1 + r)^n = 1 + target * r / (amount * (1 + r))
+    plain = (inflation == 0) & (step == 0) & (amount > 0)
+    monthly_rate = rate[plain] / 100 / 12
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exact = np.where(
+            monthly_rate == 0,
+            target[plain] / amount[plain],
+            np.log1p(target[plain] * monthly_rate / (amount[plain] * (1 + monthly_rate))) / np.log1p(monthly_rate)
+        )
+    # Rounding up to whole months; the tolerance keeps an exact fit from
+    # going a month over
+    exact = np.maximum(np.ceil(exact - 1e-9), 0)
+    months[plain] = np.where(exact <= max_months, exact, np.inf)
+
+    # The rest are looked up in their month-by-month values: with inflation
+    # the target can pull ahead again, so the first month reached is wanted
+    rest = ~plain & (amount > 0)
+    if rest.any():
+        growth = 1 + rate[rest, None] / 100 / 12
+        month = np.arange(1, max_months + 1)
+        instalments = amount[rest, None] * (1 + step[rest, None] / 100) ** ((month - 1) // 12)
+        # Month k's instalment is worth instalment * growth^(m - k + 1) at the end of month m
+        values = growth ** (month + 1) * np.cumsum(instalments * growth ** -month, axis=1)
+        reached = values >= _goal_target(target[rest, None], month, inflation[rest, None])
+        months[rest] = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, np.inf)
+    months[(amount >= 0) & (target <= 0)] = 0
+    return months / 12
+
+
+def required_return(monthly_investment, target_amount, years, inflation_rate=0, step_up=0, iterations=60):
+    """
+    Annual return needed to reach a goal with a monthly SIP
+
+    Found by bisection over RETURN_RANGE, all goals at once.
+
+    Parameters:
+    monthly_investment (float or array): First year's monthly investment
+    target_amount (float or array): Target amount, in today's money
+    years (int or array): Investment period in years
+    inflation_rate (float or array): Expected annual inflation rate in percentage
+    step_up (float or array): Yearly increase of the monthly investment in percentage
+    iterations (int): Bisection steps; 60 narrows the range to the float's precision
+
+    Returns:
+    array: Annual return rate in percentage; nan where no rate in RETURN_RANGE fits
+    """
+    amount, target, years, inflation, step = _arrays(monthly_investment, target_amount, years, inflation_rate, step_up)
+    months = np.round(years * 12)
+    goal = _goal_target(target, months, inflation)
+    low = np.full(amount.shape, float(RETURN_RANGE[0]))
+    high = np.full(amount.shape, float(RETURN_RANGE[1]))
+    # The value only grows with the rate, so the rate is bracketed when the
+    # lowest one falls short and the highest one gets there
+    bracketed = ((sip_future_value(amount, months, low, step) <= goal)
+                 & (sip_future_value(amount, months, high, step) >= goal))
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        reached = sip_future_value(amount, months, middle, step) >= goal
+        high = np.where(reached, middle, high)
+        low = np.where(reached, low, middle)
+    return np.where(bracketed, (low + high) / 2, np.nan)
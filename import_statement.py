@@ -0,0 +1,29 @@
+import sys
+
+from statements import StatementError, import_statement
+
+# Imports a CSV bank statement as one user's expenses (see statements.py).
+# Rows already stored for the user are skipped, so re-importing a statement
+# or an overlapping one is safe.
+#
+# Usage: python import_statement.py USERNAME FILE.csv [--dry-run]
+#                                   --dry-run reports what would be imported
+
+
+def main(args):
+    dry_run = "--dry-run" in args
+    args = [arg for arg in args if arg != "--dry-run"]
+    if len(args) != 2:
+        sys.exit("Usage: python import_statement.py USERNAME FILE.csv [--dry-run]")
+    username, path = args
+    try:
+        result = import_statement(path, username, dry_run=dry_run)
+    except (OSError, StatementError) as e:
+        sys.exit(f"{path}: {e}")
+    verb = "Would import" if dry_run else "Imported"
+    print(f"{verb} {result['imported']} of {result['rows']} rows for {username} "
+          f"({result['duplicates']} already stored, {result['rejected']} not expenses)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,331 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+import numpy as np
+
+from money import to_rupees
+
+# In-memory indexes over the shared expense view (see utils.DataCache), a
+# tuple of records.Expense read through their attributes.
+# Indexes are immutable once built: add/remove return a new index that shares
+# every untouched user's arrays with the old one, so sessions still holding
+# the old index never see it change underneath them.
+
+
+class ExpenseIndex:
+    """Expenses grouped by username, each user's records sorted by date"""
+
+    def __init__(self, expenses=()):
+        grouped = {}
+        for expense in expenses:
+            grouped.setdefault(expense.username, []).append(expense)
+
+        # username -> (dates, records, records_by_id), dates and records
+        # sorted by date. The sort is stable, so records on the same day keep
+        # their insertion order.
+        self._users = {}
+        # id -> username. Shared between index versions and only ever added
+        # to; ids are unique, and a stale entry for a removed expense is
+        # caught by the per-user lookup.
+        self._owners = {}
+        for username, records in grouped.items():
+            records.sort(key=lambda exp: exp.date)
+            by_id = {exp.id: exp for exp in records}
+            self._users[username] = ([exp.date for exp in records], records, by_id)
+            self._owners.update(dict.fromkeys(by_id, username))
+
+    @classmethod
+    def _from_users(cls, users, owners):
+        index = cls.__new__(cls)
+        index._users = users
+        index._owners = owners
+        return index
+
+    def usernames(self):
+        return list(self._users)
+
+    def count(self, username):
+        """Number of expenses recorded by a user"""
+        return len(self._users.get(username, _EMPTY)[1])
+
+    def for_user(self, username):
+        """All of a user's expenses, oldest first"""
+        return list(self._users.get(username, _EMPTY)[1])
+
+    def get(self, expense_id):
+        """The expense with this id, or None"""
+        username = self._owners.get(expense_id)
+        return self._users.get(username, _EMPTY)[2].get(expense_id)
+
+    def range(self, username, start_date=None, end_date=None):
+        """A user's expenses with start_date <= date <= end_date (inclusive, YYYY-MM-DD)
+
+        Either bound may be None for an open range. Cost is two bisects plus
+        the size of the result.
+        """
+        dates, records, _ = self._users.get(username, _EMPTY)
+        lo = 0 if start_date is None else bisect_left(dates, start_date)
+        hi = len(dates) if end_date is None else bisect_right(dates, end_date)
+        return records[lo:hi]
+
+    def month(self, username, month):
+        """A user's expenses in a YYYY-MM month"""
+        return self.range(username, f"{month}-01", f"{month}-31")
+
+    def add(self, expense):
+        """New index with expense inserted"""
+        username = expense.username
+        date = expense.date
+        dates, records, by_id = self._users.get(username, _EMPTY)
+        pos = bisect_right(dates, date)
+        users = dict(self._users)
+        users[username] = (
+            list(dates[:pos]) + [date] + list(dates[pos:]),
+            list(records[:pos]) + [expense] + list(records[pos:]),
+            {**by_id, expense.id: expense},
+        )
+        self._owners[expense.id] = username
+        return self._from_users(users, self._owners)
+
+    def remove(self, expense_id):
+        """New index without the expense carrying expense_id"""
+        username = self._owners.get(expense_id)
+        if username not in self._users or expense_id not in self._users[username][2]:
+            return self
+        dates, records, by_id = self._users[username]
+        kept = [exp for exp in records if exp.id != expense_id]
+        users = dict(self._users)
+        users[username] = (
+            [exp.date for exp in kept],
+            kept,
+            {key: exp for key, exp in by_id.items() if key != expense_id},
+        )
+        return self._from_users(users, self._owners)
+
+
+_EMPTY = ((), (), {})
+
+
+class MonthlyRollup:
+    """Expense totals and counts per (username, YYYY-MM, category)
+
+    Built from the raw records and then kept current by add/remove, which
+    copy only the affected user's month.
+    """
+
+    def __init__(self, expenses=()):
+        # username -> month -> category -> (total paise, count)
+        self._users = {}
+        for expense in expenses:
+            months = self._users.setdefault(expense.username, {})
+            categories = months.setdefault(_month_of(expense), {})
+            category = expense.category
+            total, count = categories.get(category, (0, 0))
+            categories[category] = (total + expense.paise, count + 1)
+
+    def _apply(self, expense, sign):
+        username = expense.username
+        month = _month_of(expense)
+        category = expense.category
+        months = dict(self._users.get(username, {}))
+        categories = dict(months.get(month, {}))
+        total, count = categories.get(category, (0, 0))
+        total, count = total + sign * expense.paise, count + sign
+        if count > 0:
+            categories[category] = (total, count)
+        else:
+            categories.pop(category, None)
+        if categories:
+            months[month] = categories
+        else:
+            months.pop(month, None)
+
+        rollup = MonthlyRollup.__new__(MonthlyRollup)
+        rollup._users = dict(self._users)
+        rollup._users[username] = months
+        return rollup
+
+    def merged(self, totals):
+        """New rollup that also counts precomputed totals
+
+        totals has the rollup's own shape, {username: {month: {category:
+        (paise, count)}}}, e.g. an archive's rollup.
+        """
+        rollup = MonthlyRollup.__new__(MonthlyRollup)
+        rollup._users = dict(self._users)
+        for username, extra_months in totals.items():
+            months = dict(rollup._users.get(username, {}))
+            for month, extra in extra_months.items():
+                categories = dict(months.get(month, {}))
+                for category, (paise, count) in extra.items():
+                    total, existing = categories.get(category, (0, 0))
+                    categories[category] = (total + paise, existing + count)
+                months[month] = categories
+            rollup._users[username] = months
+        return rollup
+
+    def add(self, expense):
+        """New rollup with expense counted"""
+        return self._apply(expense, 1)
+
+    def remove(self, expense):
+        """New rollup with expense no longer counted"""
+        return self._apply(expense, -1)
+
+    def months(self, username):
+        """YYYY-MM months in which a user has expenses, oldest first"""
+        return sorted(self._users.get(username, {}))
+
+    def category_totals(self, username, month):
+        """{category: rupees} for a user's month"""
+        categories = self._users.get(username, {}).get(month, {})
+        return {category: to_rupees(total) for category, (total, _) in categories.items()}
+
+    def total_paise(self, username, month):
+        """Exact total spent by a user in a month, in paise"""
+        return sum(total for total, _ in self._users.get(username, {}).get(month, {}).values())
+
+    def total(self, username, month):
+        """Rupees spent by a user in a month"""
+        return to_rupees(self.total_paise(username, month))
+
+    def count(self, username, month):
+        """Number of expenses a user recorded in a month"""
+        return sum(count for _, count in self._users.get(username, {}).get(month, {}).values())
+
+    def all_time_category_totals(self, username):
+        """{category: rupees} over every month of a user's, largest first"""
+        totals = {}
+        for categories in self._users.get(username, {}).values():
+            for category, (total, _) in categories.items():
+                totals[category] = totals.get(category, 0) + total
+        return {category: to_rupees(total)
+                for category, total in sorted(totals.items(), key=lambda item: item[1], reverse=True)}
+
+    def summary(self, username, month):
+        """Same shape as utils.calculate_monthly_summary"""
+        return {
+            'total': self.total(username, month),
+            'categories': self.category_totals(username, month)
+        }
+
+
+def _month_of(expense):
+    return expense.date[:7]
+
+
+class DailySpendIndex:
+    """Cumulative daily spend per user, overall and per category
+
+    For each user (and each of their categories) it keeps the sorted days
+    with spending, as date ordinals, and the running total in paise up to
+    and including each day. Any range total is then two binary searches and
+    a subtraction. add/remove copy only the affected user's arrays.
+    """
+
+    def __init__(self, expenses=()):
+        per_day = {}
+        for expense in expenses:
+            day = _ordinal(expense.date)
+            if day is None:
+                continue
+            amount = expense.paise
+            username = expense.username
+            category = expense.category
+            for key in ((username, None), (username, category)):
+                days = per_day.setdefault(key, {})
+                days[day] = days.get(day, 0) + amount
+
+        # username -> {None: (days, cumulative), category: (days, cumulative)}
+        self._users = {}
+        for (username, category), days in per_day.items():
+            ordered = sorted(days)
+            self._users.setdefault(username, {})[category] = (
+                np.array(ordered, dtype=np.int64),
+                np.cumsum(np.array([days[d] for d in ordered], dtype=np.int64)),
+            )
+
+    def _apply(self, expense, sign):
+        day = _ordinal(expense.date)
+        if day is None:
+            return self
+        amount = sign * expense.paise
+        username = expense.username
+        series = dict(self._users.get(username, {}))
+        for category in (None, expense.category):
+            days, cumulative = series.get(category, (_NO_DAYS, _NO_DAYS))
+            pos = int(np.searchsorted(days, day))
+            if pos == len(days) or days[pos] != day:
+                # First spend on this day: start it at the previous running total
+                before = cumulative[pos - 1] if pos else 0
+                days = np.insert(days, pos, day)
+                cumulative = np.insert(cumulative, pos, before)
+            else:
+                cumulative = cumulative.copy()
+            cumulative[pos:] += amount
+            series[category] = (days, cumulative)
+
+        index = DailySpendIndex.__new__(DailySpendIndex)
+        index._users = dict(self._users)
+        index._users[username] = series
+        return index
+
+    def add(self, expense):
+        """New index with expense counted"""
+        return self._apply(expense, 1)
+
+    def remove(self, expense):
+        """New index with expense no longer counted"""
+        return self._apply(expense, -1)
+
+    def total(self, username, start_date=None, end_date=None, category=None):
+        """Rupees spent by a user with start_date <= date <= end_date
+
+        Dates are YYYY-MM-DD strings or datetime.date objects; either may be
+        None for an open range. category limits the total to one category.
+        """
+        days, cumulative = self._users.get(username, {}).get(category, (_NO_DAYS, _NO_DAYS))
+        lo = 0 if start_date is None else int(np.searchsorted(days, _ordinal(start_date), side="left"))
+        hi = len(days) if end_date is None else int(np.searchsorted(days, _ordinal(end_date), side="right"))
+        if hi <= lo:
+            return 0.0
+        return to_rupees(cumulative[hi - 1] - (cumulative[lo - 1] if lo else 0))
+
+    def days_tracked(self, username):
+        """Number of distinct days a user spent on"""
+        _, cumulative = self._users.get(username, {}).get(None, (_NO_DAYS, _NO_DAYS))
+        # Days whose expenses were all removed stay in the arrays with nothing spent
+        return int(np.count_nonzero(np.diff(cumulative, prepend=0)))
+
+    def rolling_total(self, username, days, end_date=None, category=None):
+        """Rupees spent in the `days` days ending on end_date (default today)"""
+        end = _as_date(end_date) if end_date is not None else date.today()
+        return self.total(username, end - timedelta(days=days - 1), end, category)
+
+    def compare_periods(self, username, start_date, end_date, category=None):
+        """Spend in a period and in the equally long period right before it
+
+        Returns (current, previous, change_percent); change_percent is None
+        when nothing was spent in the previous period.
+        """
+        start, end = _as_date(start_date), _as_date(end_date)
+        length = end - start + timedelta(days=1)
+        current = self.total(username, start, end, category)
+        previous = self.total(username, start - length, start - timedelta(days=1), category)
+        change = round((current - previous) / previous * 100, 1) if previous else None
+        return current, previous, change
+
+
+_NO_DAYS = np.zeros(0, dtype=np.int64)
+
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _ordinal(value):
+    """Day number of a date or YYYY-MM-DD string, None if it isn't a valid date"""
+    try:
+        return _as_date(value).toordinal()
+    except (TypeError, ValueError):
+        return None
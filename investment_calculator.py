@@ -1,6 +1,16 @@
 import numpy as np
 
-def calculate_sip_returns(monthly_investment, years, expected_return_rate, inflation_rate=6):
+from goals import required_duration, required_sip
+
+def _horizon(years, monthly):
+    """(period numbers, months completed at the end of each) for a horizon of years"""
+    if monthly:
+        months_completed = np.arange(1, years * 12 + 1)
+        return months_completed, months_completed
+    years_array = np.arange(1, years + 1)
+    return years_array, years_array * 12
+
+def calculate_sip_returns(monthly_investment, years, expected_return_rate, inflation_rate=6, monthly=False):
     """
     Calculate SIP (Systematic Investment Plan) returns with inflation adjustment
     
@@ -9,6 +19,7 @@ def calculate_sip_returns(monthly_investment, years, expected_return_rate, infla
     years (int): Investment period in years
     expected_return_rate (float): Expected annual return rate in percentage
     inflation_rate (float): Expected annual inflation rate in percentage
+    monthly (bool): One value per month (numbered 1 to years * 12) instead of per year
     
     Returns:
     tuple: (years, invested_amount, expected_amount, inflation_adjusted)
@@ -17,32 +28,24 @@ def calculate_sip_returns(monthly_investment, years, expected_return_rate, infla
     monthly_rate = expected_return_rate / 100 / 12
     inflation_monthly = inflation_rate / 100 / 12
     
-    # Total number of months
-    months = years * 12
+    periods, months_completed = _horizon(years, monthly)
     
-    # Initialize arrays
-    years_array = np.arange(1, years + 1)
-    invested_amount = np.zeros(years)
-    expected_amount = np.zeros(years)
-    inflation_adjusted = np.zeros(years)
-    
-    # Calculate for each year
-    for i in range(years):
-        months_completed = (i + 1) * 12
-        
-        # Amount invested till this year
-        invested_amount[i] = monthly_investment * months_completed
-        
-        # Calculate expected return using FV of SIP formula
-        expected_amount[i] = monthly_investment * ((pow(1 + monthly_rate, months_completed) - 1) / monthly_rate) * (1 + monthly_rate)
-        
-        # Adjust for inflation
-        inflation_adjustment = pow(1 + inflation_monthly, months_completed)
-        inflation_adjusted[i] = expected_amount[i] / inflation_adjustment
-    
-    return years_array, invested_amount, expected_amount, inflation_adjusted
+    # Amount invested till the end of each period
+    invested_amount = monthly_investment * months_completed
+    
+    # FV of SIP formula over the whole horizon at once
+    if monthly_rate:
+        growth = (1 + monthly_rate) ** months_completed
+        expected_amount = monthly_investment * ((growth - 1) / monthly_rate) * (1 + monthly_rate)
+    else:
+        expected_amount = invested_amount.astype(float)
+    
+    # Adjust for inflation
+    inflation_adjusted = expected_amount / (1 + inflation_monthly) ** months_completed
+    
+    return periods, invested_amount.astype(float), expected_amount, inflation_adjusted
 
-def calculate_lumpsum_returns(investment_amount, years, expected_return_rate, inflation_rate=6):
+def calculate_lumpsum_returns(investment_amount, years, expected_return_rate, inflation_rate=6, monthly=False):
     """
     Calculate lumpsum investment returns with inflation adjustment
     
@@ -51,6 +54,8 @@ def calculate_lumpsum_returns(investment_amount, years, expected_return_rate, in
     years (int): Investment period in years
     expected_return_rate (float): Expected annual return rate in percentage
     inflation_rate (float): Expected annual inflation rate in percentage
+    monthly (bool): One value per month (numbered 1 to years * 12) instead of per
+        year; between year ends the annual rates apply pro rata
     
     Returns:
     tuple: (years, expected_amount, inflation_adjusted)
@@ -59,23 +64,142 @@ def calculate_lumpsum_returns(investment_amount, years, expected_return_rate, in
     annual_rate = expected_return_rate / 100
     inflation_annual = inflation_rate / 100
     
-    # Initialize arrays
-    years_array = np.arange(1, years + 1)
-    expected_amount = np.zeros(years)
-    inflation_adjusted = np.zeros(years)
-    
-    # Calculate for each year
-    for i in range(years):
-        year = i + 1
-        
-        # Calculate expected return using compound interest formula
-        expected_amount[i] = investment_amount * pow(1 + annual_rate, year)
-        
-        # Adjust for inflation
-        inflation_adjustment = pow(1 + inflation_annual, year)
-        inflation_adjusted[i] = expected_amount[i] / inflation_adjustment
-    
-    return years_array, expected_amount, inflation_adjusted
+    periods, months_completed = _horizon(years, monthly)
+    elapsed = months_completed / 12 if monthly else periods
+    
+    # Compound interest formula over the whole horizon at once
+    expected_amount = investment_amount * (1 + annual_rate) ** elapsed
+    
+    # Adjust for inflation
+    inflation_adjusted = expected_amount / (1 + inflation_annual) ** elapsed
+    
+    return periods, expected_amount, inflation_adjusted
+
+def calculate_scenario_grid(plan_type, amounts, years, expected_return_rates, inflation_rates=6):
+    """
+    Calculate the final value of every combination of amount, period, return and inflation
+    
+    Parameters:
+    plan_type (str): "SIP" (amounts are monthly) or "Lumpsum" (amounts are one-time)
+    amounts (float or array): Investment amounts
+    years (int or array): Investment periods in years
+    expected_return_rates (float or array): Expected annual return rates in percentage
+    inflation_rates (float or array): Expected annual inflation rates in percentage
+    
+    Returns:
+    tuple: (invested_amount, expected_amount, inflation_adjusted), each an array
+    shaped (amounts, years, expected_return_rates, inflation_rates)
+    """
+    # One axis per parameter, so the arithmetic broadcasts to the full grid
+    amounts, years, rates, inflation = np.ix_(
+        *(np.atleast_1d(np.asarray(values, dtype=float))
+          for values in (amounts, years, expected_return_rates, inflation_rates))
+    )
+    
+    if plan_type == "SIP":
+        monthly_rate = rates / 100 / 12
+        months = years * 12
+        invested_amount = amounts * months
+        # FV of SIP formula; a 0% return just gives back what was invested
+        safe_rate = np.where(monthly_rate == 0, 1, monthly_rate)
+        annuity = np.where(
+            monthly_rate == 0,
+            months,
+            ((1 + monthly_rate) ** months - 1) / safe_rate * (1 + monthly_rate)
+        )
+        expected_amount = amounts * annuity
+        inflation_adjustment = (1 + inflation / 100 / 12) ** months
+    else:
+        invested_amount = np.broadcast_to(amounts, (amounts.size, years.size, 1, 1))
+        expected_amount = amounts * (1 + rates / 100) ** years
+        inflation_adjustment = (1 + inflation / 100) ** years
+    
+    inflation_adjusted = expected_amount / inflation_adjustment
+    shape = (amounts.size, years.size, rates.size, inflation.size)
+    return tuple(np.broadcast_to(values, shape) for values in (invested_amount, expected_amount, inflation_adjusted))
+
+def simulate_returns(plan_type, amount, years, expected_return_rate, volatility=15, paths=10_000,
+                     goal=None, seed=None, chunk_paths=2_000):
+    """
+    Simulate an investment over many random return paths (Monte Carlo)
+    
+    Monthly returns are lognormal, with the mean growth calculate_sip_returns
+    (SIP) or calculate_lumpsum_returns (Lumpsum) assume, so a volatility of
+    0 reproduces their expected amounts. Paths are simulated chunk_paths at
+    a time, so memory stays flat however many are asked for; the same seed
+    gives the same result whatever the chunk size.
+    
+    Parameters:
+    plan_type (str): "SIP" (amount is monthly) or "Lumpsum" (amount is one-time)
+    amount (float): Investment amount
+    years (int): Investment period in years
+    expected_return_rate (float): Expected annual return rate in percentage
+    volatility (float): Annual volatility (standard deviation of returns) in percentage
+    paths (int): Number of paths to simulate
+    goal (float): Target amount, or None
+    seed (int): Seed for the random numbers, or None for fresh ones
+    chunk_paths (int): Paths simulated at once
+    
+    Returns:
+    tuple: (years, p10, p50, p90, goal_probability) - the 10th, 50th and 90th
+    percentile values at the end of each year, and the fraction of paths
+    ending at or above goal (None without a goal)
+    """
+    months = years * 12
+    if plan_type == "SIP":
+        mean_growth = 1 + expected_return_rate / 100 / 12
+    else:
+        mean_growth = (1 + expected_return_rate / 100) ** (1 / 12)
+    # Lognormal parameters with mean growth mean_growth and annual
+    # standard deviation volatility
+    sigma = np.sqrt(np.log1p((volatility / 100) ** 2 / 12 / mean_growth ** 2))
+    mu = np.log(mean_growth) - sigma ** 2 / 2
+    
+    rng = np.random.default_rng(seed)
+    year_ends = np.empty((paths, years))
+    for start in range(0, paths, chunk_paths):
+        count = min(chunk_paths, paths - start)
+        # Growth of a rupee invested at the start of the horizon, to the end of each month
+        growth = np.exp(np.cumsum(mu + sigma * rng.standard_normal((count, months)), axis=1))
+        if plan_type == "SIP":
+            # Each month's instalment grows by growth[m] / growth[k - 1] from
+            # its month k, so the corpus is growth[m] * sum(1 / growth[k - 1])
+            before = np.hstack([np.ones((count, 1)), growth[:, :-1]])
+            values = amount * growth * np.cumsum(1 / before, axis=1)
+        else:
+            values = amount * growth
+        year_ends[start:start + count] = values[:, 11::12]
+    
+    p10, p50, p90 = np.percentile(year_ends, [10, 50, 90], axis=0)
+    goal_probability = float(np.mean(year_ends[:, -1] >= goal)) if goal is not None else None
+    
+    return np.arange(1, years + 1), p10, p50, p90, goal_probability
+
+def plan_growth(plan_type, amount, years, expected_return_rate):
+    """
+    Wealth gained by a saved investment plan at the end of its period
+
+    Parameters:
+    plan_type (str): "SIP" (amount is monthly) or "Lumpsum" (amount is one-time)
+    amount (float): Investment amount
+    years (int): Investment period in years
+    expected_return_rate (float): Expected annual return rate in percentage
+
+    Returns:
+    float: Expected value minus the amount invested, rounded to the paisa
+    """
+    if years < 1 or expected_return_rate == 0:
+        # Nothing invested yet, or nothing earned
+        return 0.0
+    # Only the final value is needed, so the closed forms are evaluated once,
+    # with the scalar pow() the stored growth has always been computed with
+    if plan_type == "SIP":
+        monthly_rate = expected_return_rate / 100 / 12
+        months = years * 12
+        expected_amount = amount * ((pow(1 + monthly_rate, months) - 1) / monthly_rate) * (1 + monthly_rate)
+        return round(float(expected_amount - amount * months), 2)
+    expected_amount = amount * pow(1 + expected_return_rate / 100, years)
+    return round(float(expected_amount - amount), 2)
 
 def calculate_goal_sip(target_amount, years, expected_return_rate):
     """
@@ -89,24 +213,8 @@ def calculate_goal_sip(target_amount, years, expected_return_rate):
     Returns:
     float: Required monthly SIP amount
     """
-    # Monthly rate
-    monthly_rate = expected_return_rate / 100 / 12
-    
-    # Total number of months
-    months = years * 12
-    
-    # Calculate required monthly SIP using formula
-    # M = P / [((1+r)^n - 1) / r) * (1+r)]
-    # Where:
-    # M = Monthly SIP amount
-    # P = Target amount
-    # r = Monthly interest rate
-    # n = Number of months
-    
-    denominator = ((pow(1 + monthly_rate, months) - 1) / monthly_rate) * (1 + monthly_rate)
-    required_sip = target_amount / denominator
-    
-    return required_sip
+    # See goals.py for inflation, step-ups and many goals at once
+    return float(required_sip(target_amount, years, expected_return_rate))
 
 def calculate_investment_duration(monthly_investment, target_amount, expected_return_rate):
     """
@@ -118,22 +226,6 @@ def calculate_investment_duration(monthly_investment, target_amount, expected_re
     expected_return_rate (float): Expected annual return rate in percentage
     
     Returns:
-    float: Required time in years
+    float: Required time in years, in whole months (inf if over goals.MAX_YEARS)
     """
-    # Monthly rate
-    monthly_rate = expected_return_rate / 100 / 12
-    
-    # Using the formula: P = M * [((1+r)^n - 1) / r) * (1+r)]
-    # We need to solve for n (number of months)
-    # This is approximated using logarithms
-    
-    numerator = target_amount * monthly_rate
-    denominator = monthly_investment * (1 + monthly_rate)
-    
-    # Calculate number of months using approximation
-    months = np.log(1 + (numerator / denominator)) / np.log(1 + monthly_rate)
-    
-    # Convert to years
-    years = months / 12
-    
-    return years
+    return float(required_duration(monthly_investment, target_amount, expected_return_rate))
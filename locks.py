@@ -0,0 +1,86 @@
+import os
+import threading
+import zlib
+
+# Locks for concurrent writers.
+#
+# StripedLock hands out one of a fixed set of locks per key (a username, a
+# cache key), so writers for different users rarely wait on each other and
+# the lock table doesn't grow with the number of users. FileLock adds an
+# advisory lock file, so worker processes sharing the data files also
+# exclude each other. Readers take neither: files are replaced atomically
+# and cached views are immutable, so a reader always sees a whole old or a
+# whole new version.
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): locking only covers threads of this process
+    fcntl = None
+
+
+class StripedLock:
+    """A fixed table of reentrant locks, picked by hashing the key"""
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    def __call__(self, key):
+        # crc32 of the repr rather than hash(), so tuples of strings map to
+        # the same stripe in every process
+        return self._locks[zlib.crc32(repr(key).encode("utf-8")) % len(self._locks)]
+
+
+class FileLock:
+    """Reentrant lock held by one thread of one process at a time
+
+    Threads of this process queue on an RLock; the first acquisition also
+    takes an exclusive flock on path, which other processes wait on. Use
+    file_lock(path) rather than creating these directly, so every user of
+    a path in this process shares one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                except BaseException:
+                    os.close(fd)
+                    raise
+            except BaseException:
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+_file_locks = {}
+_file_locks_lock = threading.Lock()
+
+
+def file_lock(path):
+    """The process-wide FileLock for path"""
+    path = os.path.abspath(path)
+    with _file_locks_lock:
+        lock = _file_locks.get(path)
+        if lock is None:
+            lock = _file_locks[path] = FileLock(path)
+        return lock
@@ -0,0 +1,28 @@
+import sys
+
+from migrations import LATEST_VERSION, migrate, pending_migrations
+from utils import get_storage
+
+# Brings the configured store up to the current data version (see
+# migrations.py). Safe to run while the app is serving, and to run again
+# after an interruption.
+#
+# Usage: python migrate_data.py [--status]   --status lists pending migrations
+#                                             without applying them
+
+
+def main(args):
+    if args not in ([], ["--status"]):
+        sys.exit("Usage: python migrate_data.py [--status]")
+    storage = get_storage()
+    pending = pending_migrations(storage)
+    print(f"Data version {storage.data_version()} of {LATEST_VERSION}")
+    if args:
+        for migration in pending:
+            print(f"  pending {migration.version}: {migration.description} ({migration.kind})")
+        return
+    migrate(storage, on_applied=lambda m: print(f"  applied {m.version}: {m.description}"))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
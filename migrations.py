@@ -0,0 +1,91 @@
+from investment_calculator import plan_growth
+from passwords import hash_password, is_password_hash
+
+# Versioned upgrades of the stored records.
+#
+# Each store records the number of the last migration applied to it
+# (StorageEngine.data_version). migrate() applies the newer ones in order;
+# each one streams a collection through its upgrade function
+# (StorageEngine.rewrite_records), chunk by chunk, and bumps the version
+# once the collection has been replaced. Upgrades must be idempotent: a
+# migration interrupted before its version bump runs again from the start,
+# over records it may already have upgraded. The app reads both the old and
+# the new shape of every record, so it can keep serving while a migration
+# runs.
+
+
+class Migration:
+    def __init__(self, version, kind, description, upgrade):
+        self.version = version
+        self.kind = kind
+        self.description = description
+        self.upgrade = upgrade
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.kind!r}, {self.description!r})"
+
+
+def _recompute_growth(investment):
+    # Plans saved before plan_growth() got the wealth gained by whichever
+    # calculator was last on screen, whatever the plan's own type
+    growth = plan_growth(
+        investment.get('type'),
+        investment.get('amount', 0),
+        int(investment.get('period', 0)),
+        investment.get('return_rate', 0),
+    )
+    return {**investment, "growth": growth}
+
+
+def _shares_to_percent(budget):
+    if "categories" not in budget:
+        return budget
+    budget = dict(budget)
+    shares = budget.pop("categories")
+    # Not whole percentages: a 0.125 share is 12.5%. Rounding only drops the
+    # float noise of the multiplication (0.1 * 100 is 10.000000000000002),
+    # so utils.budget_shares reads back the stored fraction
+    budget.setdefault("category_percent", {
+        category: round(share * 100, 10) for category, share in shares.items()
+    })
+    return budget
+
+
+def _hash_password(user):
+    if "password" not in user:
+        return user
+    user = dict(user)
+    password = user.pop("password")
+    if not is_password_hash(user.get("password_hash")):
+        user["password_hash"] = hash_password(password)
+    return user
+
+
+MIGRATIONS = [
+    Migration(1, "investments", "recompute investment growth from each plan's own terms", _recompute_growth),
+    Migration(2, "budgets", "store category allocations as percentages", _shares_to_percent),
+    Migration(3, "users", "replace plaintext passwords with salted hashes", _hash_password),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def pending_migrations(storage):
+    """Migrations not yet applied to storage, in order"""
+    version = storage.data_version()
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def migrate(storage, chunk_size=10_000, on_applied=None):
+    """Apply the pending migrations to storage; returns those applied
+
+    on_applied(migration) is called after each one.
+    """
+    applied = []
+    for migration in pending_migrations(storage):
+        storage.rewrite_records(migration.kind, migration.upgrade, chunk_size)
+        storage.set_data_version(migration.version)
+        applied.append(migration)
+        if on_applied is not None:
+            on_applied(migration)
+    return applied
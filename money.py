@@ -0,0 +1,21 @@
+# Money helpers. Expense amounts are held and summed as integer paise
+# (1 rupee = 100 paise) so totals are exact; rupees appear only at the edges,
+# in the JSON layout ("amount": 34.5) and on screen.
+
+
+def to_paise(amount):
+    """Integer paise for a rupee amount (int, float or numeric string)"""
+    return round(float(amount) * 100)
+
+
+def to_rupees(paise):
+    """Rupee value of integer paise, for JSON and charts"""
+    return int(paise) / 100
+
+
+def format_paise(paise):
+    """Format integer paise as ₹1,234.50 without going through a float"""
+    paise = int(paise)
+    sign = "-" if paise < 0 else ""
+    rupees, rest = divmod(abs(paise), 100)
+    return f"{sign}₹{rupees:,}.{rest:02d}"
@@ -0,0 +1,30 @@
+import hashlib
+import hmac
+import secrets
+
+# Password hashing for users.json.
+#
+# Hashes are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>",
+# so the iteration count can be raised later without breaking old hashes.
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = 200_000
+
+
+def hash_password(password, iterations=ITERATIONS):
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_password_hash(value):
+    return isinstance(value, str) and value.startswith(ALGORITHM + "$") and value.count("$") == 3
+
+
+def verify_password(password, password_hash):
+    """Whether password matches a hash_password() hash"""
+    if not is_password_hash(password_hash):
+        return False
+    _, iterations, salt, expected = password_hash.split("$")
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
@@ -0,0 +1,368 @@
+import math
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from money import to_paise, to_rupees
+
+# Compact, read-only record types for the shared data views.
+#
+# Records keep their fields in __slots__ instead of a per-record dict, and an
+# expense stores its username and category as small integer codes into the
+# process-wide USERNAMES and CATEGORIES tables, so each distinct string is
+# held once. Records are Mappings, so code written against the JSON dicts
+# (record.get('amount', 0), record['id'], dict(record)) keeps working, while
+# hot loops can read attributes directly. from_dict/to_dict convert to and
+# from the JSON layout the storage engines use.
+
+
+class Interner:
+    """Two-way table between strings and small integer codes
+
+    Codes are handed out in first-seen order and never change, so a code
+    stays valid for the life of the process. values is append-only.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self._codes = {}
+        self._lock = threading.Lock()
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def extend(self, values):
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self._codes[value] = code
+        return code
+
+
+# Seeded with utils.CATEGORY_COLORS, so the built-in categories are codes 0..6
+CATEGORIES = Interner()
+USERNAMES = Interner()
+
+
+def freeze(value):
+    """Read-only view of parsed JSON: dicts become mappingproxies, lists tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Mutable deep copy of a frozen view (records become JSON dicts)"""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+_MISSING = object()
+
+
+class Record(Mapping):
+    """Read-only record with fixed fields, readable like its JSON dict
+
+    FIELDS lists the JSON keys in layout order. A field absent from the JSON
+    is absent from the record too (get() returns the default), and keys
+    outside FIELDS are kept in extra so nothing is lost on a round trip.
+    """
+
+    __slots__ = ("extra",)
+    FIELDS = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        record = cls.__new__(cls)
+        for field in cls.FIELDS:
+            setattr(record, field, freeze(data.get(field, _MISSING)))
+        record.extra = _extra(data, cls.FIELDS)
+        return record
+
+    def to_dict(self):
+        return thaw(self)
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for field in self.FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def _extra(data, fields):
+    if len(data) <= len(fields) and all(key in fields for key in data):
+        return None
+    return MappingProxyType({k: freeze(v) for k, v in data.items() if k not in fields})
+
+
+class Expense(Record):
+    """One expense; username and category are interned codes
+
+    The amount is held as integer paise; the amount property and the JSON
+    layout give rupees. Missing fields get the defaults every reader already
+    used ('' and 'Others'), the same normalization the SQLite and columnar
+    engines apply.
+    """
+
+    __slots__ = ("id", "user_code", "paise", "category_code", "date", "description")
+    FIELDS = ("username", "amount", "category", "date", "description", "id")
+
+    def __init__(self, username, paise, category, date, description="", id="", extra=None):
+        self.user_code = USERNAMES.code(username)
+        self.paise = paise
+        self.category_code = CATEGORIES.code(category)
+        self.date = date
+        self.description = description
+        self.id = id
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data.get('username', ''),
+            to_paise(data.get('amount', 0)),
+            data.get('category', 'Others'),
+            data.get('date', ''),
+            data.get('description', ''),
+            data.get('id', ''),
+            _extra(data, cls.FIELDS),
+        )
+
+    @property
+    def username(self):
+        return USERNAMES.values[self.user_code]
+
+    @property
+    def amount(self):
+        return to_rupees(self.paise)
+
+    @property
+    def category(self):
+        return CATEGORIES.values[self.category_code]
+
+    def to_dict(self):
+        data = {
+            "username": self.username,
+            "amount": self.amount,
+            "category": self.category,
+            "date": self.date,
+            "description": self.description,
+            "id": self.id,
+        }
+        if self.extra is not None:
+            data.update(thaw(self.extra))
+        return data
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __iter__(self):
+        yield from self.FIELDS
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        return len(self.FIELDS) + (len(self.extra) if self.extra is not None else 0)
+
+
+class Budget(Record):
+    """A user's monthly budget, savings target and category allocation
+
+    The allocation is category_percent (percentages); budgets from
+    before migration 2 have categories (fractions of 1) instead.
+    """
+
+    __slots__ = ("username", "monthly_budget", "savings_target", "categories", "category_percent")
+    FIELDS = ("username", "monthly_budget", "savings_target", "categories", "category_percent")
+
+
+class Investment(Record):
+    """A saved SIP or lumpsum plan"""
+
+    __slots__ = ("username", "name", "type", "amount", "period", "return_rate",
+                 "created_date", "id", "growth")
+    FIELDS = ("username", "name", "type", "amount", "period", "return_rate",
+              "created_date", "id", "growth")
+
+
+# Schemas, checked when JSON is decoded and before data is written, so a
+# malformed record fails where it enters instead of turning into .get()
+# defaults later. field -> (check, description, required)
+
+class SchemaError(ValueError):
+    """Data that doesn't match its collection's schema"""
+
+
+def _is_str(value):
+    return isinstance(value, str)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_date(value):
+    # YYYY-MM-DD with ASCII digits; several times faster than a regex
+    return (
+        isinstance(value, str) and len(value) == 10 and value[4] == value[7] == "-"
+        and value.isascii() and len(digits := value.replace("-", "")) == 8 and digits.isdigit()
+    )
+
+
+def _is_shares(value):
+    return isinstance(value, Mapping) and all(_is_str(k) and _is_number(v) for k, v in value.items())
+
+
+def _is_list(value):
+    return isinstance(value, (list, tuple))
+
+
+_STR = (_is_str, "a string")
+_NUMBER = (_is_number, "a finite number")
+_DATE_STR = (_is_date, "a YYYY-MM-DD date")
+
+SCHEMAS = {
+    "expenses": {
+        "username": (*_STR, True),
+        "amount": (*_NUMBER, True),
+        "category": (*_STR, False),
+        "date": (*_DATE_STR, False),
+        "description": (*_STR, False),
+        "id": (*_STR, False),
+    },
+    "budgets": {
+        "username": (*_STR, True),
+        "monthly_budget": (*_NUMBER, False),
+        "savings_target": (*_NUMBER, False),
+        "categories": (_is_shares, "a {category: share} object", False),
+        "category_percent": (_is_shares, "a {category: percent} object", False),
+    },
+    "investments": {
+        "username": (*_STR, True),
+        "name": (*_STR, False),
+        "type": (*_STR, False),
+        "amount": (*_NUMBER, False),
+        "period": (*_NUMBER, False),
+        "return_rate": (*_NUMBER, False),
+        "created_date": (*_DATE_STR, False),
+        "id": (*_STR, False),
+        "growth": (*_NUMBER, False),
+    },
+    "users": {
+        # password before migration 3, password_hash after (passwords.py)
+        "password": (*_STR, False),
+        "password_hash": (*_STR, False),
+        "points": (*_NUMBER, False),
+        "achievements": (_is_list, "a list", False),
+        "joined_date": (*_DATE_STR, False),
+    },
+}
+
+
+def validate_record(kind, record, where=None):
+    """Raise SchemaError if record doesn't match the schema of kind"""
+    where = where or kind
+    if not isinstance(record, Mapping):
+        raise SchemaError(f"{where}: expected an object, got {type(record).__name__}")
+    for field, (check, description, required) in SCHEMAS[kind].items():
+        value = record.get(field, _MISSING)
+        if value is _MISSING:
+            if required:
+                raise SchemaError(f"{where}: missing {field}")
+        elif not check(value):
+            raise SchemaError(f"{where}: {field} must be {description}, got {value!r}")
+
+
+def _expense_ok(record):
+    """Fast check equivalent to the expenses schema for plain dicts (_is_date inlined)"""
+    amount = record.get('amount')
+    date = record.get('date', '0000-00-00')
+    return (
+        type(record.get('username')) is str
+        and (type(amount) is int or type(amount) is float and amount - amount == 0)
+        and type(record.get('category', '')) is str
+        and type(record.get('description', '')) is str
+        and type(record.get('id', '')) is str
+        and type(date) is str and len(date) == 10 and date[4] == date[7] == "-"
+        and date.isascii() and len(digits := date.replace("-", "")) == 8 and digits.isdigit()
+    )
+
+
+# Per-kind fast paths for large collections; a record they reject is then
+# checked field by field for the error message
+_FAST_CHECKS = {"expenses": _expense_ok}
+
+
+def validate_collection(kind, data, source=None):
+    """Raise SchemaError if a whole collection doesn't match its schema
+
+    users is an object keyed by username; the others are lists.
+    """
+    source = source or kind
+    fast = _FAST_CHECKS.get(kind)
+    if fast is not None and isinstance(data, list) and all(type(r) is dict and fast(r) for r in data):
+        return
+    if kind == "users":
+        if not isinstance(data, Mapping):
+            raise SchemaError(f"{source}: expected an object keyed by username")
+        for username, user in data.items():
+            validate_record(kind, user, f"{source}: user {username!r}")
+    else:
+        if not isinstance(data, (list, tuple)):
+            raise SchemaError(f"{source}: expected a list")
+        for i, record in enumerate(data):
+            validate_record(kind, record, f"{source}: record {i}")
+
+
+RECORD_TYPES = {
+    "expenses": Expense,
+    "budgets": Budget,
+    "investments": Investment,
+}
+
+
+def freeze_collection(kind, data):
+    """Read-only view of a loaded collection, as records where kind has a record type"""
+    record_type = RECORD_TYPES.get(kind)
+    if record_type is None:
+        return freeze(data)
+    return tuple(record_type.from_dict(item) for item in data)
@@ -0,0 +1,33 @@
+import sys
+
+from storage import JSONStorage, ShardedStorage
+from utils import (
+    BUDGET_FILE, EXPENSE_FILE, INVESTMENT_FILE, SHARD_DIR, USER_FILE, migrate_to_shards
+)
+
+# Converts between the single-file JSON layout and per-user shards
+# (FINSMART_STORAGE=sharded).
+#
+# Usage: python shard_data.py           split the JSON files into SHARD_DIR
+#        python shard_data.py --merge   write the shards back to the JSON files
+
+
+def main(args):
+    json_storage = JSONStorage(EXPENSE_FILE, BUDGET_FILE, INVESTMENT_FILE, USER_FILE)
+    sharded = ShardedStorage(SHARD_DIR)
+    if args == ["--merge"]:
+        if not sharded.has_manifest():
+            sys.exit(f"No sharded store at {SHARD_DIR}")
+        json_storage.import_from(sharded)
+        print(f"Merged {len(sharded.usernames())} user shards from {SHARD_DIR} into {EXPENSE_FILE} etc.")
+    elif not args:
+        if sharded.has_manifest():
+            sys.exit(f"{SHARD_DIR} already exists; remove it first to convert again")
+        migrate_to_shards(json_storage, sharded)
+        print(f"Split the JSON files into {len(sharded.usernames())} user shards under {SHARD_DIR}")
+    else:
+        sys.exit("Usage: python shard_data.py [--merge]")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
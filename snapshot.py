@@ -0,0 +1,169 @@
+from datetime import date
+
+from aggregation import by_category, by_day, total_amount
+from utils import (
+    budget_shares, compare_spend, get_daily_spend_index, get_days_tracked, get_monthly_rollup,
+    get_monthly_summary, get_user_budget, get_user_expense_frame, get_user_expenses, get_user_investments,
+    user_data_version
+)
+
+# One user's data and the numbers computed from it, shared by every page.
+#
+# Streamlit reruns the whole script on each interaction and runs every tab,
+# so a page used to ask utils for the same budget, investments, frames and
+# summaries several times per rerun. A UserSnapshot asks once and keeps the
+# answers for as long as user_data_version says the data hasn't changed;
+# app.py keeps it in session state. The all-time figures come from the
+# rollup and the daily index, so they never open archived months.
+
+# Date ranges whose expenses and frames are kept at once
+MAX_RANGES = 8
+
+
+class UserSnapshot:
+    """A user's data as of one data version, with derived values computed on first use"""
+
+    def __init__(self, username, today=None):
+        self.username = username
+        self.today = today or date.today()
+        self.month = self.today.strftime("%Y-%m")
+        self.version = user_data_version(username)
+        self._values = {}
+        self._ranges = {}
+
+    def is_current(self, username, today=None):
+        """Whether this is still the snapshot for username's data (and today)"""
+        return (username == self.username
+                and (today or date.today()) == self.today
+                and user_data_version(username) == self.version)
+
+    def _value(self, name, compute):
+        if name not in self._values:
+            self._values[name] = compute()
+        return self._values[name]
+
+    def _range(self, name, start_date, end_date, compute):
+        key = (name, start_date, end_date)
+        if key not in self._ranges:
+            if len(self._ranges) >= MAX_RANGES:
+                # Drop the oldest
+                del self._ranges[next(iter(self._ranges))]
+            self._ranges[key] = compute()
+        return self._ranges[key]
+
+    @property
+    def budget(self):
+        """The user's budget, or None"""
+        return self._value("budget", lambda: get_user_budget(self.username))
+
+    @property
+    def budget_shares(self):
+        return self._value("budget_shares", lambda: budget_shares(self.budget))
+
+    @property
+    def investments(self):
+        return self._value("investments", lambda: get_user_investments(self.username))
+
+    def investment_total(self, kind):
+        """Sum of the amounts of the user's SIP or Lumpsum plans"""
+        return self._value(
+            ("investment_total", kind),
+            lambda: sum(inv.get('amount', 0) for inv in self.investments if inv.get('type') == kind)
+        )
+
+    @property
+    def monthly_summary(self):
+        """get_monthly_summary for the current month"""
+        return self._value("monthly_summary", lambda: get_monthly_summary(self.username, self.month))
+
+    @property
+    def month_expense_count(self):
+        return self._value(
+            "month_expense_count",
+            lambda: get_monthly_rollup(self.username).count(self.username, self.month)
+        )
+
+    @property
+    def all_time_category_totals(self):
+        """{category: rupees} over all of the user's expenses, largest first"""
+        return self._value(
+            "all_time_category_totals",
+            lambda: get_monthly_rollup(self.username).all_time_category_totals(self.username)
+        )
+
+    @property
+    def days_tracked(self):
+        return self._value("days_tracked", lambda: get_days_tracked(self.username))
+
+    @property
+    def spend_index(self):
+        """The user's DailySpendIndex (hot expenses)"""
+        return self._value("spend_index", lambda: get_daily_spend_index(self.username))
+
+    def expenses(self, start_date=None, end_date=None):
+        return self._range("expenses", start_date, end_date,
+                           lambda: get_user_expenses(self.username, start_date, end_date))
+
+    def frame(self, start_date=None, end_date=None):
+        return self._range("frame", start_date, end_date,
+                           lambda: get_user_expense_frame(self.username, start_date, end_date))
+
+    def category_totals(self, start_date=None, end_date=None):
+        return self._range("category_totals", start_date, end_date,
+                           lambda: by_category(self.frame(start_date, end_date)))
+
+    def daily_totals(self, start_date=None, end_date=None):
+        return self._range("daily_totals", start_date, end_date,
+                           lambda: by_day(self.frame(start_date, end_date)))
+
+    def total(self, start_date=None, end_date=None):
+        return self._range("total", start_date, end_date,
+                           lambda: total_amount(self.frame(start_date, end_date)))
+
+    def compare_spend(self, start_date, end_date):
+        """utils.compare_spend over all categories"""
+        return self._range("compare_spend", start_date, end_date,
+                           lambda: compare_spend(self.username, start_date, end_date))
+
+    @property
+    def health(self):
+        """Financial health score: budget, expenses, investments and savings out of 25 each, and total"""
+        return self._value("health", self._health)
+
+    def _health(self):
+        budget = self.budget
+        has_expenses = bool(self.all_time_category_totals)
+        score = {"budget": 0, "expenses": 0, "investments": 0, "savings": 0}
+
+        if budget:
+            score["budget"] = 25
+
+        # Tracking consistency, with a bonus for tracking this month
+        if has_expenses:
+            tracked_days = self.days_tracked
+            if tracked_days > 20:
+                score["expenses"] = 25
+            elif tracked_days > 10:
+                score["expenses"] = 15
+            elif tracked_days > 0:
+                score["expenses"] = 10
+            if self.month_expense_count > 0:
+                score["expenses"] = min(25, score["expenses"] + 5)
+
+        if self.investments:
+            score["investments"] = min(25, len(self.investments) * 5)
+
+        if budget and has_expenses:
+            monthly_budget = budget.get('monthly_budget', 10000)
+            monthly_expenses = self.monthly_summary['total']
+            if monthly_expenses < monthly_budget:
+                savings_rate = (monthly_budget - monthly_expenses) / monthly_budget if monthly_budget else 0
+                if savings_rate >= 0.2:
+                    score["savings"] = 25
+                elif savings_rate >= 0.1:
+                    score["savings"] = 20
+                elif savings_rate > 0:
+                    score["savings"] = 15
+
+        score["total"] = sum(score.values())
+        return score
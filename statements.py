@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from money import to_rupees
+from utils import CATEGORY_COLORS, add_expenses, generate_ids, get_user_expenses
+
+# Bulk import of bank statements and other CSV exports.
+#
+# The file is read CHUNK_ROWS rows at a time; each chunk's dates, amounts and
+# categories are parsed with whole-column pandas operations, and only the
+# parsed columns are kept. Rows already stored for the user (same date,
+# amount and description) are dropped, and the rest are added in a single
+# write.
+
+CHUNK_ROWS = 50_000
+
+# Header names (lowercased, whitespace collapsed) for each column we use
+COLUMN_NAMES = {
+    "date": ("date", "transaction date", "txn date", "tran date", "value date", "posting date"),
+    "description": ("description", "narration", "particulars", "details", "remarks", "memo"),
+    "amount": ("amount", "amount (inr)", "transaction amount"),
+    "debit": ("debit", "debit amount", "withdrawal", "withdrawal amt.", "withdrawal amount", "dr"),
+    "category": ("category",),
+}
+
+# Tried in order on the dates the previous formats didn't match; banks in
+# India write dates day first
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d/%m/%y", "%d-%m-%y",
+                "%d-%b-%Y", "%d %b %Y", "%d-%b-%y", "%d %b %y", "%Y/%m/%d")
+
+# Description keywords for each category, checked in this order; anything
+# unmatched is Others
+CATEGORY_KEYWORDS = {
+    "Rent": r"\brent\b|landlord|\blease\b|society maint",
+    "Food & Dining": r"swiggy|zomato|restaurant|\bcafe|coffee|starbucks|domino|pizza|mcdonald|\bkfc\b"
+                     r"|burger|bakery|\bfood|dining|grocer|bigbasket|blinkit|zepto|dmart",
+    "Transportation": r"\buber\b|\bola\b|rapido|\bmetro\b|irctc|railway|petrol|diesel|\bfuel|parking"
+                      r"|fastag|\btoll\b|\bbus\b|\bcab\b|taxi|indigo|air india|flight|redbus",
+    "Entertainment": r"netflix|hotstar|prime video|spotify|bookmyshow|movie|cinema|\bpvr\b|inox"
+                     r"|concert|gaming|steam",
+    "Education": r"school|college|universit|tuition|course|udemy|coursera|byju|exam fee|books?\b",
+    "Shopping": r"amazon|flipkart|myntra|ajio|nykaa|meesho|\bmall\b|shopping|store|mart\b",
+}
+
+_KEY = ["date", "paise", "match"]
+
+
+class StatementError(ValueError):
+    """A file that can't be read as a statement"""
+
+
+def _columns(frame):
+    """{role: column} for the columns of a statement we recognize"""
+    names = {" ".join(str(column).lower().split()): column for column in frame.columns}
+    roles = {}
+    for role, candidates in COLUMN_NAMES.items():
+        found = next((names[name] for name in candidates if name in names), None)
+        if found is not None:
+            roles[role] = found
+    if "date" not in roles or ("amount" not in roles and "debit" not in roles):
+        raise StatementError(f"Expected a date column and an amount or debit column, "
+                             f"found {', '.join(map(str, frame.columns))}")
+    return roles
+
+
+def _per_unique(column, parse):
+    """parse() applied to the distinct values of column only, spread back over it
+
+    Statements repeat dates and merchants, so this parses far fewer values.
+    """
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    parsed = parse(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(parsed[codes], index=column.index)
+
+
+def parse_dates(column):
+    """YYYY-MM-DD strings for a column of dates in DATE_FORMATS (NaN where none fits)"""
+    def parse(values):
+        text = values.astype(str).str.strip()
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+        for date_format in DATE_FORMATS:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            # exact=False lets a trailing time of day through
+            parsed[missing] = pd.to_datetime(text[missing], format=date_format, exact=False, errors="coerce")
+        return parsed.dt.strftime("%Y-%m-%d")
+
+    return _per_unique(column, parse)
+
+
+def parse_amounts(column):
+    """Signed rupee amounts for a column like "1,234.50", "-₹99", "(99.00)" or "250 Dr"
+
+    Debits ("-", parentheses or a Dr suffix) come out negative; NaN where
+    there's no number.
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype(float)
+    text = column.astype(str).str.strip()
+    # Plain numbers with thousands separators; the rest go the slow way
+    value = pd.to_numeric(text.str.replace(",", "", regex=False), errors="coerce")
+    other = value.isna() & column.notna()
+    if other.any():
+        text = text[other]
+        negative = (text.str.startswith("-") | text.str.startswith("(")
+                    | text.str.lower().str.endswith("dr"))
+        digits = pd.to_numeric(text.str.replace(r"[^0-9.]", "", regex=True), errors="coerce")
+        value[other] = digits.where(~negative, -digits)
+    return value
+
+
+def categorize(descriptions):
+    """A CATEGORY_KEYWORDS category for each description, Others if none match"""
+    def parse(values):
+        text = values.fillna("").astype(str).str.lower()
+        categories = pd.Series("Others", index=values.index, dtype=object)
+        unmatched = pd.Series(True, index=values.index)
+        for category, pattern in CATEGORY_KEYWORDS.items():
+            # Each pattern only looks at what the earlier ones didn't match
+            found = text[unmatched].str.contains(pattern, regex=True)
+            found = found[found].index
+            categories[found] = category
+            unmatched[found] = False
+        return categories
+
+    return _per_unique(descriptions, parse)
+
+
+def _parse_chunk(chunk, roles, debits_negative):
+    """(parsed rows, number of rows that aren't valid expenses) for one chunk"""
+    if "debit" in roles:
+        amounts = parse_amounts(chunk[roles["debit"]]).abs()
+    else:
+        amounts = parse_amounts(chunk[roles["amount"]])
+        # Signed amounts: the negative ones are the debits, the rest income
+        amounts = -amounts if debits_negative else amounts
+    dates = parse_dates(chunk[roles["date"]])
+    if "description" in roles:
+        descriptions = chunk[roles["description"]].fillna("").astype(str).str.strip()
+    else:
+        descriptions = pd.Series("", index=chunk.index)
+    categories = categorize(descriptions)
+    if "category" in roles:
+        # A category column wins where it names one of ours
+        known = {category.lower(): category for category in CATEGORY_COLORS}
+        given = chunk[roles["category"]].fillna("").astype(str).str.strip().str.lower().map(known)
+        categories = given.fillna(categories)
+    valid = dates.notna() & amounts.notna() & (amounts > 0)
+    rows = pd.DataFrame({
+        "date": dates[valid],
+        "paise": np.rint(amounts[valid] * 100).astype(np.int64),
+        "category": categories[valid],
+        "description": descriptions[valid],
+    })
+    return rows, int((~valid).sum())
+
+
+def read_statement(source, chunk_rows=CHUNK_ROWS):
+    """Parse a CSV statement (a path or file object) into expense rows
+
+    Returns (rows, rejected): rows is a DataFrame of date, paise, category
+    and description, and rejected counts the rows without a date and a
+    positive debit (credits, blanks, summary lines).
+    """
+    parts = []
+    rejected = 0
+    roles = None
+    debits_negative = None
+    try:
+        chunks = pd.read_csv(source, chunksize=chunk_rows, dtype=str, encoding="utf-8-sig",
+                             skipinitialspace=True)
+        for chunk in chunks:
+            if roles is None:
+                roles = _columns(chunk)
+            if debits_negative is None and "amount" in roles and "debit" not in roles:
+                # Decided on the first chunk with amounts, for the whole file
+                amounts = parse_amounts(chunk[roles["amount"]])
+                if amounts.notna().any():
+                    debits_negative = bool((amounts < 0).any())
+            rows, bad = _parse_chunk(chunk, roles, bool(debits_negative))
+            parts.append(rows)
+            rejected += bad
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+        raise StatementError(f"Not a readable CSV file: {e}") from e
+    if not parts:
+        return pd.DataFrame(columns=["date", "paise", "category", "description"]), rejected
+    return pd.concat(parts, ignore_index=True), rejected
+
+
+def drop_existing(rows, expenses):
+    """The rows not already among expenses (matching date, amount and description)
+
+    Counted per key, so a statement with two identical coffees imports both
+    the first time and neither when imported again.
+    """
+    if rows.empty:
+        return rows
+    rows = rows.assign(match=rows["description"].str.lower())
+    existing = pd.DataFrame(
+        [(exp.date, exp.paise, exp.description.strip().lower()) for exp in expenses],
+        columns=_KEY
+    )
+    stored = existing.groupby(_KEY).size().rename("stored")
+    seen = rows.groupby(_KEY).cumcount()
+    stored = rows.join(stored, on=_KEY)["stored"].fillna(0)
+    return rows[seen >= stored].drop(columns="match")
+
+
+def import_statement(source, username, chunk_rows=CHUNK_ROWS, dry_run=False):
+    """Import a CSV statement as a user's expenses
+
+    Returns a summary dict: rows read, imported, duplicates (already
+    stored) and rejected. With dry_run nothing is stored.
+    """
+    rows, rejected = read_statement(source, chunk_rows)
+    existing = get_user_expenses(username, rows["date"].min(), rows["date"].max()) if len(rows) else ()
+    new = drop_existing(rows, existing)
+    if not dry_run:
+        add_expenses([
+            {
+                "username": username,
+                "amount": to_rupees(paise),
+                "category": category,
+                "date": date,
+                "description": description,
+                "id": expense_id,
+            }
+            for date, paise, category, description, expense_id in zip(
+                new["date"].tolist(), new["paise"].tolist(), new["category"].tolist(),
+                new["description"].tolist(), generate_ids(len(new))
+            )
+        ])
+    return {
+        "rows": len(rows) + rejected,
+        "imported": len(new),
+        "duplicates": len(rows) - len(new),
+        "rejected": rejected,
+    }
@@ -0,0 +1,1380 @@
+import os
+import sqlite3
+import threading
+from contextlib import nullcontext
+from itertools import islice
+
+from archive import ExpenseArchive, month_of
+from codec import get_codec, iter_json_array, iter_json_object
+from columnar import ColumnarExpenses, current_generation, write_columns
+from locks import file_lock
+from money import to_paise, to_rupees
+from records import SchemaError, validate_collection, validate_record
+from writer import atomic_write, durable_append, file_stat
+
+# Storage engines behind the get_*/save_* helpers in utils.py.
+#
+# Every engine exposes the same methods:
+#   load_*/save_*      whole-collection access (the original JSON API)
+#   query_expenses     per-user, per-date-range reads
+#   get_budget, query_investments, get_user
+#   add_*/delete_*/upsert_* single-record writes
+#
+# Writes are safe from concurrent threads and worker processes; reads take
+# no locks.
+
+
+class StorageEngine:
+    """Base engine with whole-collection defaults for the per-user API"""
+
+    # Collections that utils should cache per user, filled from the per-user
+    # queries, instead of loading them whole
+    lazy_kinds = ()
+
+    def load_expenses(self):
+        raise NotImplementedError
+
+    def save_expenses(self, data):
+        raise NotImplementedError
+
+    def load_budgets(self):
+        raise NotImplementedError
+
+    def save_budgets(self, data):
+        raise NotImplementedError
+
+    def load_investments(self):
+        raise NotImplementedError
+
+    def save_investments(self, data):
+        raise NotImplementedError
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def save_users(self, data):
+        raise NotImplementedError
+
+    def fingerprint(self, kind, username=None):
+        """Cheap token that changes whenever a collection changes on disk
+
+        kind is one of "expenses", "budgets", "investments" or "users". With
+        a username the token only has to cover that user's data, which
+        engines that keep users apart use to avoid checking everyone's. None
+        means the engine can't tell, and callers must not cache.
+        """
+        return None
+
+    def lock_for(self, kind, username=None):
+        """Lock held while a collection is read, modified and written back
+
+        Engines whose writes rewrite files return a lock that excludes other
+        threads and processes; the default is for engines whose writes are
+        atomic on their own. It is reentrant, so callers (utils) can hold it
+        across a write and the fingerprints taken around it.
+        """
+        return nullcontext()
+
+    def expense_archive(self, username=None):
+        """The archive.ExpenseArchive holding username's cold months, or None
+
+        Engines without archiving return None, and everything stays hot.
+        """
+        return None
+
+    def load_archived_expenses(self):
+        """Every archived expense (engines without archiving have none)"""
+        return []
+
+    def load_all_expenses(self):
+        """Hot and archived expenses together, for conversions and exports
+
+        An expense in both (an archive run that stopped before trimming the
+        hot data) is returned once.
+        """
+        archived = self.load_archived_expenses()
+        ids = {exp.get('id') for exp in archived}
+        return archived + [exp for exp in self.load_expenses() if not exp.get('id') or exp.get('id') not in ids]
+
+    def iter_expenses(self):
+        """Stream every hot expense (this default loads them all first)"""
+        return iter(self.load_expenses())
+
+    def iter_all_expenses(self, username=None, start_date=None, end_date=None):
+        """Stream expenses, archived months first, like load_all_expenses
+
+        Optionally only a user's, and only those within an inclusive date
+        range. At most one archived month, and a user's hot expenses in the
+        range, are held in memory at a time.
+        """
+        archive = self.expense_archive(username)
+        if archive is not None:
+            yield from archive.iter_records(username, start_date, end_date)
+        if username is not None:
+            hot = self.query_expenses(username, start_date, end_date)
+        else:
+            hot = (
+                exp for exp in self.iter_expenses()
+                if (start_date is None or exp.get('date', '') >= start_date)
+                and (end_date is None or exp.get('date', '') <= end_date)
+            )
+        archived = set(archive.months()) if archive is not None else ()
+        archived_ids = {}
+        for exp in hot:
+            month = month_of(exp.get('date', ''))
+            if month in archived and exp.get('id'):
+                # Only months with hot expenses too get their ids loaded
+                if month not in archived_ids:
+                    archived_ids[month] = {
+                        e.get('id') for e in archive.iter_records(None, month + "-01", month + "-31")
+                    }
+                if exp.get('id') in archived_ids[month]:
+                    continue
+            yield exp
+
+    # Data versions, for migrations.py
+    def data_version(self):
+        """Number of the last migration applied to this store (0: none)"""
+        return 0
+
+    def set_data_version(self, version):
+        raise NotImplementedError
+
+    def rewrite_records(self, kind, upgrade, chunk_size=10_000):
+        """Replace every record of a collection with upgrade(record)
+
+        For users, upgrade gets each account record. This default loads the
+        whole collection; engines that can stream override it.
+        """
+        with self.lock_for(kind):
+            data = getattr(self, f"load_{kind}")()
+            if kind == "users":
+                data = {username: upgrade(user) for username, user in data.items()}
+            else:
+                data = [upgrade(record) for record in data]
+            validate_collection(kind, data)
+            getattr(self, f"save_{kind}")(data)
+
+    def import_from(self, other):
+        """Copy every collection from another engine into this one
+
+        Archived expenses come across as hot ones.
+        """
+        self.save_expenses(other.load_all_expenses())
+        self.save_budgets(other.load_budgets())
+        self.save_investments(other.load_investments())
+        self.save_users(other.load_users())
+
+    # Per-user queries
+    def query_expenses(self, username, start_date=None, end_date=None):
+        """Return a user's expenses, optionally limited to an inclusive date range"""
+        return [
+            exp for exp in self.load_expenses()
+            if exp.get('username') == username
+            and (start_date is None or exp.get('date', '') >= start_date)
+            and (end_date is None or exp.get('date', '') <= end_date)
+        ]
+
+    def get_expense(self, expense_id, username=None):
+        """Return the expense with this id or None
+
+        username, when the caller knows it, lets an engine look in one place.
+        """
+        return next((exp for exp in self.load_expenses() if exp.get('id') == expense_id), None)
+
+    def get_budget(self, username):
+        """Return a user's budget or None"""
+        return next((b for b in self.load_budgets() if b.get('username') == username), None)
+
+    def query_investments(self, username):
+        """Return a user's saved investment plans"""
+        return [inv for inv in self.load_investments() if inv.get('username') == username]
+
+    def get_user(self, username):
+        """Return a user's account record or None"""
+        return self.load_users().get(username)
+
+    # Single-record writes
+    def add_expense(self, expense):
+        with self.lock_for("expenses"):
+            data = self.load_expenses()
+            data.append(expense)
+            self.save_expenses(data)
+
+    def add_expenses(self, expenses):
+        """Add several expenses in one write"""
+        with self.lock_for("expenses"):
+            data = self.load_expenses()
+            data.extend(expenses)
+            self.save_expenses(data)
+
+    def delete_expense(self, expense_id, username=None):
+        with self.lock_for("expenses"):
+            data = self.load_expenses()
+            self.save_expenses([exp for exp in data if exp.get('id') != expense_id])
+
+    def upsert_budget(self, budget):
+        with self.lock_for("budgets"):
+            data = self.load_budgets()
+            for i, existing in enumerate(data):
+                if existing.get('username') == budget.get('username'):
+                    data[i] = budget
+                    break
+            else:
+                data.append(budget)
+            self.save_budgets(data)
+
+    def add_investment(self, investment):
+        with self.lock_for("investments"):
+            data = self.load_investments()
+            data.append(investment)
+            self.save_investments(data)
+
+    def delete_investment(self, investment_id, username=None):
+        with self.lock_for("investments"):
+            data = self.load_investments()
+            self.save_investments([inv for inv in data if inv.get('id') != investment_id])
+
+    def upsert_user(self, username, user):
+        with self.lock_for("users"):
+            data = self.load_users()
+            data[username] = user
+            self.save_users(data)
+
+
+class JSONStorage(StorageEngine):
+    """The original layout: one JSON file per collection
+
+    Expense writes go to an append-only journal next to expenses.json (one
+    added record or deletion tombstone per line) instead of rewriting the
+    whole file. Loading reads the snapshot and replays the journal; once the
+    journal reaches JOURNAL_COMPACT_EVERY entries it is folded back into the
+    snapshot.
+
+    Files are written as compact JSON by a codec.py codec and checked
+    against the records.py schemas when read.
+
+    With an archive directory, archive_expenses moves old months out of the
+    hot expenses into an archive.ExpenseArchive; the per-user API then only
+    sees hot data, and utils merges in archived months when asked for them.
+
+    Each collection has a lock file next to it (expenses.lock, budgets.lock,
+    ...) held while it is written, so worker processes sharing the files
+    don't lose each other's updates. Readers never lock: whole files are
+    replaced by rename, and a journal line still being appended is ignored.
+
+    With lazy_expenses, utils caches expenses per user and fills each entry
+    from query_expenses, which streams expenses.json and keeps only the
+    user's records, so no page load materializes every user's expenses.
+    A user's fingerprint then counts only the journal entries for that user
+    (and deletes that don't name one), so other users' appends leave the
+    entry valid; a new snapshot still changes every user's.
+
+    With a writer.WriteBehind, whole-file saves and journal appends are
+    queued and committed in batches by its thread. Reads see the queued
+    writes, and fingerprints come from writer tokens.
+    Expense snapshots are always written at once, since the journal header
+    names the snapshot on disk. Queued writes are only visible to this
+    process, so write-behind is for single-process deployments.
+    """
+
+    JOURNAL_COMPACT_EVERY = 1000
+
+    def __init__(self, expense_file, budget_file, investment_file, user_file, codec=None,
+                 lazy_expenses=False, writer=None, archive_dir=None):
+        self.codec = codec or get_codec()
+        self.writer = writer
+        self.archive = ExpenseArchive(archive_dir, self.codec) if archive_dir else None
+        if lazy_expenses:
+            self.lazy_kinds = ("expenses",)
+        self.expense_file = expense_file
+        self.budget_file = budget_file
+        self.investment_file = investment_file
+        self.user_file = user_file
+        self.journal_file = os.path.splitext(expense_file)[0] + ".journal"
+        self.version_file = os.path.join(os.path.dirname(user_file), "data_version.json")
+        # Number of entries in the journal, or None until it has been read
+        self._journal_entries = None
+        # (journal stat, header line, bytes counted, {username: entries},
+        # entries naming no user) for per-user fingerprints
+        self._journal_scan = None
+
+    def lock_for(self, kind, username=None):
+        path = self.journal_file if kind == "expenses" else self._collection_file(kind)
+        return file_lock(os.path.splitext(path)[0] + ".lock")
+
+    def _collection_file(self, kind):
+        return {"budgets": self.budget_file, "investments": self.investment_file, "users": self.user_file}[kind]
+
+    def _load(self, path, default, kind):
+        raw = self.writer.read(path) if self.writer is not None else None
+        try:
+            if raw is None:
+                with open(path, "rb") as f:
+                    raw = f.read()
+            data = self.codec.loads(raw)
+        except (ValueError, FileNotFoundError):
+            return default
+        validate_collection(kind, data, path)
+        return data
+
+    def _save(self, path, data, defer=True):
+        # Temp file, fsync and rename, so readers never see a partial file
+        if defer and self.writer is not None:
+            self.writer.replace(path, self.codec.dumps(data))
+        else:
+            atomic_write(path, self.codec.dumps(data))
+
+    def _stat(self, path):
+        return self.writer.token(path) if self.writer is not None else file_stat(path)
+
+    def fingerprint(self, kind, username=None):
+        if kind == "expenses" and username is not None and kind in self.lazy_kinds and self.writer is None:
+            return (self._stat(self._snapshot_file()),) + self._journal_counts(username)
+        if kind == "expenses":
+            paths = (self._snapshot_file(), self.journal_file)
+        else:
+            paths = (self._collection_file(kind),)
+        return tuple(self._stat(path) for path in paths)
+
+    def _journal_counts(self, username):
+        """(journal entries for username, entries naming no user)
+
+        Only the lines appended since the last call are parsed. A journal
+        started over always has a new header line (it names the snapshot),
+        which starts the count over too.
+        """
+        stat = file_stat(self.journal_file)
+        scan = self._journal_scan
+        if stat is None:
+            return (0, 0)
+        if scan is None or scan[0] != stat:
+            try:
+                with open(self.journal_file, "rb") as f:
+                    header = f.readline()
+                    if scan is None or scan[1] != header:
+                        scan = (None, header, len(header), {}, 0)
+                    f.seek(scan[2])
+                    data = f.read()
+            except FileNotFoundError:
+                return (0, 0)
+            # Up to the last complete line; a torn one is counted once finished
+            data = data[:data.rfind(b"\n") + 1]
+            counts, anonymous = dict(scan[3]), scan[4]
+            if data and self._journal_header_ok(header):
+                for line in data.splitlines():
+                    try:
+                        entry = self.codec.loads(line)
+                        user = entry['record'].get('username') if entry.get('op') == 'add' else entry.get('username')
+                    except (ValueError, KeyError, AttributeError):
+                        user = None
+                    if user is None:
+                        anonymous += 1
+                    else:
+                        counts[user] = counts.get(user, 0) + 1
+            # Published in one assignment, for other threads
+            scan = self._journal_scan = (stat, header, scan[2] + len(data), counts, anonymous)
+        return (scan[3].get(username, 0), scan[4])
+
+    # Expense snapshot. Subclasses can store it in another format.
+    def _snapshot_file(self):
+        """File that is replaced whenever a new snapshot is written"""
+        return self.expense_file
+
+    def _load_expense_snapshot(self):
+        return self._load(self.expense_file, [], "expenses")
+
+    def _write_expense_snapshot(self, data):
+        self._save(self.expense_file, data, defer=False)
+
+    # Expense journal
+    def _snapshot_id(self):
+        """Identity of the current expenses snapshot file"""
+        try:
+            st = os.stat(self._snapshot_file())
+        except FileNotFoundError:
+            return None
+        return [st.st_ino, st.st_size, st.st_mtime_ns]
+
+    def _read_journal(self):
+        """Return the journal entries that apply to the current snapshot
+
+        The first line of a journal names the snapshot it was started on. If
+        the snapshot has been replaced since (a compaction that stopped before
+        removing the journal), the journal is already folded in and is
+        ignored. So is an incomplete last line. Nothing is changed on disk;
+        the next append cleans up (_start_journal).
+        """
+        entries = []
+        if self.writer is not None:
+            self.writer.flush(self.journal_file)
+        try:
+            with open(self.journal_file, "rb") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            self._journal_entries = 0
+            return entries
+
+        if not self._journal_header_ok(lines[0] if lines else b""):
+            self._journal_entries = 0
+            return entries
+
+        for number, line in enumerate(lines[1:], 2):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("incomplete line")
+                entry = self.codec.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted append, or one being
+                # appended right now
+                break
+            if entry.get('op') == 'add':
+                validate_record("expenses", entry.get('record'), f"{self.journal_file}: line {number}")
+            entries.append(entry)
+        self._journal_entries = len(entries)
+        return entries
+
+    def _journal_header_ok(self, line):
+        try:
+            header = self.codec.loads(line)
+        except ValueError:
+            return False
+        return (isinstance(header, dict) and line.endswith(b"\n") and header.get('op') == 'begin'
+                and header.get('snapshot') == self._snapshot_id())
+
+    def _start_journal(self):
+        """Make the journal on disk ready for an append; False if it needs a header
+
+        Called with the expenses lock held. A journal left over from an older
+        snapshot is removed and a torn last line cut off.
+        """
+        if self.writer is not None and self.writer.pending(self.journal_file):
+            # Started by an append that is still queued
+            return True
+        try:
+            with open(self.journal_file, "r+b") as f:
+                if not self._journal_header_ok(f.readline()):
+                    f.truncate(0)
+                    return False
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.seek(0)
+                    f.truncate(f.read().rfind(b"\n") + 1)
+                return True
+        except FileNotFoundError:
+            return False
+
+    def _append_journal(self, *entries):
+        line = b"".join(self.codec.dumps(entry) + b"\n" for entry in entries)
+        with self.lock_for("expenses"):
+            if self._journal_entries is None:
+                self._read_journal()
+            if not self._start_journal():
+                line = self.codec.dumps({"op": "begin", "snapshot": self._snapshot_id()}) + b"\n" + line
+                # Folded into a snapshot since this process last counted
+                self._journal_entries = 0
+            if self.writer is not None:
+                self.writer.append(self.journal_file, line)
+            else:
+                durable_append(self.journal_file, line)
+            self._journal_entries += len(entries)
+            if self._journal_entries >= self.JOURNAL_COMPACT_EVERY:
+                self.compact_expenses()
+
+    def compact_expenses(self):
+        """Fold the journal into a fresh expenses snapshot"""
+        with self.lock_for("expenses"):
+            self.save_expenses(self.load_expenses())
+
+    @staticmethod
+    def _replay(data, entries):
+        """Apply journal entries to a list of expense records"""
+        deleted = set()
+        for entry in entries:
+            if entry.get('op') == 'add':
+                record = entry['record']
+                if record.get('id') in deleted:
+                    # Re-added after a delete: apply the pending deletes first
+                    data = [exp for exp in data if exp.get('id') not in deleted]
+                    deleted = set()
+                data.append(record)
+            elif entry.get('op') == 'delete':
+                deleted.add(entry['id'])
+        if deleted:
+            data = [exp for exp in data if exp.get('id') not in deleted]
+        return data
+
+    def load_expenses(self):
+        return self._replay(self._load_expense_snapshot(), self._read_journal())
+
+    def _query_journal(self, username, start_date=None, end_date=None):
+        """Journal entries that can affect a user's expenses in a date range"""
+        return [
+            entry for entry in self._read_journal()
+            if entry.get('op') == 'delete' or (
+                entry['record'].get('username') == username
+                and (start_date is None or entry['record'].get('date', '') >= start_date)
+                and (end_date is None or entry['record'].get('date', '') <= end_date)
+            )
+        ]
+
+    def _iter_snapshot(self):
+        """Stream the records of expenses.json, validating each one it yields"""
+        try:
+            with open(self.expense_file, "r", encoding="utf-8") as f:
+                yield from iter_json_array(f)
+        except FileNotFoundError:
+            return
+
+    def query_expenses(self, username, start_date=None, end_date=None):
+        records = []
+        try:
+            for i, expense in enumerate(self._iter_snapshot()):
+                if not isinstance(expense, dict) or expense.get('username') == username:
+                    validate_record("expenses", expense, f"{self.expense_file}: record {i}")
+                    if ((start_date is None or expense.get('date', '') >= start_date)
+                            and (end_date is None or expense.get('date', '') <= end_date)):
+                        records.append(expense)
+        except ValueError as e:
+            if isinstance(e, SchemaError):
+                raise
+            # Unreadable file: treated as empty, as in _load
+            records = []
+        return self._replay(records, self._query_journal(username, start_date, end_date))
+
+    def _open_expense_snapshot(self):
+        """Iterator over the records of the snapshot as it is now
+
+        The file is opened here, so a compaction after this call doesn't
+        change what the iterator yields.
+        """
+        try:
+            f = open(self.expense_file, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return iter(())
+        return self._stream_snapshot(f)
+
+    def _stream_snapshot(self, f, batch_size=1000):
+        with f:
+            records = iter_json_array(f)
+            start = 0
+            while batch := list(islice(records, batch_size)):
+                # Checked a batch at a time, which takes the fast path
+                try:
+                    validate_collection("expenses", batch)
+                except SchemaError:
+                    for i, expense in enumerate(batch, start):
+                        validate_record("expenses", expense, f"{self.expense_file}: record {i}")
+                yield from batch
+                start += len(batch)
+
+    def iter_expenses(self):
+        # The snapshot is opened and the journal read under the lock, so
+        # the two belong together
+        with self.lock_for("expenses"):
+            snapshot = self._open_expense_snapshot()
+            entries = self._read_journal()
+        deleted = {entry['id'] for entry in entries if entry.get('op') == 'delete'}
+        for expense in snapshot:
+            if expense.get('id') not in deleted:
+                yield expense
+        yield from self._replay([], entries)
+
+    def _find_in_snapshot(self, expense_id):
+        try:
+            return next((exp for exp in self._iter_snapshot()
+                         if isinstance(exp, dict) and exp.get('id') == expense_id), None)
+        except ValueError:
+            return None
+
+    def get_expense(self, expense_id, username=None):
+        # The newest journal entry for the id wins over the snapshot
+        for entry in reversed(self._read_journal()):
+            if entry.get('op') == 'delete' and entry['id'] == expense_id:
+                return None
+            if entry.get('op') == 'add' and entry['record'].get('id') == expense_id:
+                return entry['record']
+        return self._find_in_snapshot(expense_id)
+
+    def expense_archive(self, username=None):
+        return self.archive
+
+    def load_archived_expenses(self):
+        return self.archive.load_all() if self.archive is not None else []
+
+    def archive_expenses(self, before):
+        """Move expenses dated before the YYYY-MM month `before` into the archive
+
+        Returns the number of expenses moved.
+        """
+        if self.archive is None:
+            raise ValueError("no archive directory configured")
+        with self.lock_for("expenses"):
+            hot, cold = [], []
+            for exp in self.load_expenses():
+                (cold if month_of(exp.get('date', '')) < before else hot).append(exp)
+            if cold:
+                self.archive.add(cold)
+                self.save_expenses(hot)
+            return len(cold)
+
+    def delete_archived_expense(self, expense_id, username=None):
+        with self.lock_for("expenses"):
+            return self.archive is not None and self.archive.delete(expense_id, username)
+
+    def data_version(self):
+        try:
+            with open(self.version_file, "rb") as f:
+                return self.codec.loads(f.read())["version"]
+        except FileNotFoundError:
+            return 0
+
+    def set_data_version(self, version):
+        atomic_write(self.version_file, self.codec.dumps({"version": version}))
+
+    def rewrite_records(self, kind, upgrade, chunk_size=10_000):
+        """Stream a collection file through upgrade into a new file
+
+        Only chunk_size records are held at a time, so this works on files
+        far larger than memory. The new file replaces the old one by rename
+        once complete; writers wait on the collection lock meanwhile, and
+        readers keep reading the old file.
+        """
+        with self.lock_for(kind):
+            if kind == "expenses":
+                if self.writer is not None or os.path.exists(self.journal_file):
+                    self.compact_expenses()
+                if self.archive is not None:
+                    self.archive.rewrite(upgrade)
+                path = self.expense_file
+            else:
+                path = self._collection_file(kind)
+                if self.writer is not None:
+                    self.writer.flush(path)
+            if os.path.exists(path):
+                _rewrite_json_file(path, kind, upgrade, self.codec, chunk_size)
+
+    def save_expenses(self, data):
+        with self.lock_for("expenses"):
+            self._write_expense_snapshot(data)
+            # The new snapshot supersedes any journal, queued appends included
+            if self.writer is not None:
+                self.writer.remove(self.journal_file)
+            elif os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            self._journal_entries = 0
+
+    def add_expense(self, expense):
+        self._append_journal({"op": "add", "record": expense})
+
+    def add_expenses(self, expenses):
+        with self.lock_for("expenses"):
+            if self._journal_entries is None:
+                self._read_journal()
+            if self._journal_entries + len(expenses) < self.JOURNAL_COMPACT_EVERY:
+                # One append and one fsync for the batch
+                self._append_journal(*({"op": "add", "record": exp} for exp in expenses))
+            else:
+                # Would be compacted straight away: write the snapshot directly
+                self.save_expenses(self.load_expenses() + list(expenses))
+
+    def delete_expense(self, expense_id, username=None):
+        entry = {"op": "delete", "id": expense_id}
+        if username is not None:
+            # Lets per-user fingerprints tell whose expense it was
+            entry["username"] = username
+        self._append_journal(entry)
+
+    def load_budgets(self):
+        return self._load(self.budget_file, [], "budgets")
+
+    def save_budgets(self, data):
+        with self.lock_for("budgets"):
+            self._save(self.budget_file, data)
+
+    def load_investments(self):
+        return self._load(self.investment_file, [], "investments")
+
+    def save_investments(self, data):
+        with self.lock_for("investments"):
+            self._save(self.investment_file, data)
+
+    def load_users(self):
+        return self._load(self.user_file, {}, "users")
+
+    def save_users(self, data):
+        with self.lock_for("users"):
+            self._save(self.user_file, data)
+
+
+def _rewrite_json_file(path, kind, upgrade, codec, chunk_size):
+    """Stream a JSON collection file through upgrade, validating each chunk"""
+    keyed = kind == "users"
+    tmp_path = path + ".migrate"
+    with open(path, "r", encoding="utf-8") as src, open(tmp_path, "wb") as out:
+        items = iter_json_object(src) if keyed else iter_json_array(src)
+        out.write(b"{" if keyed else b"[")
+        written = 0
+        chunk = []
+        for item in items:
+            chunk.append((item[0], upgrade(item[1])) if keyed else upgrade(item))
+            if len(chunk) >= chunk_size:
+                written = _write_chunk(out, kind, chunk, written, codec, path)
+                chunk = []
+        _write_chunk(out, kind, chunk, written, codec, path)
+        out.write(b"}" if keyed else b"]")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_chunk(out, kind, chunk, written, codec, path):
+    if not chunk:
+        return written
+    if kind == "users":
+        validate_collection(kind, dict(chunk), path)
+        pieces = [codec.dumps(key) + b":" + codec.dumps(value) for key, value in chunk]
+    else:
+        validate_collection(kind, chunk, path)
+        pieces = [codec.dumps(record) for record in chunk]
+    out.write((b"," if written else b"") + b",".join(pieces))
+    return written + len(chunk)
+
+
+class ColumnarStorage(JSONStorage):
+    """JSONStorage with the expense snapshot in a memory-mapped columnar store
+
+    The snapshot is a columnar.py directory instead of expenses.json, so
+    opening it costs nothing and a user's expenses are read straight from the
+    mapped arrays. Writes still go through the journal. Budgets, investments
+    and users stay in their JSON files.
+
+    Expenses are always lazy: utils caches them per user instead of loading
+    the whole collection.
+    """
+
+    def __init__(self, expense_dir, budget_file, investment_file, user_file, categories=(), codec=None,
+                 writer=None, archive_dir=None):
+        super().__init__(expense_dir, budget_file, investment_file, user_file, codec, lazy_expenses=True,
+                         writer=writer, archive_dir=archive_dir)
+        self.journal_file = expense_dir.rstrip(os.sep) + ".journal"
+        self.categories = list(categories)
+        self._columns = None
+
+    def has_snapshot(self):
+        return current_generation(self.expense_file) is not None
+
+    def columns(self):
+        """The current generation, reopened only after it has been replaced"""
+        generation = current_generation(self.expense_file)
+        if self._columns is None or self._columns.generation != generation:
+            self._columns = ColumnarExpenses(self.expense_file)
+        return self._columns
+
+    def _snapshot_file(self):
+        return os.path.join(self.expense_file, "CURRENT")
+
+    def _load_expense_snapshot(self):
+        return list(self.columns())
+
+    def _open_expense_snapshot(self):
+        # A generation is never modified, and stays mapped once replaced
+        return iter(self.columns())
+
+    def _write_expense_snapshot(self, data):
+        write_columns(self.expense_file, data, self.categories)
+
+    def query_expenses(self, username, start_date=None, end_date=None):
+        records = self.columns().user_records(username, start_date, end_date)
+        return self._replay(records, self._query_journal(username, start_date, end_date))
+
+    def rewrite_records(self, kind, upgrade, chunk_size=10_000):
+        if kind == "expenses":
+            # The snapshot isn't a JSON file: rewrite it whole
+            with self.lock_for(kind):
+                if self.archive is not None:
+                    self.archive.rewrite(upgrade)
+                StorageEngine.rewrite_records(self, kind, upgrade, chunk_size)
+        else:
+            super().rewrite_records(kind, upgrade, chunk_size)
+
+    def _find_in_snapshot(self, expense_id):
+        columns = self.columns()
+        row = columns.find(expense_id)
+        return columns.record(row) if row is not None else None
+
+
+class ShardedStorage(StorageEngine):
+    """One directory per user, so reads and writes touch only that user's files
+
+    Layout under root:
+        manifest.json        {"version": 1, "users": {username: shard name}}
+        u000001/             a JSONStorage for one user: expenses.json (+
+                             journal), budgets.json, investments.json and
+                             users.json holding just that user's records,
+                             plus archive/ when archiving is on
+
+    Shard names are allocated in the manifest rather than derived from the
+    username, so any username is safe. Every collection is lazy: utils caches
+    it per user, and whole-collection loads are only used by tools.
+    """
+
+    MANIFEST_VERSION = 1
+    lazy_kinds = ("expenses", "budgets", "investments", "users")
+
+    def __init__(self, root, codec=None, writer=None, archive=False):
+        self.root = root
+        self.codec = codec or get_codec()
+        self.writer = writer
+        self.archive = archive
+        self.manifest_file = os.path.join(root, "manifest.json")
+        self.manifest_lock = os.path.join(root, "manifest.lock")
+        self.version_file = os.path.join(root, "data_version.json")
+        # (stat, users) of the manifest last read, replaced as a whole so
+        # readers never see a half-updated pair
+        self._manifest = None
+        self._shards = {}
+
+    def _users(self):
+        """username -> shard name, re-read when another process changed the manifest"""
+        stat = file_stat(self.manifest_file)
+        snapshot = self._manifest
+        if snapshot is None or stat != snapshot[0]:
+            try:
+                with open(self.manifest_file, "rb") as f:
+                    manifest = self.codec.loads(f.read())
+            except FileNotFoundError:
+                manifest = {"version": self.MANIFEST_VERSION, "users": {}}
+            snapshot = self._manifest = (stat, manifest["users"])
+        return snapshot[1]
+
+    def _manifest_stat(self):
+        self._users()
+        return self._manifest[0]
+
+    def _write_manifest(self, users):
+        # Called with the manifest lock held. Written at once: shards are
+        # found through it
+        atomic_write(self.manifest_file, self.codec.dumps({"version": self.MANIFEST_VERSION, "users": users}))
+        self._manifest = None
+
+    def has_manifest(self):
+        return os.path.exists(self.manifest_file)
+
+    def usernames(self):
+        return list(self._users())
+
+    def _shard(self, username, create=False):
+        """The JSONStorage of a user's shard, or None if they have none yet"""
+        name = self._users().get(username)
+        if name is None:
+            if not create:
+                return None
+            # Other processes may be adding users too
+            os.makedirs(self.root, exist_ok=True)
+            with file_lock(self.manifest_lock):
+                users = dict(self._users())
+                name = users.get(username)
+                if name is None:
+                    name = f"u{len(users) + 1:06d}"
+                    users[username] = name
+                    os.makedirs(os.path.join(self.root, name), exist_ok=True)
+                    self._write_manifest(users)
+        shard = self._shards.get(name)
+        if shard is None:
+            path = os.path.join(self.root, name)
+            shard = JSONStorage(
+                os.path.join(path, "expenses.json"), os.path.join(path, "budgets.json"),
+                os.path.join(path, "investments.json"), os.path.join(path, "users.json"), self.codec,
+                writer=self.writer, archive_dir=os.path.join(path, "archive") if self.archive else None
+            )
+            self._shards[name] = shard
+        return shard
+
+    def _all_shards(self):
+        return [(username, self._shard(username)) for username in self._users()]
+
+    def lock_for(self, kind, username=None):
+        # Only the user's own shard needs locking. The write is about to
+        # create it anyway, and creating it here means the lock is the same
+        # before and after
+        if username is None:
+            return nullcontext()
+        return self._shard(username, create=True).lock_for(kind)
+
+    def fingerprint(self, kind, username=None):
+        if username is not None:
+            shard = self._shard(username)
+            # A missing shard turns up as a manifest change
+            return shard.fingerprint(kind) if shard is not None else ("none", self._manifest_stat())
+        shards = self._all_shards()
+        return (self._manifest_stat(),) + tuple(shard.fingerprint(kind) for _, shard in shards)
+
+    # Whole collections: every shard in manifest order
+    def _load_all(self, method):
+        return [record for _, shard in self._all_shards() for record in getattr(shard, method)()]
+
+    def _save_all(self, data, method):
+        grouped = {username: [] for username in self._users()}
+        for record in data:
+            grouped.setdefault(record.get('username'), []).append(record)
+        for username, records in grouped.items():
+            getattr(self._shard(username, create=True), method)(records)
+        if not self.has_manifest():
+            # Saved with no users at all: the store still exists
+            os.makedirs(self.root, exist_ok=True)
+            with file_lock(self.manifest_lock):
+                if not self.has_manifest():
+                    self._write_manifest({})
+
+    def load_expenses(self):
+        return self._load_all("load_expenses")
+
+    def save_expenses(self, data):
+        self._save_all(data, "save_expenses")
+
+    def load_budgets(self):
+        return self._load_all("load_budgets")
+
+    def save_budgets(self, data):
+        self._save_all(data, "save_budgets")
+
+    def load_investments(self):
+        return self._load_all("load_investments")
+
+    def save_investments(self, data):
+        self._save_all(data, "save_investments")
+
+    def load_users(self):
+        users = {}
+        for _, shard in self._all_shards():
+            users.update(shard.load_users())
+        return users
+
+    def save_users(self, data):
+        for username in set(self._users()) | set(data):
+            self._shard(username, create=True).save_users(
+                {username: data[username]} if username in data else {}
+            )
+
+    def is_empty(self):
+        return not self._users()
+
+    def compact_expenses(self):
+        """Fold every shard's expense journal into its snapshot"""
+        for _, shard in self._all_shards():
+            shard.compact_expenses()
+
+    def expense_archive(self, username=None):
+        shard = self._shard(username) if username is not None else None
+        return shard.archive if shard is not None else None
+
+    def load_archived_expenses(self):
+        return [exp for _, shard in self._all_shards() for exp in shard.load_archived_expenses()]
+
+    def iter_expenses(self):
+        for _, shard in self._all_shards():
+            yield from shard.iter_expenses()
+
+    def iter_all_expenses(self, username=None, start_date=None, end_date=None):
+        if username is not None:
+            shard = self._shard(username)
+            return shard.iter_all_expenses(username, start_date, end_date) if shard is not None else iter(())
+        return (
+            exp for _, shard in self._all_shards()
+            for exp in shard.iter_all_expenses(None, start_date, end_date)
+        )
+
+    def data_version(self):
+        try:
+            with open(self.version_file, "rb") as f:
+                return self.codec.loads(f.read())["version"]
+        except FileNotFoundError:
+            return 0
+
+    def set_data_version(self, version):
+        os.makedirs(self.root, exist_ok=True)
+        atomic_write(self.version_file, self.codec.dumps({"version": version}))
+
+    def rewrite_records(self, kind, upgrade, chunk_size=10_000):
+        # One shard at a time; a shard's own data_version.json is unused
+        for _, shard in self._all_shards():
+            shard.rewrite_records(kind, upgrade, chunk_size)
+
+    def archive_expenses(self, before):
+        """Archive every shard's expenses dated before the YYYY-MM month `before`"""
+        return sum(shard.archive_expenses(before) for _, shard in self._all_shards())
+
+    def delete_archived_expense(self, expense_id, username=None):
+        shards = [self._shard(username)] if username is not None else [s for _, s in self._all_shards()]
+        return any(shard is not None and shard.delete_archived_expense(expense_id) for shard in shards)
+
+    # Per-user access goes to a single shard
+    def query_expenses(self, username, start_date=None, end_date=None):
+        shard = self._shard(username)
+        return shard.query_expenses(username, start_date, end_date) if shard is not None else []
+
+    def get_expense(self, expense_id, username=None):
+        shards = [self._shard(username)] if username is not None else [s for _, s in self._all_shards()]
+        for shard in shards:
+            expense = shard.get_expense(expense_id) if shard is not None else None
+            if expense is not None:
+                return expense
+        return None
+
+    def get_budget(self, username):
+        shard = self._shard(username)
+        return shard.get_budget(username) if shard is not None else None
+
+    def query_investments(self, username):
+        shard = self._shard(username)
+        return shard.load_investments() if shard is not None else []
+
+    def get_user(self, username):
+        shard = self._shard(username)
+        return shard.get_user(username) if shard is not None else None
+
+    def add_expense(self, expense):
+        self._shard(expense.get('username'), create=True).add_expense(expense)
+
+    def add_expenses(self, expenses):
+        by_user = {}
+        for exp in expenses:
+            by_user.setdefault(exp.get('username'), []).append(exp)
+        for username, records in by_user.items():
+            self._shard(username, create=True).add_expenses(records)
+
+    def delete_expense(self, expense_id, username=None):
+        if username is None:
+            expense = self.get_expense(expense_id)
+            username = expense.get('username') if expense is not None else None
+        shard = self._shard(username) if username is not None else None
+        if shard is not None:
+            shard.delete_expense(expense_id)
+
+    def upsert_budget(self, budget):
+        self._shard(budget.get('username'), create=True).save_budgets([budget])
+
+    def add_investment(self, investment):
+        self._shard(investment.get('username'), create=True).add_investment(investment)
+
+    def delete_investment(self, investment_id, username=None):
+        if username is not None:
+            shards = [self._shard(username)]
+        else:
+            shards = [s for _, s in self._all_shards()]
+        for shard in shards:
+            if shard is not None:
+                shard.delete_investment(investment_id)
+
+    def upsert_user(self, username, user):
+        self._shard(username, create=True).save_users({username: user})
+
+
+class SQLiteStorage(StorageEngine):
+    """SQLite engine indexed on username, date and id"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS expenses (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL,
+        username TEXT NOT NULL,
+        date TEXT NOT NULL,
+        paise INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_expenses_user_date ON expenses (username, date);
+    CREATE INDEX IF NOT EXISTS idx_expenses_id ON expenses (id);
+
+    CREATE TABLE IF NOT EXISTS budgets (
+        username TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS investments (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        id TEXT NOT NULL,
+        username TEXT NOT NULL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_investments_user ON investments (username);
+    CREATE INDEX IF NOT EXISTS idx_investments_id ON investments (id);
+
+    CREATE TABLE IF NOT EXISTS users (
+        username TEXT PRIMARY KEY,
+        data TEXT NOT NULL
+    );
+
+    -- Per-table change counters, bumped by triggers, for cache fingerprints
+    CREATE TABLE IF NOT EXISTS versions (
+        kind TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO versions (kind) VALUES ('expenses'), ('budgets'), ('investments'), ('users');
+    """
+
+    TRIGGER = """
+    CREATE TRIGGER IF NOT EXISTS {table}_{event}_version AFTER {event} ON {table}
+    BEGIN
+        UPDATE versions SET version = version + 1 WHERE kind = '{table}';
+    END;
+    """
+
+    EXPENSE_COLUMNS = ("id", "username", "date", "paise", "category", "description")
+
+    def __init__(self, path, codec=None):
+        self.codec = codec or get_codec()
+        self.path = path
+        # Streamlit serves each session from its own thread, so each thread
+        # gets its own connection
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+            for table in ("expenses", "budgets", "investments", "users"):
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    conn.executescript(self.TRIGGER.format(table=table, event=event))
+            self._migrate_paise(conn)
+
+    def _migrate_paise(self, conn):
+        """Convert a database from REAL rupee amounts to INTEGER paise"""
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(expenses)")}
+        if "amount" not in columns:
+            return
+        conn.execute("ALTER TABLE expenses ADD COLUMN paise INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE expenses SET paise = CAST(ROUND(amount * 100) AS INTEGER)")
+        conn.execute("ALTER TABLE expenses DROP COLUMN amount")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def fingerprint(self, kind, username=None):
+        row = self._connect().execute("SELECT version FROM versions WHERE kind = ?", (kind,)).fetchone()
+        return row["version"]
+
+    def lock_for(self, kind, username=None):
+        # Each statement is atomic on its own, but utils carries its cached
+        # view over a write by comparing the versions before and after it;
+        # another process's write in between would go missing from the view
+        return file_lock(f"{self.path}.{kind}.lock")
+
+    def _encode(self, value):
+        """JSON text for the data columns"""
+        return self.codec.dumps(value).decode("utf-8")
+
+    def is_empty(self):
+        """True if no collection has any rows yet"""
+        conn = self._connect()
+        for table in ("expenses", "budgets", "investments", "users"):
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                return False
+        return True
+
+    # Expenses
+    def _expense_row(self, expense):
+        return (
+            str(expense.get('id', '')),
+            expense.get('username', ''),
+            expense.get('date', ''),
+            to_paise(expense.get('amount', 0)),
+            expense.get('category', 'Others'),
+            expense.get('description', ''),
+        )
+
+    def _expense_dict(self, row):
+        return {
+            "username": row["username"],
+            "amount": to_rupees(row["paise"]),
+            "category": row["category"],
+            "date": row["date"],
+            "description": row["description"],
+            "id": row["id"],
+        }
+
+    def load_expenses(self):
+        rows = self._connect().execute("SELECT * FROM expenses ORDER BY seq")
+        return [self._expense_dict(row) for row in rows]
+
+    def iter_expenses(self):
+        # A connection of its own, closed when the iteration ends, so an
+        # export abandoned halfway doesn't leave a read open on the shared one
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute("SELECT * FROM expenses ORDER BY seq"):
+                yield self._expense_dict(row)
+        finally:
+            conn.close()
+
+    def save_expenses(self, data):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM expenses")
+            conn.executemany(
+                "INSERT INTO expenses (id, username, date, paise, category, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._expense_row(exp) for exp in data]
+            )
+
+    def query_expenses(self, username, start_date=None, end_date=None):
+        sql = "SELECT * FROM expenses WHERE username = ?"
+        params = [username]
+        if start_date is not None:
+            sql += " AND date >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            sql += " AND date <= ?"
+            params.append(end_date)
+        rows = self._connect().execute(sql + " ORDER BY seq", params)
+        return [self._expense_dict(row) for row in rows]
+
+    def get_expense(self, expense_id, username=None):
+        # First match like the base class, through the id index
+        row = self._connect().execute(
+            "SELECT * FROM expenses WHERE id = ? ORDER BY seq LIMIT 1", (str(expense_id),)
+        ).fetchone()
+        return self._expense_dict(row) if row else None
+
+    def add_expense(self, expense):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO expenses (id, username, date, paise, category, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                self._expense_row(expense)
+            )
+
+    def add_expenses(self, expenses):
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO expenses (id, username, date, paise, category, description) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [self._expense_row(exp) for exp in expenses]
+            )
+
+    def delete_expense(self, expense_id, username=None):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM expenses WHERE id = ?", (str(expense_id),))
+
+    # Budgets
+    def load_budgets(self):
+        rows = self._connect().execute("SELECT data FROM budgets ORDER BY rowid")
+        return [self.codec.loads(row["data"]) for row in rows]
+
+    def save_budgets(self, data):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM budgets")
+            conn.executemany(
+                "INSERT OR REPLACE INTO budgets (username, data) VALUES (?, ?)",
+                [(b.get('username', ''), self._encode(b)) for b in data]
+            )
+
+    def get_budget(self, username):
+        row = self._connect().execute(
+            "SELECT data FROM budgets WHERE username = ?", (username,)
+        ).fetchone()
+        return self.codec.loads(row["data"]) if row else None
+
+    def upsert_budget(self, budget):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO budgets (username, data) VALUES (?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET data = excluded.data",
+                (budget.get('username', ''), self._encode(budget))
+            )
+
+    # Investments
+    def load_investments(self):
+        rows = self._connect().execute("SELECT data FROM investments ORDER BY seq")
+        return [self.codec.loads(row["data"]) for row in rows]
+
+    def save_investments(self, data):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM investments")
+            conn.executemany(
+                "INSERT INTO investments (id, username, data) VALUES (?, ?, ?)",
+                [(str(inv.get('id', '')), inv.get('username', ''), self._encode(inv)) for inv in data]
+            )
+
+    def query_investments(self, username):
+        rows = self._connect().execute(
+            "SELECT data FROM investments WHERE username = ? ORDER BY seq", (username,)
+        )
+        return [self.codec.loads(row["data"]) for row in rows]
+
+    def add_investment(self, investment):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO investments (id, username, data) VALUES (?, ?, ?)",
+                (str(investment.get('id', '')), investment.get('username', ''), self._encode(investment))
+            )
+
+    def delete_investment(self, investment_id, username=None):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM investments WHERE id = ?", (str(investment_id),))
+
+    # Users
+    def load_users(self):
+        rows = self._connect().execute("SELECT username, data FROM users ORDER BY rowid")
+        return {row["username"]: self.codec.loads(row["data"]) for row in rows}
+
+    def save_users(self, data):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                "INSERT INTO users (username, data) VALUES (?, ?)",
+                [(username, self._encode(user)) for username, user in data.items()]
+            )
+
+    def get_user(self, username):
+        row = self._connect().execute(
+            "SELECT data FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return self.codec.loads(row["data"]) if row else None
+
+    def upsert_user(self, username, user):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO users (username, data) VALUES (?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET data = excluded.data",
+                (username, self._encode(user))
+            )
+
+    # Data versions
+    def data_version(self):
+        return self._connect().execute("PRAGMA user_version").fetchone()[0]
+
+    def set_data_version(self, version):
+        with self._connect() as conn:
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def rewrite_records(self, kind, upgrade, chunk_size=10_000):
+        """Upgrade the JSON data column chunk_size rows per transaction"""
+        if kind == "expenses":
+            # Expenses are columns, not JSON documents
+            return super().rewrite_records(kind, upgrade, chunk_size)
+        conn = self._connect()
+        last = 0
+        while True:
+            rows = conn.execute(
+                f"SELECT rowid AS row_id, username, data FROM {kind} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last, chunk_size)
+            ).fetchall()
+            if not rows:
+                return
+            records = [upgrade(self.codec.loads(row["data"])) for row in rows]
+            if kind == "users":
+                validate_collection(kind, {row["username"]: r for row, r in zip(rows, records)}, self.path)
+            else:
+                validate_collection(kind, records, self.path)
+            with conn:
+                conn.executemany(
+                    f"UPDATE {kind} SET data = ? WHERE rowid = ?",
+                    [(self._encode(record), row["row_id"]) for record, row in zip(records, rows)]
+                )
+            last = rows[-1]["row_id"]
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest
+
+from passwords import hash_password
+from storage import JSONStorage
+from utils import get_user_account, set_storage
+
+APP = os.path.join(os.path.dirname(__file__), "..", "app.py")
+
+
+@pytest.fixture
+def storage(tmp_path):
+    engine = JSONStorage(*(str(tmp_path / name) for name in (
+        "expenses.json", "budgets.json", "investments.json", "users.json")))
+    engine.save_expenses([{"username": "demo", "amount": 250.0, "category": "Food & Dining",
+                           "date": "2024-01-15", "description": "Lunch", "id": "e1"}])
+    engine.save_users({"demo": {"password_hash": hash_password("secret")}, "legacy": {"password": "1234"}})
+    set_storage(engine)
+    yield engine
+    set_storage(None)
+
+
+def click(at, label):
+    next(button for button in at.button if button.label == label).click().run()
+
+
+def login(username, password):
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    at.text_input[0].input(username)
+    at.text_input[1].input(password)
+    click(at, "Login")
+    return at
+
+
+def test_login(storage):
+    assert login("demo", "secret").session_state.login_status
+    for username, password in (("demo", "wrong"), ("nobody", "secret")):
+        at = login(username, password)
+        assert not at.session_state.login_status
+        assert at.error[0].value == "Invalid username or password"
+
+
+def test_login_rehashes_a_plaintext_password(storage):
+    assert not login("legacy", "12345").session_state.login_status
+    assert login("legacy", "1234").session_state.login_status
+    user = get_user_account("legacy")
+    assert "password" not in user
+    assert login("legacy", "1234").session_state.login_status
+
+
+def test_register_keeps_existing_accounts(storage):
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    for field, value in zip(at.text_input[2:], ("demo", "mine", "mine")):
+        field.input(value)
+    click(at, "Register")
+    assert at.error[0].value == "That username is taken"
+    assert login("demo", "secret").session_state.login_status
+
+
+def test_export_button(storage):
+    at = login("demo", "secret")
+    at.session_state.current_page = "expenses"
+    at.run()
+
+    click(at, "Prepare Export")
+
+    assert not at.exception
+    downloads = at.get("download_button")
+    assert len(downloads) == 1
+    assert downloads[0].proto.label == "Download 1 expenses"
@@ -0,0 +1,23 @@
+from columnar import ColumnarExpenses, write_columns
+from storage import ColumnarStorage
+
+
+def test_expense_without_a_date(tmp_path):
+    # records.py allows a missing date, and Expense.from_dict makes it ""
+    expenses = [
+        {"username": "demo", "amount": 12.5, "category": "Others", "date": "", "description": "", "id": "a"},
+        {"username": "demo", "amount": 40.0, "category": "Rent", "date": "2024-03-01", "description": "", "id": "b"},
+    ]
+    write_columns(str(tmp_path / "expenses.columns"), expenses)
+
+    store = ColumnarExpenses(str(tmp_path / "expenses.columns"))
+    assert sorted(store, key=lambda exp: exp["id"]) == expenses
+
+
+def test_columnar_storage_round_trip_without_a_date(tmp_path):
+    storage = ColumnarStorage(*(str(tmp_path / name) for name in (
+        "expenses.columns", "budgets.json", "investments.json", "users.json")))
+    storage.save_expenses([
+        {"username": "demo", "amount": 1.0, "category": "Others", "date": "", "description": "", "id": "a"},
+    ])
+    assert storage.load_expenses()[0]["date"] == ""
@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils
+from storage import ColumnarStorage, JSONStorage, ShardedStorage, SQLiteStorage
+
+ENGINES = ("json", "lazy-json", "columnar", "sharded", "sqlite")
+
+# Several writers share each user, and the JSON engines share one file per
+# collection, so every write races others on the same file
+WORKERS = 6
+ROUNDS = 60
+USERS = 3
+
+
+def make_storage(engine, root):
+    files = [os.path.join(root, name) for name in ("budgets.json", "investments.json", "users.json")]
+    if engine in ("json", "lazy-json"):
+        return JSONStorage(os.path.join(root, "expenses.json"), *files, lazy_expenses=engine == "lazy-json")
+    if engine == "columnar":
+        return ColumnarStorage(os.path.join(root, "expenses.columns"), *files, utils.CATEGORY_COLORS)
+    if engine == "sharded":
+        return ShardedStorage(os.path.join(root, "shards"))
+    return SQLiteStorage(os.path.join(root, "finsmart.db"))
+
+
+def stress_writer(engine, root, worker):
+    """ROUNDS rounds of expense add, budget upsert and investment add/delete"""
+    storage = make_storage(engine, root)
+    for i in range(ROUNDS):
+        username = f"user{(worker + i) % USERS}"
+        storage.add_expense({"username": username, "amount": 1.5, "category": "Others",
+                             "date": "2024-01-01", "description": "", "id": f"e{worker}-{i}"})
+        storage.upsert_budget({"username": username, "monthly_budget": worker * ROUNDS + i})
+        storage.add_investment({"username": username, "name": "", "id": f"i{worker}-{i}"})
+        if i % 2:
+            storage.delete_investment(f"i{worker}-{i}", username)
+
+
+def cached_writer(engine, root, worker, barrier):
+    """Adds through utils, so the cached view is carried over each write; returns
+    what the cache holds once every worker is done"""
+    utils.set_storage(make_storage(engine, root))
+    utils.get_user_expenses("shared")
+    for i in range(ROUNDS):
+        utils.add_expense({"username": "shared", "amount": 1.0, "category": "Others",
+                           "date": "2024-01-01", "description": "", "id": f"e{worker}-{i}"})
+    barrier.wait()
+    return len(utils.get_user_expenses("shared"))
+
+
+@pytest.fixture(autouse=True)
+def frequent_compaction(monkeypatch):
+    # Enough expenses are added to cross several journal compactions
+    monkeypatch.setattr(JSONStorage, "JOURNAL_COMPACT_EVERY", 50)
+
+
+@pytest.mark.parametrize("mode", ["threads", "processes"])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_no_lost_updates(tmp_path, engine, mode):
+    root = str(tmp_path)
+    if engine == "columnar":
+        make_storage(engine, root).save_expenses([])
+    jobs = [(engine, root, worker) for worker in range(WORKERS)]
+    if mode == "threads":
+        with ThreadPoolExecutor(WORKERS) as pool:
+            list(pool.map(lambda job: stress_writer(*job), jobs))
+    else:
+        with multiprocessing.get_context("fork").Pool(WORKERS) as pool:
+            pool.starmap(stress_writer, jobs)
+
+    # Read back through a fresh engine
+    storage = make_storage(engine, root)
+    expenses = storage.load_expenses()
+    assert len(expenses) == WORKERS * ROUNDS
+    assert len({exp['id'] for exp in expenses}) == WORKERS * ROUNDS
+    assert sorted(inv['id'] for inv in storage.load_investments()) == sorted(
+        f"i{worker}-{i}" for worker in range(WORKERS) for i in range(0, ROUNDS, 2)
+    )
+    assert sorted(b['username'] for b in storage.load_budgets()) == [f"user{u}" for u in range(USERS)]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cached_views_see_other_processes(tmp_path, engine):
+    root = str(tmp_path)
+    if engine == "columnar":
+        make_storage(engine, root).save_expenses([])
+    context = multiprocessing.get_context("fork")
+    barrier = context.Manager().Barrier(WORKERS)
+    with context.Pool(WORKERS) as pool:
+        counts = pool.starmap(cached_writer, [(engine, root, worker, barrier) for worker in range(WORKERS)])
+    assert counts == [WORKERS * ROUNDS] * WORKERS
+
+
+class SlowSQLiteStorage(SQLiteStorage):
+    """Signals once its insert is done, then holds the write open a while"""
+
+    def __init__(self, path, inserted):
+        super().__init__(path)
+        self.inserted = inserted
+
+    def add_expense(self, expense):
+        super().add_expense(expense)
+        self.inserted.set()
+        time.sleep(0.5)
+
+
+def other_writer(path, inserted):
+    inserted.wait()
+    utils.set_storage(SQLiteStorage(path))
+    utils.add_expense({"username": "shared", "amount": 2.0, "category": "Others",
+                       "date": "2024-01-02", "description": "", "id": "other"})
+
+
+def test_write_by_another_process_during_a_cached_write(tmp_path):
+    # The other process writes between this one's insert and the version
+    # check after it; the cached view must not be carried over that write
+    path = str(tmp_path / "finsmart.db")
+    context = multiprocessing.get_context("fork")
+    inserted = context.Event()
+    other = context.Process(target=other_writer, args=(path, inserted))
+    other.start()
+    utils.set_storage(SlowSQLiteStorage(path, inserted))
+    try:
+        utils.get_user_expenses("shared")
+        utils.add_expense({"username": "shared", "amount": 1.0, "category": "Others",
+                           "date": "2024-01-01", "description": "", "id": "mine"})
+        other.join()
+        assert sorted(exp.id for exp in utils.get_user_expenses("shared")) == ["mine", "other"]
+    finally:
+        utils.set_storage(None)
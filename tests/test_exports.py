@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+
+import pytest
+
+import exports
+import utils
+from exports import COLUMNS, export_expenses
+from storage import JSONStorage
+
+EXPENSES = [
+    {"username": "demo", "amount": 1234.5, "category": "Rent", "date": "2023-01-05",
+     "description": "January, \"rent\"", "id": "a"},
+    {"username": "other", "amount": 99.99, "category": "Shopping", "date": "2023-02-10",
+     "description": "", "id": "b"},
+    {"username": "demo", "amount": 0.1, "category": "Food & Dining", "date": "2024-05-01",
+     "description": "Chai\nand a samosa", "id": "c"},
+    {"username": "demo", "amount": 250.0, "category": "Others", "date": "2024-05-20",
+     "description": "₹ note", "id": "d"},
+]
+
+
+@pytest.fixture(params=[False, True], ids=["hot", "archived"])
+def storage(request, tmp_path):
+    engine = JSONStorage(*(str(tmp_path / name) for name in (
+        "expenses.json", "budgets.json", "investments.json", "users.json")), archive_dir=str(tmp_path / "archive"))
+    engine.save_expenses(EXPENSES)
+    if request.param:
+        # 2023 goes to the archive, 2024 stays hot
+        engine.archive_expenses("2024-01")
+    utils.set_storage(engine)
+    yield engine
+    utils.set_storage(None)
+
+
+def read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    assert tuple(rows[0]) == COLUMNS
+    return [dict(zip(COLUMNS, row), amount=float(row[3])) for row in rows[1:]]
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def by_id(records):
+    return sorted(records, key=lambda exp: exp["id"])
+
+
+@pytest.mark.parametrize("fmt, read", [("csv", read_csv), ("jsonl", read_jsonl)])
+def test_round_trip(storage, tmp_path, fmt, read):
+    path = tmp_path / f"out.{fmt}"
+    assert export_expenses(str(path), fmt, chunk_size=3) == len(EXPENSES)
+    assert by_id(read(path)) == by_id(EXPENSES)
+
+
+@pytest.mark.parametrize("fmt, read", [("csv", read_csv), ("jsonl", read_jsonl)])
+def test_user_and_date_range(storage, tmp_path, fmt, read):
+    path = tmp_path / f"out.{fmt}"
+    assert export_expenses(str(path), fmt, username="demo", start_date="2023-01-01", end_date="2024-05-10") == 2
+    assert by_id(read(path)) == [EXPENSES[0], EXPENSES[2]]
+
+
+def test_to_a_file_object(storage):
+    out = io.BytesIO()
+    assert export_expenses(out, "jsonl") == len(EXPENSES)
+    assert by_id(json.loads(line) for line in out.getvalue().splitlines()) == by_id(EXPENSES)
+
+
+def test_parquet_round_trip(storage, tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+    path = tmp_path / "out.parquet"
+    assert export_expenses(str(path), "parquet", chunk_size=3) == len(EXPENSES)
+    table = pyarrow.parquet.read_table(path)
+    assert tuple(table.column_names) == COLUMNS
+    assert by_id(table.to_pylist()) == by_id(EXPENSES)
+
+
+def test_parquet_without_pyarrow(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(exports, "pyarrow", None)
+    assert "parquet" not in exports.available_formats()
+    with pytest.raises(ValueError):
+        export_expenses(str(tmp_path / "out.parquet"), "parquet")
+    assert not list(tmp_path.glob("out.parquet*"))
+
+
+def test_unknown_format(storage, tmp_path):
+    with pytest.raises(ValueError):
+        export_expenses(str(tmp_path / "out.xml"), "xml")
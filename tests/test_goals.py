@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from goals import MAX_YEARS, RETURN_RANGE, required_duration, required_return, required_sip, sip_future_value
+from investment_calculator import calculate_sip_returns
+
+# The solvers against a month-by-month simulation of the SIP
+
+COUNT = 300
+
+
+def simulated_value(amount, months, rate, step_up=0):
+    """Value at the end of months, one month at a time"""
+    total = 0.0
+    for month in range(months):
+        total = (total + amount * (1 + step_up / 100) ** (month // 12)) * (1 + rate / 100 / 12)
+    return total
+
+
+def goal(target, months, inflation):
+    return target * (1 + inflation / 100 / 12) ** months
+
+
+def simulated_duration(amount, target, rate, inflation, step_up, max_years=MAX_YEARS):
+    """Years (in whole months) until the value first reaches the goal, or inf"""
+    total = 0.0
+    for month in range(1, max_years * 12 + 1):
+        total = (total + amount * (1 + step_up / 100) ** ((month - 1) // 12)) * (1 + rate / 100 / 12)
+        if total >= goal(target, month, inflation):
+            return month / 12
+    return np.inf
+
+
+@pytest.fixture
+def goals():
+    rng = np.random.default_rng(0)
+    return {
+        "target": rng.uniform(1e5, 5e7, COUNT),
+        "years": rng.integers(1, 31, COUNT),
+        "rate": np.concatenate([[0, 0], rng.uniform(0, 20, COUNT - 2)]),
+        "inflation": rng.uniform(0, 8, COUNT),
+        "step_up": rng.choice([0, 5, 10], COUNT),
+        "amount": rng.uniform(1000, 50000, COUNT),
+    }
+
+
+@pytest.mark.parametrize("months", [0, 1, 11, 12, 13, 120, 365])
+@pytest.mark.parametrize("rate", [0, 8, 12])
+@pytest.mark.parametrize("step_up", [0, 10])
+def test_sip_future_value(months, rate, step_up):
+    np.testing.assert_allclose(sip_future_value(5000, months, rate, step_up),
+                               simulated_value(5000, months, rate, step_up), rtol=1e-12)
+
+
+def test_sip_future_value_matches_the_calculator():
+    _, _, expected_amount, _ = calculate_sip_returns(5000, 30, 12)
+    np.testing.assert_allclose(sip_future_value(5000, np.arange(1, 31) * 12, 12), expected_amount, rtol=1e-12)
+
+
+def test_required_sip(goals):
+    sip = required_sip(goals["target"], goals["years"], goals["rate"], goals["inflation"], goals["step_up"])
+    expected = [
+        goal(target, years * 12, inflation) / simulated_value(1, years * 12, rate, step_up)
+        for target, years, rate, inflation, step_up in zip(
+            goals["target"], goals["years"], goals["rate"], goals["inflation"], goals["step_up"])
+    ]
+    np.testing.assert_allclose(sip, expected, rtol=1e-9)
+
+
+def test_required_sip_at_zero_return():
+    assert required_sip(120000, 10, 0) == 1000
+    assert np.isinf(required_sip(120000, 0, 12))
+
+
+def test_required_duration(goals):
+    months = required_duration(goals["amount"], goals["target"], goals["rate"], goals["inflation"], goals["step_up"])
+    expected = [
+        simulated_duration(amount, target, rate, inflation, step_up)
+        for amount, target, rate, inflation, step_up in zip(
+            goals["amount"], goals["target"], goals["rate"], goals["inflation"], goals["step_up"])
+    ]
+    np.testing.assert_array_equal(months, expected)
+
+
+@pytest.mark.parametrize("inflation", [0, 6])
+def test_required_duration_bounds(inflation):
+    # A target reached in exactly max_years, one a month later, and one
+    # never reached because inflation outgrows the SIP
+    target = simulated_value(1000, 120, 12) / (1 + inflation / 100 / 12) ** 120
+    assert required_duration(1000, target, 12, inflation, max_years=10) == 10
+    assert np.isinf(required_duration(1000, target * 1.01, 12, inflation, max_years=10))
+    assert np.isinf(required_duration(1000, 1e9, 0, 10))
+    assert required_duration(1000, 0, 12) == 0
+    assert np.isinf(required_duration(0, 1000, 12))
+
+
+def test_required_duration_at_zero_return():
+    assert required_duration(1000, 12000, 0) == 1
+    assert required_duration(1000, 12001, 0) == 13 / 12
+
+
+def test_required_return(goals):
+    rate = required_return(goals["amount"], goals["target"], goals["years"], goals["inflation"], goals["step_up"])
+    found = ~np.isnan(rate)
+    assert found.sum() > COUNT // 2
+    assert np.all((rate[found] >= RETURN_RANGE[0]) & (rate[found] <= RETURN_RANGE[1]))
+    months = goals["years"] * 12
+    np.testing.assert_allclose(sip_future_value(goals["amount"], months, rate, goals["step_up"])[found],
+                               goal(goals["target"], months, goals["inflation"])[found], rtol=1e-9)
+
+
+def test_required_return_out_of_range():
+    # More than the highest return can reach, and less than the lowest leaves
+    assert np.isnan(required_return(1000, 1e12, 5))
+    assert np.isnan(required_return(1000, 1, 5))
+
+
+def test_required_return_at_zero():
+    np.testing.assert_allclose(required_return(1000, 60000, 5), 0, atol=1e-9)
@@ -0,0 +1,125 @@
+import numpy as np
+import pytest
+
+from investment_calculator import calculate_lumpsum_returns, calculate_scenario_grid, calculate_sip_returns, plan_growth
+
+# The vectorized calculators against the per-year loops they replaced.
+# NumPy's SIMD power can round the last bits differently from pow(), so
+# results are compared to 1e-13 relative.
+
+RTOL = 1e-13
+
+
+def loop_sip_returns(monthly_investment, years, expected_return_rate, inflation_rate=6, step=12):
+    """The original calculate_sip_returns, one value every step months"""
+    monthly_rate = expected_return_rate / 100 / 12
+    inflation_monthly = inflation_rate / 100 / 12
+    periods = years * 12 // step
+    invested_amount = np.zeros(periods)
+    expected_amount = np.zeros(periods)
+    inflation_adjusted = np.zeros(periods)
+    for i in range(periods):
+        months_completed = (i + 1) * step
+        invested_amount[i] = monthly_investment * months_completed
+        expected_amount[i] = monthly_investment * ((pow(1 + monthly_rate, months_completed) - 1) / monthly_rate) * (1 + monthly_rate)
+        inflation_adjusted[i] = expected_amount[i] / pow(1 + inflation_monthly, months_completed)
+    return np.arange(1, periods + 1), invested_amount, expected_amount, inflation_adjusted
+
+
+def loop_lumpsum_returns(investment_amount, years, expected_return_rate, inflation_rate=6):
+    """The original calculate_lumpsum_returns"""
+    annual_rate = expected_return_rate / 100
+    inflation_annual = inflation_rate / 100
+    expected_amount = np.zeros(years)
+    inflation_adjusted = np.zeros(years)
+    for i in range(years):
+        expected_amount[i] = investment_amount * pow(1 + annual_rate, i + 1)
+        inflation_adjusted[i] = expected_amount[i] / pow(1 + inflation_annual, i + 1)
+    return np.arange(1, years + 1), expected_amount, inflation_adjusted
+
+
+def assert_same(actual, expected):
+    assert len(actual) == len(expected)
+    for actual_values, expected_values in zip(actual, expected):
+        assert actual_values.dtype.kind == expected_values.dtype.kind
+        np.testing.assert_allclose(actual_values, expected_values, rtol=RTOL)
+
+
+@pytest.mark.parametrize("years", [1, 10, 30])
+@pytest.mark.parametrize("rate", [1, 7.5, 12, 30])
+@pytest.mark.parametrize("inflation", [0, 6, 15])
+def test_sip_matches_the_loop(years, rate, inflation):
+    assert_same(calculate_sip_returns(5000, years, rate, inflation), loop_sip_returns(5000, years, rate, inflation))
+
+
+@pytest.mark.parametrize("rate", [1, 12, 30])
+def test_monthly_sip_matches_the_loop(rate):
+    assert_same(calculate_sip_returns(2500.5, 30, rate, 6, monthly=True),
+                loop_sip_returns(2500.5, 30, rate, 6, step=1))
+
+
+@pytest.mark.parametrize("years", [1, 10, 30])
+@pytest.mark.parametrize("rate", [1, 7.5, 12, 30])
+@pytest.mark.parametrize("inflation", [0, 6, 15])
+def test_lumpsum_matches_the_loop(years, rate, inflation):
+    assert_same(calculate_lumpsum_returns(100000, years, rate, inflation),
+                loop_lumpsum_returns(100000, years, rate, inflation))
+
+
+def test_monthly_lumpsum_year_ends():
+    _, expected_amount, inflation_adjusted = calculate_lumpsum_returns(100000, 20, 12, 6)
+    months, monthly_amount, monthly_adjusted = calculate_lumpsum_returns(100000, 20, 12, 6, monthly=True)
+    np.testing.assert_array_equal(months, np.arange(1, 241))
+    np.testing.assert_allclose(monthly_amount[11::12], expected_amount, rtol=RTOL)
+    np.testing.assert_allclose(monthly_adjusted[11::12], inflation_adjusted, rtol=RTOL)
+    assert np.all(np.diff(monthly_amount) > 0)
+
+
+def test_zero_return():
+    # The loop divided by zero here
+    _, invested_amount, expected_amount, inflation_adjusted = calculate_sip_returns(1000, 5, 0, 0)
+    np.testing.assert_array_equal(expected_amount, invested_amount)
+    np.testing.assert_array_equal(expected_amount, [12000, 24000, 36000, 48000, 60000])
+    _, expected_amount, _ = calculate_lumpsum_returns(1000, 5, 0, 0)
+    np.testing.assert_array_equal(expected_amount, [1000] * 5)
+    assert plan_growth("SIP", 1000, 5, 0) == 0.0
+
+
+@pytest.mark.parametrize("plan_type", ["SIP", "Lumpsum"])
+def test_plan_growth_is_unchanged(plan_type):
+    # Stored growth figures are compared exactly
+    for amount, years, rate in [(5000, 10, 12), (12345.67, 25, 7.5), (100000, 1, 30)]:
+        if plan_type == "SIP":
+            _, invested_amount, expected_amount, _ = loop_sip_returns(amount, years, rate)
+            expected = round(float(expected_amount[-1] - invested_amount[-1]), 2)
+        else:
+            _, expected_amount, _ = loop_lumpsum_returns(amount, years, rate)
+            expected = round(float(expected_amount[-1] - amount), 2)
+        assert plan_growth(plan_type, amount, years, rate) == expected
+
+
+@pytest.mark.parametrize("plan_type", ["SIP", "Lumpsum"])
+def test_scenario_grid_matches_single_scenarios(plan_type):
+    amounts, years, rates, inflations = [1000, 2500.5], [1, 7, 30], [0, 1, 12, 30], [0, 6]
+    invested_amount, expected_amount, inflation_adjusted = calculate_scenario_grid(
+        plan_type, amounts, years, rates, inflations)
+    assert expected_amount.shape == (2, 3, 4, 2)
+    for i, amount in enumerate(amounts):
+        for j, period in enumerate(years):
+            for k, rate in enumerate(rates):
+                for m, inflation in enumerate(inflations):
+                    if plan_type == "SIP":
+                        _, invested, expected, adjusted = calculate_sip_returns(amount, period, rate, inflation)
+                        invested = invested[-1]
+                    else:
+                        _, expected, adjusted = calculate_lumpsum_returns(amount, period, rate, inflation)
+                        invested = amount
+                    assert invested_amount[i, j, k, m] == invested
+                    np.testing.assert_allclose(expected_amount[i, j, k, m], expected[-1], rtol=RTOL)
+                    np.testing.assert_allclose(inflation_adjusted[i, j, k, m], adjusted[-1], rtol=RTOL)
+
+
+def test_scenario_grid_of_scalars():
+    _, expected_amount, _ = calculate_scenario_grid("SIP", 5000, 10, 12, 6)
+    assert expected_amount.shape == (1, 1, 1, 1)
+    np.testing.assert_allclose(expected_amount[0, 0, 0, 0], calculate_sip_returns(5000, 10, 12)[2][-1], rtol=RTOL)
@@ -0,0 +1,136 @@
+import os
+import random
+
+import pytest
+
+import utils
+from investment_calculator import plan_growth
+from migrations import LATEST_VERSION, MIGRATIONS, migrate, pending_migrations
+from passwords import is_password_hash, verify_password
+from storage import ColumnarStorage, JSONStorage, ShardedStorage, SQLiteStorage
+
+ENGINES = ("json", "columnar", "sharded", "sqlite")
+
+BUDGETS = [
+    {"username": "demo", "monthly_budget": 10000, "savings_target": 3000,
+     "categories": {"Food & Dining": 0.3, "Rent": 0.4, "Transportation": 0.1, "Shopping": 0.075, "Others": 0.125}},
+    {"username": "other", "monthly_budget": 5000, "category_percent": {"Rent": 60, "Others": 40}},
+]
+
+INVESTMENTS = [
+    # growth as saved by whichever calculator was on screen
+    {"username": "demo", "name": "Index fund", "type": "SIP", "amount": 5000, "period": 10,
+     "return_rate": 12, "id": "i1", "growth": 1.0},
+    {"username": "other", "name": "FD", "type": "Lumpsum", "amount": 100000, "period": 5,
+     "return_rate": 7, "id": "i2", "growth": 2.0},
+]
+
+USERS = {
+    "demo": {"password": "1234", "points": 100},
+    "other": {"password": "secret", "achievements": []},
+}
+
+
+def make_storage(engine, root):
+    files = [os.path.join(root, name) for name in ("budgets.json", "investments.json", "users.json")]
+    if engine == "json":
+        return JSONStorage(os.path.join(root, "expenses.json"), *files)
+    if engine == "columnar":
+        return ColumnarStorage(os.path.join(root, "expenses.columns"), *files, utils.CATEGORY_COLORS)
+    if engine == "sharded":
+        return ShardedStorage(os.path.join(root, "shards"))
+    return SQLiteStorage(os.path.join(root, "finsmart.db"))
+
+
+@pytest.fixture(params=ENGINES)
+def storage(request, tmp_path):
+    engine = make_storage(request.param, str(tmp_path))
+    engine.save_expenses([])
+    engine.save_budgets(BUDGETS)
+    engine.save_investments(INVESTMENTS)
+    engine.save_users(USERS)
+    return engine
+
+
+def stored(storage):
+    """Everything the migrations touch"""
+    return (
+        sorted(storage.load_budgets(), key=lambda budget: budget["username"]),
+        sorted(storage.load_investments(), key=lambda inv: inv["id"]),
+        storage.load_users(),
+    )
+
+
+def test_migrate(storage):
+    assert storage.data_version() == 0
+    assert migrate(storage, chunk_size=1) == MIGRATIONS
+    assert storage.data_version() == LATEST_VERSION
+    assert pending_migrations(storage) == []
+
+    budgets, investments, users = stored(storage)
+    assert [budget.get("categories") for budget in budgets] == [None, None]
+    assert budgets[0]["category_percent"] == {"Food & Dining": 30, "Rent": 40, "Transportation": 10,
+                                              "Shopping": 7.5, "Others": 12.5}
+    assert budgets[1]["category_percent"] == {"Rent": 60, "Others": 40}
+    assert [inv["growth"] for inv in investments] == [
+        plan_growth(inv["type"], inv["amount"], inv["period"], inv["return_rate"]) for inv in INVESTMENTS
+    ]
+    for username, user in USERS.items():
+        assert "password" not in users[username]
+        assert verify_password(user["password"], users[username]["password_hash"])
+        assert {**users[username], "password": user["password"]} == {
+            **user, "password_hash": users[username]["password_hash"]}
+
+
+def test_migrate_again(storage):
+    migrate(storage)
+    before = stored(storage)
+    assert migrate(storage) == []
+    assert stored(storage) == before
+
+
+def test_interrupted_migration_runs_again(storage):
+    # Each migration may run again over records it already upgraded
+    migrate(storage)
+    before = stored(storage)
+    storage.set_data_version(0)
+    assert migrate(storage) == MIGRATIONS
+    assert stored(storage) == before
+
+
+@pytest.mark.parametrize("migration", MIGRATIONS, ids=lambda migration: migration.kind)
+def test_upgrades_are_idempotent(migration):
+    records = {"budgets": BUDGETS, "investments": INVESTMENTS, "users": list(USERS.values())}[migration.kind]
+    for record in records:
+        once = migration.upgrade(record)
+        assert migration.upgrade(once) == once
+
+
+def test_budget_shares_survive_migration():
+    upgrade = next(migration.upgrade for migration in MIGRATIONS if migration.kind == "budgets")
+    # Shares as the budget page saved them: percentages over 100, to a
+    # hundredth of a percent
+    rng = random.Random(0)
+    for _ in range(10_000):
+        shares = {"Rent": rng.randrange(0, 10_001) / 10_000, "Others": rng.randrange(0, 101) / 100}
+        migrated = upgrade({"username": "demo", "categories": shares})
+        assert utils.budget_shares(migrated) == shares
+
+
+def test_status_of_a_new_store(tmp_path):
+    storage = make_storage("json", str(tmp_path))
+    assert pending_migrations(storage) == MIGRATIONS
+    storage.set_data_version(LATEST_VERSION)
+    assert make_storage("json", str(tmp_path)).data_version() == LATEST_VERSION
+    assert pending_migrations(storage) == []
+
+
+def test_hashes_are_kept(storage):
+    migrate(storage)
+    users = storage.load_users()
+    assert all(is_password_hash(user["password_hash"]) for user in users.values())
+    storage.save_users({**users, "new": {"password": "pw", "password_hash": users["demo"]["password_hash"]}})
+    storage.set_data_version(0)
+    migrate(storage)
+    # A stray plaintext password next to a hash is dropped, not rehashed
+    assert storage.load_users()["new"] == {"password_hash": users["demo"]["password_hash"]}
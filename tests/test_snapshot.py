@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+
+import pytest
+
+import archive
+import utils
+from aggregation import by_category, days_tracked
+from snapshot import UserSnapshot
+from storage import JSONStorage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    engine = JSONStorage(*(str(tmp_path / name) for name in (
+        "expenses.json", "budgets.json", "investments.json", "users.json")), archive_dir=str(tmp_path / "archive"))
+    categories = list(utils.CATEGORY_COLORS)
+    engine.save_expenses([
+        {"username": "demo", "amount": float(i % 7 + 1), "category": categories[i % len(categories)],
+         "date": (date(2023, 1, 1) + timedelta(days=i * 3)).isoformat(), "description": "", "id": f"e{i}"}
+        for i in range(200)
+    ])
+    engine.upsert_budget({"username": "demo", "monthly_budget": 50000})
+    utils.set_storage(engine)
+    yield engine
+    utils.set_storage(None)
+
+
+def test_all_time_figures_skip_archived_segments(storage, monkeypatch):
+    frame = utils.get_user_expense_frame("demo")
+    expected_days, expected_totals = days_tracked(frame), by_category(frame)
+    assert utils.archive_old_expenses(months=6, today=date(2024, 6, 1)) > 0
+
+    def segment(self, month):
+        raise AssertionError(f"opened archived month {month}")
+    monkeypatch.setattr(archive.ExpenseArchive, "_segment", segment)
+
+    snapshot = UserSnapshot("demo")
+    assert snapshot.days_tracked == expected_days
+    assert list(snapshot.all_time_category_totals) == list(expected_totals.index)
+    assert snapshot.health["expenses"] == 25
@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+import utils
+from statements import StatementError, import_statement, read_statement
+from storage import JSONStorage
+
+STATEMENT = """Txn Date,Narration,Withdrawal Amt.,Deposit Amt.
+01/03/2024,SWIGGY ORDER 1,"1,234.50",
+01/03/2024,COFFEE,120.00,
+01/03/2024,COFFEE,120.00,
+02/03/2024,SALARY,,"50,000.00"
+03/03/2024,UBER TRIP,99,
+Closing balance,,,
+"""
+
+
+@pytest.fixture
+def storage(tmp_path):
+    engine = JSONStorage(*(str(tmp_path / name) for name in (
+        "expenses.json", "budgets.json", "investments.json", "users.json")))
+    engine.save_expenses([])
+    utils.set_storage(engine)
+    yield engine
+    utils.set_storage(None)
+
+
+def statement(text=STATEMENT):
+    return io.StringIO(text)
+
+
+def test_read_statement():
+    rows, rejected = read_statement(statement())
+    assert rows["date"].tolist() == ["2024-03-01", "2024-03-01", "2024-03-01", "2024-03-03"]
+    assert rows["paise"].tolist() == [123450, 12000, 12000, 9900]
+    assert rows["category"].tolist() == ["Food & Dining", "Food & Dining", "Food & Dining", "Transportation"]
+    # The salary credit and the balance line
+    assert rejected == 2
+
+
+def test_signed_amounts():
+    rows, rejected = read_statement(statement("Date,Description,Amount\n2024-03-01,RENT,-25000\n"
+                                              "2024-03-02,REFUND,500\n2024-03-03,NETFLIX,(649.00)\n"))
+    assert rows["paise"].tolist() == [2500000, 64900]
+    assert rejected == 1
+
+
+def test_not_a_statement():
+    with pytest.raises(StatementError):
+        read_statement(statement("Name,Value\na,1\n"))
+
+
+def test_reimport_adds_nothing(storage):
+    assert import_statement(statement(), "demo") == {"rows": 6, "imported": 4, "duplicates": 0, "rejected": 2}
+    assert import_statement(statement(), "demo") == {"rows": 6, "imported": 0, "duplicates": 4, "rejected": 2}
+    expenses = utils.get_user_expenses("demo")
+    assert sorted(exp.amount for exp in expenses) == [99.0, 120.0, 120.0, 1234.5]
+    assert len({exp.id for exp in expenses}) == 4
+
+
+def test_reimport_with_more_rows(storage):
+    # The statement's rows that match a stored expense are dropped one for
+    # one, so a third coffee on the same day is still new
+    import_statement(statement(), "demo")
+    more = STATEMENT.replace("02/03/2024,SALARY", "01/03/2024,Coffee,120.00,\n02/03/2024,SALARY")
+    assert import_statement(statement(more), "demo")["imported"] == 1
+    assert len(utils.get_user_expenses("demo")) == 5
+
+
+def test_duplicates_are_per_user(storage):
+    import_statement(statement(), "demo")
+    assert import_statement(statement(), "other")["imported"] == 4
+
+
+def test_dry_run(storage):
+    assert import_statement(statement(), "demo", dry_run=True)["imported"] == 4
+    assert len(utils.get_user_expenses("demo")) == 0
+
+
+def test_chunks(storage):
+    assert import_statement(statement(), "demo", chunk_rows=2)["imported"] == 4
+    assert import_statement(statement(), "demo", chunk_rows=2)["duplicates"] == 4
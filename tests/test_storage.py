@@ -0,0 +1,73 @@
+import pytest
+
+import utils
+from storage import JSONStorage
+
+
+def expense(username, expense_id, amount=1.0):
+    return {"username": username, "amount": amount, "category": "Others", "date": "2024-01-01",
+            "description": "", "id": expense_id}
+
+
+def make_storage(tmp_path):
+    return JSONStorage(*(str(tmp_path / name) for name in (
+        "expenses.json", "budgets.json", "investments.json", "users.json")), lazy_expenses=True)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    engine = make_storage(tmp_path)
+    engine.save_expenses([expense("alice", "a0"), expense("bob", "b0")])
+    utils.set_storage(engine)
+    yield engine
+    utils.set_storage(None)
+
+
+def test_lazy_fingerprints_are_per_user(storage, tmp_path):
+    alice, bob = storage.fingerprint("expenses", "alice"), storage.fingerprint("expenses", "bob")
+    # Written by another process, so nothing in this one knows of it
+    other = make_storage(tmp_path)
+    other.add_expense(expense("bob", "b1"))
+    assert storage.fingerprint("expenses", "alice") == alice
+    assert storage.fingerprint("expenses", "bob") != bob
+
+    alice = storage.fingerprint("expenses", "alice")
+    other.add_expenses([expense("alice", "a1"), expense("alice", "a2")])
+    assert storage.fingerprint("expenses", "alice") != alice
+
+    # A delete that doesn't say whose expense it was changes everyone's
+    alice, bob = storage.fingerprint("expenses", "alice"), storage.fingerprint("expenses", "bob")
+    other.delete_expense("a1")
+    assert storage.fingerprint("expenses", "alice") != alice
+    assert storage.fingerprint("expenses", "bob") != bob
+
+    bob = storage.fingerprint("expenses", "bob")
+    other.compact_expenses()
+    assert storage.fingerprint("expenses", "bob") != bob
+
+
+def test_cached_view_survives_other_users_writes(storage, tmp_path, monkeypatch):
+    queries = []
+    query_expenses = storage.query_expenses
+    monkeypatch.setattr(storage, "query_expenses", lambda username: queries.append(username) or query_expenses(username))
+    assert [exp.id for exp in utils.get_user_expenses("alice")] == ["a0"]
+    make_storage(tmp_path).add_expense(expense("bob", "b1"))
+    assert [exp.id for exp in utils.get_user_expenses("alice")] == ["a0"]
+    assert queries == ["alice"]
+
+    make_storage(tmp_path).add_expense(expense("alice", "a1"))
+    assert [exp.id for exp in utils.get_user_expenses("alice")] == ["a0", "a1"]
+    make_storage(tmp_path).delete_expense("a0", "alice")
+    assert [exp.id for exp in utils.get_user_expenses("alice")] == ["a1"]
+    assert [exp.id for exp in utils.get_user_expenses("bob")] == ["b0", "b1"]
+
+
+def test_torn_journal_line(storage):
+    fingerprint = storage.fingerprint("expenses", "alice")
+    with open(storage.journal_file, "ab") as f:
+        f.write(b'{"op": "add", "record": {"username": "alice"')
+    assert storage.fingerprint("expenses", "alice") == fingerprint
+    # The next append cuts the torn line off
+    storage.add_expense(expense("alice", "a1"))
+    assert storage.fingerprint("expenses", "alice") != fingerprint
+    assert [exp["id"] for exp in storage.query_expenses("alice")] == ["a0", "a1"]
@@ -1,6 +1,24 @@
-import json
+import hmac
+import math
 import os
-from datetime import datetime
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from types import MappingProxyType
+
+from aggregation import UserFrames, date_slice, expense_frame
+from indexes import DailySpendIndex, ExpenseIndex, MonthlyRollup
+from locks import StripedLock
+from money import format_paise, to_paise, to_rupees
+from passwords import hash_password, is_password_hash, verify_password
+from records import (
+    CATEGORIES, Budget, Expense, Investment, freeze, freeze_collection, thaw, validate_collection,
+    validate_record
+)
+from storage import ColumnarStorage, JSONStorage, ShardedStorage, SQLiteStorage
+from writer import WriteBehind
 
 # File paths for data storage
 EXPENSE_FILE = "expenses.json"
@@ -18,92 +36,750 @@ CATEGORY_COLORS = {
     "Entertainment": "#e64a6c",
     "Others": "#e64a4a"
 }
+# Expense categories are stored as codes into this table (see records.py)
+CATEGORIES.extend(CATEGORY_COLORS)
+
+# Allocation for users who haven't set a budget
+DEFAULT_BUDGET_SHARES = {
+    "Food & Dining": 0.3,
+    "Rent": 0.4,
+    "Transportation": 0.1,
+    "Shopping": 0.1,
+    "Others": 0.1
+}
+
+# Storage engine: "json" (default, the files above), "sqlite", "columnar" or "sharded"
+STORAGE_ENGINE = os.environ.get("FINSMART_STORAGE", "json")
+SQLITE_FILE = os.environ.get("FINSMART_DB", "finsmart.db")
+COLUMNAR_DIR = os.environ.get("FINSMART_COLUMNS", "expenses.columns")
+SHARD_DIR = os.environ.get("FINSMART_SHARDS", "data.shards")
+# json engine only: stream each user's expenses out of expenses.json instead
+# of holding every user's expenses in memory
+STREAM_EXPENSES = os.environ.get("FINSMART_STREAM_EXPENSES") == "1"
+# json, columnar and sharded engines: commit file writes from a background
+# thread at most this many milliseconds after a burst starts, coalescing the
+# burst into one write per file. 0 (default) writes before returning.
+WRITE_BEHIND_MS = float(os.environ.get("FINSMART_WRITE_BEHIND_MS", "0"))
+# json, columnar and sharded engines: months of expenses older than
+# ARCHIVE_MONTHS can be moved to compressed segments by archive_data.py (in
+# ARCHIVE_DIR, or an archive/ directory per shard)
+ARCHIVE_DIR = os.environ.get("FINSMART_ARCHIVE", "expenses.archive")
+ARCHIVE_MONTHS = int(os.environ.get("FINSMART_ARCHIVE_MONTHS", "24"))
+
+_storage = None
+
+def get_storage():
+    """Return the configured storage engine, creating it on first use"""
+    global _storage
+    if _storage is None:
+        # Flushed at exit by an atexit hook
+        writer = WriteBehind(WRITE_BEHIND_MS / 1000) if WRITE_BEHIND_MS > 0 else None
+        json_storage = JSONStorage(EXPENSE_FILE, BUDGET_FILE, INVESTMENT_FILE, USER_FILE,
+                                   lazy_expenses=STREAM_EXPENSES, writer=writer, archive_dir=ARCHIVE_DIR)
+        if STORAGE_ENGINE == "sqlite":
+            _storage = SQLiteStorage(SQLITE_FILE)
+            # First run against a new database: bring the JSON data across
+            if _storage.is_empty():
+                _storage.import_from(json_storage)
+        elif STORAGE_ENGINE == "columnar":
+            _storage = ColumnarStorage(COLUMNAR_DIR, BUDGET_FILE, INVESTMENT_FILE, USER_FILE, CATEGORY_COLORS,
+                                       writer=writer, archive_dir=ARCHIVE_DIR)
+            # First run: convert expenses.json into the columnar store
+            if not _storage.has_snapshot():
+                expenses = json_storage.load_expenses()
+                rekey_duplicate_ids(expenses)
+                _storage.save_expenses(expenses)
+        elif STORAGE_ENGINE == "sharded":
+            _storage = ShardedStorage(SHARD_DIR, writer=writer, archive=True)
+            # First run: split the JSON files into per-user shards
+            if not _storage.has_manifest():
+                migrate_to_shards(json_storage, _storage)
+        else:
+            _storage = json_storage
+        # Deletes go by id, so ids must be unique before anything is deleted.
+        # Lazy collections are never loaded whole here: columnar and sharded
+        # stores were checked on conversion, and a streamed expenses.json is
+        # left as is (ids have been unique since generate_id; older files need
+        # one non-streaming run).
+        migrate_duplicate_ids(
+            _storage,
+            expenses="expenses" not in _storage.lazy_kinds,
+            investments="investments" not in _storage.lazy_kinds
+        )
+    return _storage
+
+def generate_id():
+    """New unique record id
+
+    Ids are 24 hex digits: the time in milliseconds, a per-process sequence
+    number that keeps ids increasing when the clock stalls or steps back, and
+    random bits so separate worker processes don't collide. They sort in
+    creation order.
+    """
+    with _id_lock:
+        return _next_id_prefix() + f"{secrets.randbits(32):08x}"
+
+def generate_ids(count):
+    """count new ids at once, in creation order (see generate_id)"""
+    random_hex = secrets.token_hex(4 * count)
+    with _id_lock:
+        return [_next_id_prefix() + random_hex[8 * i:8 * i + 8] for i in range(count)]
+
+def _next_id_prefix():
+    # Time and sequence part of an id; call with _id_lock held
+    global _last_id_ms, _id_sequence
+    now_ms = int(time.time() * 1000)
+    if now_ms > _last_id_ms:
+        _last_id_ms = now_ms
+        _id_sequence = 0
+    else:
+        _id_sequence += 1
+        if _id_sequence > 0xFFFF:
+            _last_id_ms += 1
+            _id_sequence = 0
+    return f"{_last_id_ms:012x}{_id_sequence:04x}"
+
+_id_lock = threading.Lock()
+_last_id_ms = 0
+_id_sequence = 0
+
+def rekey_duplicate_ids(records):
+    """Give every record whose id is missing or already used a fresh id
+
+    Returns the number of records changed. The first record with a given id
+    keeps it.
+    """
+    seen = set()
+    changed = 0
+    for record in records:
+        record_id = record.get('id')
+        if not record_id or record_id in seen:
+            record['id'] = generate_id()
+            changed += 1
+        seen.add(record['id'])
+    return changed
+
+def migrate_duplicate_ids(storage, expenses=True, investments=True):
+    """Re-key duplicate expense and investment ids left by the old random 5-digit ids"""
+    if expenses:
+        expense_data = storage.load_expenses()
+        if rekey_duplicate_ids(expense_data):
+            storage.save_expenses(expense_data)
+    if investments:
+        investment_data = storage.load_investments()
+        if rekey_duplicate_ids(investment_data):
+            storage.save_investments(investment_data)
+
+def migrate_to_shards(source, target):
+    """Copy every collection from source into a ShardedStorage, re-keying duplicate ids"""
+    expenses = source.load_all_expenses()
+    rekey_duplicate_ids(expenses)
+    investments = source.load_investments()
+    rekey_duplicate_ids(investments)
+    target.save_expenses(expenses)
+    target.save_investments(investments)
+    target.save_budgets(source.load_budgets())
+    target.save_users(source.load_users())
+
+def archive_old_expenses(months=ARCHIVE_MONTHS, today=None):
+    """Move expenses from before the last `months` whole months into the archive
+
+    With months=24 in October 2026, everything before October 2024 is
+    archived. Returns the number of expenses moved.
+    """
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    moved = get_storage().archive_expenses(f"{index // 12:04d}-{index % 12 + 1:02d}")
+    _data_cache.clear()
+    return moved
+
+def set_storage(engine):
+    """Replace the storage engine (e.g. for scripts working on another data set)"""
+    global _storage
+    _storage = engine
+    _data_cache.clear()
+
+# Shared data cache
+class DataCache:
+    """Process-wide cache of parsed collections, shared by every Streamlit session
+
+    Each collection is parsed once and handed out as a frozen, read-only view
+    (a tuple of records.py records, or mappingproxies for users).
+    An entry stays valid while the engine's fingerprint (file mtime/size) and
+    the in-process version counter are unchanged; writes made through utils
+    bump the version and carry the cached view forward instead of reparsing.
+
+    Values derived from a view (indexes, rollups) are registered per key and
+    live alongside it, so they are built at most once per data version.
+
+    Entries are replaced, never modified, so a hit reads them without
+    locking (read-copy-update). Loads and writes lock their key's stripe of
+    a StripedLock, so sessions working on different users rarely wait on
+    each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = StripedLock()
+        self._entries = {}
+        self._versions = {}
+        self._derived = {}
+        self.hits = {}
+        self.misses = {}
+
+    def _key_lock(self, key):
+        return self._key_locks(key)
+
+    def register(self, kind, name, build, update=None):
+        """Declare a value derived from the views of a kind of key
+
+        build(view) creates it. update(value, event) returns it with a write
+        applied, where event is the tuple passed to write(); without update,
+        or when update returns None, the value is rebuilt on next use.
+        """
+        self._derived.setdefault(kind, {})[name] = (build, update)
+
+    def get(self, key, fingerprint, loader):
+        """Return the cached view for key, loading it if stale
+
+        loader() returns the frozen view.
+        """
+        kind = _key_kind(key)
+        if fingerprint is None:
+            # The engine can't detect changes, so never serve a cached copy
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return loader()
+        token = (fingerprint, self._versions.get(key, 0))
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == token:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            return entry[1]
+        with self._key_lock(key):
+            # Another session may have loaded it while this one waited
+            token = (fingerprint, self._versions.get(key, 0))
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self.hits[kind] = self.hits.get(kind, 0) + 1
+                return entry[1]
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            value = loader()
+            self._entries[key] = (token, value, {})
+            return value
+
+    def derived(self, key, name, fingerprint, loader):
+        """Return a registered derived value for the current view of key"""
+        build = self._derived[_key_kind(key)][name][0]
+        view = self.get(key, fingerprint, loader)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is view and name in entry[2]:
+            return entry[2][name]
+        with self._key_lock(key):
+            view = self.get(key, fingerprint, loader)
+            entry = self._entries.get(key)
+            if entry is None or entry[1] is not view:
+                return build(view)
+            if name not in entry[2]:
+                entry[2][name] = build(view)
+            return entry[2][name]
+
+    def write(self, key, get_fingerprint, write, change=None, event=None):
+        """Run write() and bring the cached view for key up to date
+
+        change(view) returns the view with the write applied, and event
+        describes the write to the update functions of derived values. They
+        are only used when the cache was current right before the write;
+        otherwise, or without a change function, the entry is dropped and
+        reloaded later.
+        """
+        with self._key_lock(key):
+            version = self._versions.get(key, 0)
+            before = get_fingerprint()
+            write()
+            self._versions[key] = version + 1
+            entry = self._entries.get(key)
+            if change is not None and before is not None and entry is not None \
+                    and entry[0] == (before, version):
+                after = get_fingerprint()
+                if after is not None:
+                    derived = {}
+                    if event is not None:
+                        for name, value in entry[2].items():
+                            update = self._derived[_key_kind(key)][name][1]
+                            if update is not None:
+                                value = update(value, event)
+                                # None means the value can't follow this write
+                                if value is not None:
+                                    derived[name] = value
+                    # Published in one assignment; readers holding the old
+                    # view keep a consistent copy
+                    self._entries[key] = ((after, version + 1), change(entry[1]), derived)
+                    return
+            self._entries.pop(key, None)
+
+    def drop_derived(self, key, name):
+        """Forget a derived value so it is rebuilt from the view on next use"""
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[2].pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for key in self._versions:
+                self._versions[key] += 1
+
+    def version(self, key):
+        """In-process write counter for key (see write)"""
+        return self._versions.get(key, 0)
+
+    def stats(self):
+        """Hit/miss counters per collection plus totals"""
+        keys = set(self.hits) | set(self.misses)
+        stats = {key: {"hits": self.hits.get(key, 0), "misses": self.misses.get(key, 0)} for key in keys}
+        stats["total"] = {"hits": sum(self.hits.values()), "misses": sum(self.misses.values())}
+        return stats
+
+def _key_kind(key):
+    """Cache keys are a collection name, or (collection, username) for per-user entries"""
+    return key if isinstance(key, str) else key[0]
+
+# Expense write events are ("add", record) and ("delete", record)
+def _update_expense_index(index, event):
+    op, expense = event
+    return index.add(expense) if op == "add" else index.remove(expense.id)
+
+def _update_monthly_rollup(rollup, event):
+    op, expense = event
+    return rollup.add(expense) if op == "add" else rollup.remove(expense)
+
+def _update_daily_spend(index, event):
+    op, expense = event
+    return index.add(expense) if op == "add" else index.remove(expense)
+
+_data_cache = DataCache()
+_data_cache.register("expenses", "index", ExpenseIndex, _update_expense_index)
+_data_cache.register("expenses", "monthly_rollup", MonthlyRollup, _update_monthly_rollup)
+_data_cache.register("expenses", "daily_spend", DailySpendIndex, _update_daily_spend)
+_data_cache.register(
+    "expenses", "frames",
+    lambda view: UserFrames(),
+    lambda frames, event: frames.without(event[1].username)
+)
+_data_cache.register("investments", "by_id", lambda view: {inv.id: inv for inv in view})
+
+def get_cache_stats():
+    """Hit/miss counters of the shared data cache"""
+    return _data_cache.stats()
+
+def _user_key(kind, username=None):
+    """Cache key for a user's records of a collection
+
+    Usually a collection shares one entry between all users. For the
+    engine's lazy_kinds (e.g. expenses in ColumnarStorage, everything in
+    ShardedStorage) each user gets an entry of their own, filled by the
+    per-user queries, so the whole collection is never materialized.
+    """
+    if username is not None and kind in get_storage().lazy_kinds:
+        return (kind, username)
+    return kind
+
+def _expense_key(username=None):
+    return _user_key("expenses", username)
+
+def _loader(key):
+    storage = get_storage()
+    if isinstance(key, tuple):
+        kind, username = key
+        load = {
+            "expenses": lambda: storage.query_expenses(username),
+            "budgets": lambda: [b for b in (storage.get_budget(username),) if b is not None],
+            "investments": lambda: storage.query_investments(username),
+            "users": lambda: {username: u for u in (storage.get_user(username),) if u is not None},
+        }[kind]
+        return lambda: freeze_collection(kind, load())
+    load = {
+        "expenses": storage.load_expenses,
+        "budgets": storage.load_budgets,
+        "investments": storage.load_investments,
+        "users": storage.load_users,
+    }[key]
+    return lambda: freeze_collection(key, load())
+
+def _fingerprint(storage, key):
+    if isinstance(key, tuple):
+        return storage.fingerprint(*key)
+    return storage.fingerprint(key)
+
+def _cached(key):
+    return _data_cache.get(key, _fingerprint(get_storage(), key), _loader(key))
+
+def _cached_derived(key, name):
+    return _data_cache.derived(key, name, _fingerprint(get_storage(), key), _loader(key))
+
+def _cached_write(key, write, change=None, event=None):
+    storage = get_storage()
+    kind, username = key if isinstance(key, tuple) else (key, None)
+    # Held across the fingerprints too: a write by another process in
+    # between would otherwise be taken as part of this one
+    with storage.lock_for(kind, username):
+        _data_cache.write(key, lambda: _fingerprint(storage, key), write, change, event)
+
+def user_data_version(username):
+    """A value that changes whenever any of a user's data may have changed
+
+    For caches of values computed from a user's data (app.UserSnapshot).
+    Costs a few stat calls.
+    """
+    storage = get_storage()
+    keys = (_expense_key(username), _user_key("budgets", username), _user_key("investments", username))
+    archive = storage.expense_archive(username)
+    return (
+        tuple((_fingerprint(storage, key), _data_cache.version(key)) for key in keys),
+        archive.fingerprint() if archive is not None else None,
+    )
+
+def get_expense_index(username=None):
+    """ExpenseIndex over the current expenses
+
+    When expenses are one of the engine's lazy_kinds, pass the username:
+    the index then covers only that user.
+    """
+    return _cached_derived(_expense_key(username), "index")
+
+def get_monthly_rollup(username=None):
+    """MonthlyRollup over the current expenses, archived months included
+
+    See get_expense_index for username; with it, only that user's archived
+    months are added.
+    """
+    rollup = _cached_derived(_expense_key(username), "monthly_rollup")
+    archive = get_storage().expense_archive(username)
+    if archive is None or not archive.months():
+        return rollup
+    return _with_archived_rollup(rollup, archive, archive.fingerprint(), username)
+
+@lru_cache(maxsize=64)
+def _with_archived_rollup(rollup, archive, fingerprint, username):
+    # Memoized per (hot rollup, archive version)
+    return rollup.merged(archive.rollup(username))
+
+def get_daily_spend_index(username=None):
+    """DailySpendIndex over the current expenses (see get_expense_index for username)"""
+    return _cached_derived(_expense_key(username), "daily_spend")
+
+def get_days_tracked(username):
+    """Number of distinct days a user recorded spending on, archived months included
+
+    From the daily index and the archive's index, so no segment is opened.
+    A day with both hot and archived expenses (added after its month was
+    archived) counts twice.
+    """
+    archive = get_storage().expense_archive(username)
+    archived = archive.days_tracked(username) if archive is not None else 0
+    return get_daily_spend_index(username).days_tracked(username) + archived
+
+def get_user_expense_frame(username, start_date=None, end_date=None):
+    """A user's expenses as a typed DataFrame (see aggregation.py), optionally date-limited"""
+    if _archived_expenses(username, start_date, end_date):
+        return expense_frame(get_user_expenses(username, start_date, end_date))
+    frames = _cached_derived(_expense_key(username), "frames")
+    frame = frames.get(username, lambda: get_expense_index(username).for_user(username))
+    if start_date is None and end_date is None:
+        return frame
+    return date_slice(frame, start_date, end_date)
+
+def rebuild_monthly_rollup(username=None):
+    """Recompute the monthly rollup from the raw expense records"""
+    _data_cache.drop_derived(_expense_key(username), "monthly_rollup")
+    return get_monthly_rollup(username)
+
+def get_expense_view():
+    """All expense records as a shared read-only view"""
+    return _cached("expenses")
+
+def get_budget_view():
+    """All budget records as a shared read-only view"""
+    return _cached("budgets")
+
+def get_investment_view():
+    """All investment records as a shared read-only view"""
+    return _cached("investments")
+
+def get_user_view():
+    """All user accounts as a shared read-only view"""
+    return _cached("users")
 
 # Helper functions for data management
 def get_expense_data():
-    """Load expense data from file or return empty list if file doesn't exist"""
-    if os.path.exists(EXPENSE_FILE):
-        try:
-            with open(EXPENSE_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-    return []
+    """Load all expense records (a private, mutable copy)"""
+    return thaw(get_expense_view())
 
 def save_expense_data(data):
-    """Save expense data to file"""
-    with open(EXPENSE_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    """Replace all expense records"""
+    validate_collection("expenses", data)
+    _cached_write("expenses", lambda: get_storage().save_expenses(data))
 
 def get_budget_data():
-    """Load budget data from file or return empty list if file doesn't exist"""
-    if os.path.exists(BUDGET_FILE):
-        try:
-            with open(BUDGET_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-    return []
+    """Load all budget records (a private, mutable copy)"""
+    return thaw(get_budget_view())
 
 def save_budget_data(data):
-    """Save budget data to file"""
-    with open(BUDGET_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    """Replace all budget records"""
+    validate_collection("budgets", data)
+    _cached_write("budgets", lambda: get_storage().save_budgets(data))
 
 def get_investment_data():
-    """Load investment data from file or return empty list if file doesn't exist"""
-    if os.path.exists(INVESTMENT_FILE):
-        try:
-            with open(INVESTMENT_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return []
-    return []
+    """Load all investment records (a private, mutable copy)"""
+    return thaw(get_investment_view())
 
 def save_investment_data(data):
-    """Save investment data to file"""
-    with open(INVESTMENT_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    """Replace all investment records"""
+    validate_collection("investments", data)
+    _cached_write("investments", lambda: get_storage().save_investments(data))
 
 def get_user_data():
-    """Load user data from file or return empty dict if file doesn't exist"""
-    if os.path.exists(USER_FILE):
-        try:
-            with open(USER_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {}
-    return {}
+    """Load all user accounts as a dict keyed by username (a private, mutable copy)"""
+    return thaw(get_user_view())
 
 def save_user_data(data):
-    """Save user data to file"""
-    with open(USER_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    """Replace all user accounts"""
+    validate_collection("users", data)
+    _cached_write("users", lambda: get_storage().save_users(data))
+
+# Per-user queries, so pages only read the rows they render. Results are
+# read-only views shared with other sessions.
+def get_user_expenses(username, start_date=None, end_date=None):
+    """Load a user's expenses, optionally within an inclusive YYYY-MM-DD date range
+
+    A range reaching back into archived months (including All Time, no
+    start_date) also reads those months from the archive.
+    """
+    records = get_expense_index(username).range(username, start_date, end_date)
+    return _with_archived(records, _archived_expenses(username, start_date, end_date))
+
+# Archived months (see archive.py) are outside the cache and the indexes;
+# they are read only for ranges that reach back into them
+def _archived_expenses(username, start_date=None, end_date=None):
+    """A user's archived expenses in a range, or () when the range stays hot"""
+    archive = get_storage().expense_archive(username)
+    if archive is None or not archive.reaches(start_date):
+        return ()
+    return _query_archive(archive, archive.fingerprint(), username, start_date, end_date)
+
+@lru_cache(maxsize=32)
+def _query_archive(archive, fingerprint, username, start_date, end_date):
+    # Memoized per archive version, so Streamlit reruns don't re-freeze records
+    return tuple(Expense.from_dict(exp) for exp in archive.query(username, start_date, end_date))
+
+def _with_archived(records, archived):
+    """Hot records plus archived ones, oldest first
+
+    A hot copy of an archived id (left by an interrupted archive run) is
+    dropped.
+    """
+    if not archived:
+        return records
+    ids = {exp.id for exp in archived}
+    return sorted([*archived, *(exp for exp in records if exp.id not in ids)], key=lambda exp: exp.date)
+
+def _spend_index(username, since=None):
+    """DailySpendIndex for a user that can answer ranges from since (None: all time) on"""
+    archived = _archived_expenses(username, since)
+    if not archived:
+        return get_daily_spend_index(username)
+    return DailySpendIndex(_with_archived(get_expense_index(username).for_user(username), archived))
+
+def compare_spend(username, start_date, end_date, category=None):
+    """DailySpendIndex.compare_periods for a user, archived months included"""
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    since = start - (end - start + timedelta(days=1))
+    return _spend_index(username, since.isoformat()).compare_periods(username, start, end, category)
+
+def get_expense(expense_id, username=None):
+    """Look up a single expense by id, or None
+
+    Pass the owner's username when it is known; with lazily cached expenses
+    the lookup then uses that user's cached index instead of the engine.
+    """
+    key = _expense_key(username)
+    if isinstance(key, tuple):
+        return get_expense_index(username).get(expense_id)
+    if "expenses" in get_storage().lazy_kinds:
+        expense = get_storage().get_expense(expense_id)
+        return Expense.from_dict(expense) if expense is not None else None
+    return get_expense_index().get(expense_id)
+
+def get_user_budget(username):
+    """Load a user's budget, or None if they haven't set one"""
+    view = _cached(_user_key("budgets", username))
+    return next((b for b in view if b.username == username), None)
+
+def budget_shares(budget):
+    """A budget's category allocation as {category: fraction of the budget}
+
+    Reads category_percent, or the fractions budgets stored before
+    migration 2 (see migrations.py); DEFAULT_BUDGET_SHARES if it has neither.
+    """
+    if budget is not None and budget.get('category_percent'):
+        # Rounded like migrations._shares_to_percent, so a migrated budget
+        # gives back the fractions it stored
+        return {category: round(percent / 100, 12) for category, percent in budget.get('category_percent').items()}
+    if budget is not None and budget.get('categories'):
+        return dict(budget.get('categories'))
+    return dict(DEFAULT_BUDGET_SHARES)
+
+def get_user_investments(username):
+    """Load a user's saved investment plans"""
+    view = _cached(_user_key("investments", username))
+    return [inv for inv in view if inv.username == username]
+
+def get_investment(investment_id, username=None):
+    """Look up a single investment plan by id, or None (see get_expense for username)"""
+    return _cached_derived(_user_key("investments", username), "by_id").get(investment_id)
+
+def get_user_account(username):
+    """Load a user's account record, or None"""
+    return _cached(_user_key("users", username)).get(username)
+
+def add_expense(expense):
+    """Store a single new expense"""
+    validate_record("expenses", expense)
+    frozen = Expense.from_dict(expense)
+    _cached_write(
+        _expense_key(expense.get('username')),
+        lambda: get_storage().add_expense(expense),
+        lambda view: view + (frozen,),
+        ("add", frozen)
+    )
+
+def add_expenses(expenses):
+    """Store several new expenses of one user in a single write"""
+    if not expenses:
+        return
+    validate_collection("expenses", expenses)
+    usernames = {exp.get('username') for exp in expenses}
+    if len(usernames) != 1:
+        raise ValueError("add_expenses takes the expenses of a single user")
+    frozen = tuple(Expense.from_dict(exp) for exp in expenses)
+    _cached_write(
+        _expense_key(usernames.pop()),
+        lambda: get_storage().add_expenses(expenses),
+        # Derived indexes are rebuilt once rather than updated per record
+        lambda view: view + frozen
+    )
+
+def delete_expense(expense_id, username=None):
+    """Delete an expense by id (see get_expense for username)"""
+    expense = get_expense(expense_id, username)
+    if expense is None:
+        storage = get_storage()
+        archive = storage.expense_archive(username)
+        if archive is not None and archive.find(expense_id, username) is not None:
+            # Hot data, and so every cached view, is unaffected
+            storage.delete_archived_expense(expense_id, username)
+            return
+    _cached_write(
+        _expense_key(expense.username if expense is not None else None),
+        lambda: get_storage().delete_expense(expense_id, expense.username if expense is not None else username),
+        lambda view: tuple(exp for exp in view if exp.id != expense_id),
+        ("delete", expense) if expense is not None else None
+    )
+
+def save_user_budget(budget):
+    """Create or replace the budget for budget['username']"""
+    validate_record("budgets", budget)
+    def change(view):
+        username = budget.get('username')
+        frozen = Budget.from_dict(budget)
+        if any(b.username == username for b in view):
+            return tuple(frozen if b.username == username else b for b in view)
+        return view + (frozen,)
+
+    _cached_write(
+        _user_key("budgets", budget.get('username')),
+        lambda: get_storage().upsert_budget(budget),
+        change
+    )
+
+def add_investment(investment):
+    """Store a single new investment plan"""
+    validate_record("investments", investment)
+    _cached_write(
+        _user_key("investments", investment.get('username')),
+        lambda: get_storage().add_investment(investment),
+        lambda view: view + (Investment.from_dict(investment),)
+    )
+
+def delete_investment(investment_id, username=None):
+    """Delete an investment plan by id (see get_expense for username)"""
+    _cached_write(
+        _user_key("investments", username),
+        lambda: get_storage().delete_investment(investment_id, username),
+        lambda view: tuple(inv for inv in view if inv.id != investment_id)
+    )
+
+def save_user(username, user):
+    """Create or replace a single user account"""
+    validate_record("users", user, f"user {username!r}")
+    _cached_write(
+        _user_key("users", username),
+        lambda: get_storage().upsert_user(username, user),
+        lambda view: MappingProxyType({**view, username: freeze(user)})
+    )
+
+def check_login(username, password):
+    """Whether password is username's
+
+    A plaintext password from before migration 3 is compared as is and
+    replaced by its hash, so the account is upgraded at its next login.
+    """
+    user = get_user_account(username)
+    if user is None:
+        return False
+    if is_password_hash(user.get('password_hash')):
+        return verify_password(password, user['password_hash'])
+    stored = user.get('password')
+    if stored is None or not hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")):
+        return False
+    user = thaw(user)
+    del user['password']
+    user['password_hash'] = hash_password(password)
+    save_user(username, user)
+    return True
 
 def get_color_for_category(category):
     """Get color for a category, with fallback for unknown categories"""
     return CATEGORY_COLORS.get(category, "#808080")
 
+def get_monthly_summary(username, month):
+    """Total and category breakdown of a user's YYYY-MM month, from the rollup"""
+    return get_monthly_rollup(username).summary(username, month)
+
 def calculate_monthly_summary(expenses, month):
     """Calculate total expenses and category breakdown for a specific month"""
     month_expenses = [exp for exp in expenses if exp.get('date', '').startswith(month)]
     
-    total = sum(exp.get('amount', 0) for exp in month_expenses)
+    # Sum in paise so the totals are exact
+    total = sum(to_paise(exp.get('amount', 0)) for exp in month_expenses)
     
     categories = {}
     for expense in month_expenses:
         category = expense.get('category', 'Others')
-        amount = expense.get('amount', 0)
+        amount = to_paise(expense.get('amount', 0))
         categories[category] = categories.get(category, 0) + amount
     
     return {
-        'total': total,
-        'categories': categories
+        'total': to_rupees(total),
+        'categories': {category: to_rupees(paise) for category, paise in categories.items()}
     }
 
 def format_currency(amount):
-    """Format amount as Indian currency (₹)"""
-    return f"₹{amount:,.2f}"
+    """Format a rupee amount as Indian currency (₹), rounded to the paisa"""
+    if not math.isfinite(float(amount)):
+        # No paise in inf or nan (an unreachable goal, say)
+        return f"₹{amount:,.2f}"
+    return format_paise(to_paise(amount))
 
 def calculate_date_range(period):
     """Calculate start and end dates based on period"""
@@ -131,3 +807,14 @@ def calculate_date_range(period):
         end_date = None
     
     return start_date, end_date
+
+def get_period_total(username, period, category=None):
+    """Total a user spent in one of the calculate_date_range periods"""
+    start_date, end_date = calculate_date_range(period)
+    index = _spend_index(username, start_date.strftime("%Y-%m-%d") if start_date else None)
+    return index.total(
+        username,
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None,
+        category
+    )
@@ -0,0 +1,171 @@
+import atexit
+import os
+import threading
+import time
+
+# Durable file writes, and a background writer that batches them.
+#
+# atomic_write replaces a file through a temp file, fsync and rename, so a
+# reader or a crash sees either the old or the new contents. WriteBehind
+# queues replaces and appends per path and a background thread commits them
+# at most max_latency seconds after the first one: a burst of saves to the
+# same file becomes one write, and a burst of journal appends one fsync.
+
+
+def file_stat(path):
+    """(mtime, size, inode) of a file, or None if it doesn't exist"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def atomic_write(path, data):
+    """Replace path with data (bytes) durably"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def durable_append(path, data):
+    """Append data (bytes) to path and fsync it"""
+    with open(path, "ab") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class WriteBehind:
+    """Background writer that coalesces file writes
+
+    replace() and append() return at once; the thread commits everything
+    queued max_latency seconds after the first write of a burst. Readers go
+    through read(path), which sees the queued writes. Queued writes are
+    flushed at interpreter exit; close() does the same explicitly.
+
+    token(path) stands in for file_stat(path) in cache fingerprints: it
+    changes with every queued write, but not when the writer later commits
+    it, so carrying a cached value forward over a write stays valid.
+    """
+
+    def __init__(self, max_latency=0.05):
+        self.max_latency = max_latency
+        self.writes = 0
+        self._lock = threading.Condition()
+        # path -> [replacement bytes or None, [appended bytes]]
+        self._pending = {}
+        self._first_pending = None
+        self._versions = {}
+        self._base_stat = {}
+        self._own_stat = {}
+        self._closing = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def replace(self, path, data):
+        """Queue replacing path with data; supersedes anything queued for it"""
+        with self._lock:
+            self._queue(path)[:] = [data, []]
+
+    def append(self, path, data):
+        """Queue appending data to path"""
+        with self._lock:
+            self._queue(path)[1].append(data)
+
+    def remove(self, path):
+        """Drop anything queued for path and delete the file now"""
+        with self._lock:
+            self._pending.pop(path, None)
+            self._versions[path] = self._versions.get(path, 0) + 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._own_stat[path] = None
+
+    def _queue(self, path):
+        if self._closing:
+            raise RuntimeError("write-behind queue is closed")
+        self._versions[path] = self._versions.get(path, 0) + 1
+        if not self._pending:
+            self._first_pending = time.monotonic()
+            self._lock.notify()
+        return self._pending.setdefault(path, [None, []])
+
+    def read(self, path):
+        """Contents of path as of the queued writes, or None to read the file
+
+        A queued replacement is returned without touching the disk; queued
+        appends are committed first.
+        """
+        with self._lock:
+            queued = self._pending.get(path)
+            if queued is None:
+                return None
+            if queued[0] is not None:
+                return queued[0] + b"".join(queued[1])
+            self._commit(path)
+            return None
+
+    def token(self, path):
+        """Change detector for path that covers queued writes (see class docstring)"""
+        with self._lock:
+            stat = file_stat(path)
+            if path not in self._base_stat or stat not in (self._base_stat[path], self._own_stat.get(path, ())):
+                # Changed by someone else (or first look)
+                self._base_stat[path] = stat
+                self._own_stat.pop(path, None)
+            return (self._base_stat[path], self._versions.get(path, 0))
+
+    def flush(self, path=None):
+        """Commit what is queued for path (or for every path) now"""
+        with self._lock:
+            paths = [path] if path is not None else list(self._pending)
+            for p in paths:
+                if p in self._pending:
+                    self._commit(p)
+
+    def _commit(self, path):
+        data, appends = self._pending[path]
+        if data is not None:
+            atomic_write(path, data + b"".join(appends))
+        else:
+            durable_append(path, b"".join(appends))
+        del self._pending[path]
+        self._own_stat[path] = file_stat(path)
+        self.writes += 1
+
+    def _run(self):
+        with self._lock:
+            while True:
+                while not self._pending and not self._closing:
+                    self._lock.wait()
+                if self._closing:
+                    return
+                # Let the burst collect for max_latency, then commit it
+                remaining = self._first_pending + self.max_latency - time.monotonic()
+                if remaining > 0:
+                    self._lock.wait(remaining)
+                    continue
+                for path in list(self._pending):
+                    try:
+                        self._commit(path)
+                    except OSError:
+                        # Stays queued; retried with the next batch
+                        pass
+                self._first_pending = time.monotonic()
+
+    def close(self):
+        """Stop the thread and commit everything still queued"""
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            self._lock.notify()
+        self._thread.join()
+        self.flush()